@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+レコードを日・週・月ごとにまとめて集計するのだ！
+
+RecordBatch（またはレコードのリスト）を NumPy 配列に変換して、
+期間ごとの合計・平均・最小・最大・件数・パーセンタイルをまとめて計算するのだ。
+Pythonのループを回さないので、何年分のデータでも数ミリ秒で集計できるのだ。
+
+使い方:
+    python aggregate.py --types steps heart_rate --start 2024-01-01 --end 2025-12-31 --period week
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+from codec import dumps_text
+from health_connect_client import (
+    BATCH_COLUMNS, HealthConnectClient, HealthRecord, RecordBatch, create_health_connect_client
+)
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# record_type → 集計する列
+AGGREGATE_FIELDS = {
+    "steps": ("steps",),
+    "distance": ("distance_meters",),
+    "calories": ("total_calories", "active_calories"),
+    "heart_rate": ("heart_rate_bpm",),
+    "weight": ("weight_kg", "body_fat_percentage", "muscle_mass_kg"),
+    "sleep": ("total_sleep_minutes", "deep_sleep_minutes", "light_sleep_minutes", "rem_sleep_minutes",
+              "sleep_efficiency"),
+}
+
+PERIODS = ("day", "week", "month")
+MILLIS_PER_DAY = 24 * 60 * 60 * 1000
+DEFAULT_PERCENTILES = (50, 90)
+
+Records = Union[RecordBatch, Iterable[HealthRecord]]
+
+
+def to_arrays(record_type: str, records: Records) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    レコードをタイムスタンプ（現地時刻の datetime64[ms]）と列ごとの float64 配列に変換するのだ
+
+    RecordBatch の型つき配列はコピーせずにそのまま NumPy 配列として使う。
+    欠損値は NaN になる。
+
+    Args:
+        record_type: レコードタイプ（AGGREGATE_FIELDS のキー）
+        records: RecordBatch またはレコードのリスト
+
+    Returns:
+        (タイムスタンプの配列, 列名 → 値の配列)
+    """
+    names = AGGREGATE_FIELDS[record_type]
+
+    if isinstance(records, RecordBatch):
+        epoch_millis = np.frombuffer(records.timestamps, dtype=np.int64) if len(records) else np.empty(0, np.int64)
+        if len(records):
+            # バッチ内のタイムゾーン（UTCオフセット）は一定とみなして現地時刻に直す
+            offset = records.timestamp_at(0).astimezone().utcoffset() if records.tzinfo is None \
+                else records.timestamp_at(0).utcoffset()
+            epoch_millis = epoch_millis + int(offset.total_seconds() * 1000)
+        values = {
+            name: np.asarray(records.columns[name], dtype=np.float64)
+            for name in names
+        }
+        return epoch_millis.astype('datetime64[ms]'), values
+
+    records = list(records)
+    timestamps = np.array([record.timestamp.replace(tzinfo=None) for record in records], dtype='datetime64[ms]')
+    values = {
+        name: np.fromiter(
+            (np.nan if (value := getattr(record, name)) is None else value for record in records),
+            dtype=np.float64, count=len(records)
+        )
+        for name in names
+    }
+    return timestamps, values
+
+
+def period_starts(timestamps: np.ndarray, period: str, day_offset: timedelta = timedelta(0)) -> np.ndarray:
+    """
+    各タイムスタンプが属する期間の開始日を求めるのだ
+
+    Args:
+        timestamps: datetime64 の配列
+        period: "day", "week"（月曜始まり）, "month"
+        day_offset: 日付の区切りをずらす時間（睡眠データを起床日に寄せる場合など）
+
+    Returns:
+        datetime64[D] の配列
+    """
+    if period not in PERIODS:
+        raise ValueError(f"未対応の集計期間なのだ: {period}")
+
+    # datetime64 の単位変換は遅いので、エポックからの日数を整数演算で求める
+    millis = timestamps.astype('datetime64[ms]').view(np.int64) - int(day_offset.total_seconds() * 1000)
+    days = millis // MILLIS_PER_DAY
+    if period == "week":
+        # 1970-01-01 は木曜日なので、+3 すると月曜日が0になる
+        days = days - (days + 3) % 7
+    elif period == "month":
+        # 月の計算は日付の種類（数千程度）に対してだけ行う
+        unique_days, day_index = group_keys(days)
+        month_starts = unique_days.astype('datetime64[D]').astype('datetime64[M]').astype('datetime64[D]')
+        return month_starts[day_index]
+    return days.astype('datetime64[D]')
+
+
+def group_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    キーの配列をグループ番号に変換するのだ（np.unique(return_inverse=True) と同じ結果）
+
+    Health Connectのレコードは普通タイムスタンプ順なので、並んでいればソートせずに済ませる。
+
+    Args:
+        keys: 各値が属するグループのキー
+
+    Returns:
+        (グループのキー, 各値のグループ番号)
+    """
+    if len(keys) and np.all(keys[1:] >= keys[:-1]):
+        is_first = np.concatenate(([True], keys[1:] != keys[:-1]))
+        return keys[is_first], np.cumsum(is_first) - 1
+    return np.unique(keys, return_inverse=True)
+
+
+def _sort_within_groups(group: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    グループ番号 → 値 の順に並べた値を返すのだ
+
+    値を [0, 1) に縮めてグループ番号に足せば、1回の np.sort で lexsort と同じ並びになる
+    （lexsort より数倍速い。誤差は値の幅 × 1e-12 程度なので集計結果には影響しない）。
+
+    Args:
+        group: 各値のグループ番号
+        values: 値（欠損値を除いたもの）
+
+    Returns:
+        並べ替えた値
+    """
+    low = values.min()
+    scale = np.ptp(values) + 1.0
+    combined = np.sort(group + (values - low) / scale)
+    return (combined - np.floor(combined)) * scale + low
+
+
+def _group_percentiles(sorted_values: np.ndarray, starts: np.ndarray, counts: np.ndarray,
+                       percentiles: Sequence[float]) -> Dict[str, np.ndarray]:
+    """
+    グループごとに昇順に並んだ値からパーセンタイルを線形補間で求めるのだ（np.percentile と同じ方式）
+
+    Args:
+        sorted_values: グループ内で昇順に並べた値（欠損値を除いたもの、空にはしない）
+        starts: 各グループの先頭位置
+        counts: 各グループの件数
+        percentiles: 求めるパーセンタイル（0〜100）
+
+    Returns:
+        "p50" などの名前 → グループごとの値
+    """
+    results = {}
+    has_values = counts > 0
+    last = np.maximum(counts - 1, 0)
+    for q in percentiles:
+        position = last * (q / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        fraction = position - lower
+        lower_values = sorted_values[np.minimum(starts + lower, len(sorted_values) - 1)]
+        upper_values = sorted_values[np.minimum(starts + upper, len(sorted_values) - 1)]
+        values = lower_values + (upper_values - lower_values) * fraction
+        results[f"p{q:g}"] = np.where(has_values, values, np.nan)
+    return results
+
+
+def aggregate_values(group: np.ndarray, n_groups: int, values: np.ndarray,
+                     percentiles: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+    """
+    グループごとに値を集計するのだ（欠損値 NaN は無視する）
+
+    Args:
+        group: 各値が属するグループの番号（0〜n_groups-1）
+        n_groups: グループ数
+        values: 集計する値
+        percentiles: 求めるパーセンタイル
+
+    Returns:
+        統計量の名前 → グループごとの値
+    """
+    valid = ~np.isnan(values)
+    group = group[valid]
+    values = values[valid]
+
+    counts = np.bincount(group, minlength=n_groups)
+    sums = np.bincount(group, weights=values, minlength=n_groups)
+
+    # グループ → 値 の順に並べると、グループごとの最小・最大・パーセンタイルが位置で取れる
+    sorted_values = _sort_within_groups(group, values) if len(values) else np.array([np.nan])
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+    first = np.minimum(starts, len(sorted_values) - 1)
+    last = np.clip(starts + counts - 1, 0, len(sorted_values) - 1)
+    has_values = counts > 0
+
+    stats = {
+        "count": counts,
+        "sum": sums,
+        "mean": np.where(has_values, sums / np.maximum(counts, 1), np.nan),
+        "min": np.where(has_values, sorted_values[first], np.nan),
+        "max": np.where(has_values, sorted_values[last], np.nan),
+    }
+    stats.update(_group_percentiles(sorted_values, starts, counts, percentiles))
+    return stats
+
+
+def aggregate(record_type: str, records: Records, period: str = "day",
+              percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+              day_offset: timedelta = timedelta(0)) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    レコードを期間ごとに集計するのだ
+
+    Args:
+        record_type: レコードタイプ（AGGREGATE_FIELDS のキー）
+        records: RecordBatch またはレコードのリスト
+        period: "day", "week", "month"
+        percentiles: 求めるパーセンタイル
+        day_offset: 日付の区切りをずらす時間
+
+    Returns:
+        期間の開始日（YYYY-MM-DD） → 列名 → 統計量の名前 → 値
+        （値のない統計量は None）
+    """
+    timestamps, columns = to_arrays(record_type, records)
+    if len(timestamps) == 0:
+        return {}
+
+    keys = period_starts(timestamps, period, day_offset)
+    unique_keys, group = group_keys(keys)
+    labels = np.datetime_as_string(unique_keys, unit='D')
+
+    report: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    for name, values in columns.items():
+        stats = aggregate_values(group, len(unique_keys), values, percentiles)
+        stat_lists = {
+            stat: [None if np.isnan(value) else round(float(value), 3) for value in column]
+            if column.dtype.kind == 'f' else column.tolist()
+            for stat, column in stats.items()
+        }
+        for i, label in enumerate(labels):
+            report.setdefault(str(label), {})[name] = {stat: column[i] for stat, column in stat_lists.items()}
+
+    return report
+
+
+def build_report(client, record_types: List[str], start_date: datetime, end_date: datetime,
+                 period: str = "day") -> Dict[str, Dict[str, Any]]:
+    """
+    クライアントから期間内のレコードを取得してデータタイプごとに集計するのだ
+
+    Args:
+        client: Health Connectクライアント
+        record_types: データタイプ名のリスト
+        start_date: 開始日時
+        end_date: 終了日時
+        period: "day", "week", "month"
+
+    Returns:
+        データタイプ名 → aggregate() の結果
+    """
+    # 心拍数のように件数の多いタイプは RecordBatch に直接読み込んでレコードを溜めない
+    list_types = [record_type for record_type in record_types if record_type not in BATCH_COLUMNS]
+    records_by_type = client.read_many_sync(list_types, start_date, end_date) if list_types else {}
+
+    report = {}
+    for record_type in record_types:
+        records = records_by_type.get(record_type)
+        if record_type in BATCH_COLUMNS:
+            records = client.read_batch(record_type, start_date, end_date)
+
+        started = time.perf_counter()
+        day_offset = timedelta(hours=12) if record_type == "sleep" else timedelta(0)
+        report[record_type] = aggregate(record_type, records or [], period, day_offset=day_offset)
+        logger.info(f"[{record_type}] {len(records or [])}件を{len(report[record_type])}期間に集計したのだ "
+                    f"({(time.perf_counter() - started) * 1000:.1f}ms)")
+    return report
+
+
+def main(argv=None):
+    """指定期間のレコードを集計してJSONで出力するのだ"""
+    parser = argparse.ArgumentParser(description="Health Connectのレコードを日・週・月ごとに集計するのだ")
+    parser.add_argument("--types", nargs="+", default=["steps", "heart_rate", "weight", "sleep"],
+                        choices=[record_type for record_type in AGGREGATE_FIELDS
+                                 if record_type in HealthConnectClient.RECORD_READERS],
+                        help="集計するデータタイプ")
+    parser.add_argument("--start", required=True, help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", required=True, help="終了日（YYYY-MM-DD）")
+    parser.add_argument("--period", choices=PERIODS, default="day", help="集計期間")
+    parser.add_argument("--output", help="結果の保存先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    start_date = datetime.strptime(args.start, '%Y-%m-%d')
+    end_date = datetime.strptime(args.end, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
+
+    client = create_health_connect_client(mock_mode=True)
+    try:
+        report = build_report(client, args.types, start_date, end_date, args.period)
+    finally:
+        client.close()
+
+    text = dumps_text(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"集計結果を保存したのだ: {args.output}")
+    else:
+        print(text)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+分析結果（analyze_sleep_patterns など）をキャッシュするのだ！
+
+キーは「分析関数の名前・バージョン・入力データのダイジェスト」なので、
+入力が変わった日か、分析関数のバージョンを上げた場合だけ計算し直すのだ。
+キャッシュはデータと同じディレクトリの `.analysis_cache.json` に保存し、
+件数が上限を超えたら最近使われていないものから捨てる（LRU）のだ。
+
+使い方（保存済みの全期間を分析し直す）:
+    python analysis_cache.py --storage columnar --base-dir . --types sleep nutrition
+"""
+import copy
+import logging
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from codec import JSON_CODEC, dumps_text, load_file
+from storage import STORAGE_BACKENDS, atomic_write_bytes, content_digest, get_storage
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_MAX_ENTRIES = 10000
+
+# 保存時に付け足されるだけで分析には使わないフィールド（取得直後のデータと保存済みのデータで同じキーにする）
+RECORD_META_FIELDS = frozenset({"date", "created_at", "data_source"})
+
+
+class AnalysisCache:
+    """分析結果のLRUキャッシュ（ファイルに保存できる）"""
+
+    FILENAME = ".analysis_cache.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, base_dir='.', path=None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            base_dir: 保存先のベースディレクトリ（データと同じ場所）
+            path: キャッシュファイルのパス（省略時は base_dir/.analysis_cache.json）
+            max_entries: 保持する最大件数
+        """
+        self.path = Path(path) if path else Path(base_dir) / self.FILENAME
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = self._load()
+        self._dirty = False
+
+    def _load(self) -> "OrderedDict[str, Any]":
+        try:
+            saved = load_file(self.path)
+        except FileNotFoundError:
+            return OrderedDict()
+        except (OSError, ValueError) as e:
+            logger.warning(f"分析キャッシュを読み込めなかったので空から始めるのだ: {e}")
+            return OrderedDict()
+        if saved.get("version") != self.FORMAT_VERSION:
+            return OrderedDict()
+        # 古い順に保存してあるので、そのまま並べればLRUの順番になる
+        return OrderedDict(saved["entries"])
+
+    @staticmethod
+    def make_key(analyzer: Callable, version: int, data: Dict[str, Any]) -> str:
+        """
+        キャッシュのキーを作る
+
+        Args:
+            analyzer: 分析関数
+            version: 分析関数のバージョン（ロジックを変えたら上げる）
+            data: 分析する入力データ
+
+        Returns:
+            キー文字列
+        """
+        content = {key: value for key, value in data.items() if key not in RECORD_META_FIELDS}
+        return f"{analyzer.__module__}.{analyzer.__qualname__}:v{version}:{content_digest(content)}"
+
+    def analyze(self, analyzer: Callable, data: Dict[str, Any], version: int = 1) -> Any:
+        """
+        キャッシュにあればそれを返し、なければ分析してキャッシュに入れる
+
+        Args:
+            analyzer: 分析関数
+            data: 分析する入力データ
+            version: 分析関数のバージョン
+
+        Returns:
+            分析結果（呼び出し側で書き換えてもキャッシュには影響しない）
+        """
+        key = self.make_key(analyzer, version, data)
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return copy.deepcopy(self._entries[key])
+
+        self.misses += 1
+        result = analyzer(data)
+        self._entries[key] = copy.deepcopy(result)
+        self._dirty = True
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return result
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def save(self):
+        """変更があればキャッシュを一時ファイル経由で書き込む"""
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": self.FORMAT_VERSION, "entries": list(self._entries.items())}
+        atomic_write_bytes(self.path, JSON_CODEC.encode(payload))
+        self._dirty = False
+
+
+def analyze_stored(storage, plugin, cache: AnalysisCache, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    保存済みのデータをキャッシュ経由で分析するのだ
+
+    Args:
+        storage: 読み込み元のストレージ
+        plugin: 分析関数を持つパイプライン定義
+        cache: 分析キャッシュ
+        start_date: 開始日（省略時は最初から）
+        end_date: 終了日（省略時は最後まで）
+
+    Returns:
+        日付 → 分析結果
+    """
+    return {
+        record["date"]: cache.analyze(plugin.analyze, record, plugin.analyzer_version)
+        for record in storage.load_range(plugin.name, start_date, end_date)
+    }
+
+
+def main(argv=None):
+    """保存済みのデータを分析し直すのだ（変わっていない日はキャッシュから返す）"""
+    import argparse
+    from collect import PLUGINS
+
+    analyzable = sorted(name for name, plugin in PLUGINS.items() if plugin.analyze)
+
+    parser = argparse.ArgumentParser(description="保存済みのデータをキャッシュつきで分析するのだ")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS), default="json", help="保存形式")
+    parser.add_argument("--base-dir", default=".", help="保存先のベースディレクトリ")
+    parser.add_argument("--types", nargs="+", choices=analyzable, default=analyzable, help="分析するデータタイプ")
+    parser.add_argument("--start", help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", help="終了日（YYYY-MM-DD）")
+    parser.add_argument("--output", help="分析結果（JSON）の保存先")
+    args = parser.parse_args(argv)
+
+    storage = get_storage(args.storage, args.base_dir)
+    cache = AnalysisCache(args.base_dir)
+    try:
+        results = {
+            name: analyze_stored(storage, PLUGINS[name], cache, args.start, args.end)
+            for name in args.types
+        }
+        cache.save()
+    finally:
+        storage.close()
+
+    logger.info(f"分析完了: キャッシュヒット{cache.hits}件, 計算{cache.misses}件")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(dumps_text(results))
+        logger.info(f"分析結果を保存したのだ: {args.output}")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
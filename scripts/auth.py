@@ -3,28 +3,169 @@ Google Fit API OAuth認証ヘルパー
 """
 import os
 import requests
-import json
-from typing import Optional
+import hashlib
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス間ロックなし
+    fcntl = None
+
+from codec import dumps_text, load_file
+from http_session import create_session, get_session
+
+
+# デフォルトのトークンキャッシュ保存先
+DEFAULT_TOKEN_CACHE_PATH = Path.home() / '.cache' / 'my-personal-trainer' / 'token_cache.json'
+
+
+class TokenCache:
+    """
+    アクセストークンのキャッシュ
+    
+    クライアントID + リフレッシュトークンをキーにアクセストークンと有効期限を保存し、
+    期限切れの少し前までは同じトークンを使い回す。
+    ファイルロックを使うので、複数スレッド・複数プロセスから安全に共有できる。
+    """
+    
+    def __init__(self, cache_path: Optional[str] = None, refresh_margin_seconds: int = 300):
+        """
+        Args:
+            cache_path: キャッシュファイルのパス（省略時は GOOGLE_TOKEN_CACHE 環境変数、なければ ~/.cache 配下）
+            refresh_margin_seconds: 有効期限の何秒前から事前に更新するか
+        """
+        self.cache_path = Path(cache_path or os.getenv('GOOGLE_TOKEN_CACHE') or DEFAULT_TOKEN_CACHE_PATH)
+        self.lock_path = self.cache_path.with_suffix('.lock')
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self._thread_lock = threading.Lock()
+        self._memory = {}
+    
+    @staticmethod
+    def make_key(client_id: str, refresh_token: str) -> str:
+        """キャッシュキーを作成（トークンそのものはキーに残さない）"""
+        return hashlib.sha256(f"{client_id}:{refresh_token}".encode('utf-8')).hexdigest()
+    
+    def _is_fresh(self, entry: Optional[dict]) -> bool:
+        """エントリが事前更新のマージンを含めてまだ有効か"""
+        return bool(entry) and entry['expires_at'] - self.refresh_margin_seconds > time.time()
+    
+    @contextmanager
+    def _locked(self):
+        """スレッドロック + ファイルロックを取得"""
+        with self._thread_lock:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _load(self) -> dict:
+        """キャッシュファイルを読み込み（壊れていれば空扱い）"""
+        try:
+            return load_file(self.cache_path)
+        except (OSError, ValueError):
+            return {}
+    
+    def _save(self, entries: dict):
+        """キャッシュファイルを一時ファイル経由で書き込み（所有者のみ読み書き可）"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_path.parent, prefix='.token_cache.')
+        try:
+            os.chmod(tmp_path, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(dumps_text(entries, pretty=False))
+            os.replace(tmp_path, self.cache_path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+    
+    def get_or_refresh(self, key: str, refresh: Callable[[], Optional[dict]], force: bool = False) -> Optional[str]:
+        """
+        キャッシュ済みのアクセストークンを返し、期限切れ間近なら更新する
+        
+        Args:
+            key: キャッシュキー
+            refresh: トークンエンドポイントのレスポンス（access_token, expires_in）を返す関数
+            force: Trueの場合はキャッシュを無視して必ず更新する
+            
+        Returns:
+            str: アクセストークン、取得に失敗した場合はNone
+        """
+        if not force and self._is_fresh(self._memory.get(key)):
+            return self._memory[key]['access_token']
+        
+        # 更新中は他のスレッド・プロセスを待たせ、同時に何度もPOSTしないようにする
+        with self._locked():
+            entries = self._load()
+            entry = entries.get(key)
+            
+            if force or not self._is_fresh(entry):
+                token_data = refresh()
+                if not token_data or not token_data.get('access_token'):
+                    return None
+                
+                entry = {
+                    'access_token': token_data['access_token'],
+                    'expires_at': time.time() + int(token_data.get('expires_in', 3600))
+                }
+                # 期限切れのエントリは掃除しておく
+                entries = {k: v for k, v in entries.items() if v['expires_at'] > time.time()}
+                entries[key] = entry
+                self._save(entries)
+            
+            self._memory[key] = entry
+            return entry['access_token']
 
 
 class GoogleFitAuth:
     """Google Fit API認証クラス"""
     
-    def __init__(self):
-        self.client_id = os.getenv('GOOGLE_OAUTH_CLIENT_ID')
-        self.client_secret = os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
-        self.refresh_token = os.getenv('GOOGLE_REFRESH_TOKEN')
+    def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 refresh_token: Optional[str] = None, token_cache: Optional[TokenCache] = None):
+        """
+        Args:
+            client_id: OAuth クライアントID（省略時は環境変数）
+            client_secret: OAuth クライアントシークレット（省略時は環境変数）
+            refresh_token: リフレッシュトークン（省略時は環境変数、複数ユーザー運用時はユーザーごとに指定）
+            token_cache: アクセストークンのキャッシュ（省略時はデフォルトの保存先を使用）
+        """
+        self.client_id = client_id or os.getenv('GOOGLE_OAUTH_CLIENT_ID')
+        self.client_secret = client_secret or os.getenv('GOOGLE_OAUTH_CLIENT_SECRET')
+        self.refresh_token = refresh_token or os.getenv('GOOGLE_REFRESH_TOKEN')
         
         if not all([self.client_id, self.client_secret, self.refresh_token]):
             raise ValueError("必要な環境変数が設定されていません")
+        
+        self.token_cache = token_cache or TokenCache()
     
-    def get_access_token(self) -> Optional[str]:
+    def get_access_token(self, force_refresh: bool = False) -> Optional[str]:
         """
-        リフレッシュトークンを使用してアクセストークンを取得
+        アクセストークンを取得（有効期限内ならキャッシュを使用）
+        
+        Args:
+            force_refresh: Trueの場合はキャッシュを無視してトークンエンドポイントに問い合わせる
         
         Returns:
             str: アクセストークン、取得に失敗した場合はNone
         """
+        key = TokenCache.make_key(self.client_id, self.refresh_token)
+        return self.token_cache.get_or_refresh(key, self.request_token, force=force_refresh)
+    
+    def request_token(self) -> Optional[dict]:
+        """
+        リフレッシュトークンを使用してトークンエンドポイントからアクセストークンを取得
+        
+        Returns:
+            dict: トークンエンドポイントのレスポンス（access_token, expires_in など）、取得に失敗した場合はNone
+        """
         url = "https://oauth2.googleapis.com/token"
         
         data = {
@@ -35,11 +176,10 @@ class GoogleFitAuth:
         }
         
         try:
-            response = requests.post(url, data=data)
+            response = get_session().post(url, data=data)
             response.raise_for_status()
             
-            token_data = response.json()
-            return token_data.get('access_token')
+            return response.json()
             
         except requests.exceptions.RequestException as e:
             print(f"アクセストークン取得エラー: {e}")
@@ -63,20 +203,24 @@ class GoogleFitAuth:
         }
 
 
-def get_authenticated_session() -> Optional[tuple]:
+def get_authenticated_session(auth: Optional[GoogleFitAuth] = None) -> Optional[tuple]:
     """
     認証済みセッションとヘッダーを取得
     
+    Args:
+        auth: 使用する認証情報（省略時は環境変数から作成）
+    
     Returns:
         tuple: (requests.Session, headers) または None
     """
-    auth = GoogleFitAuth()
+    auth = auth or GoogleFitAuth()
     headers = auth.get_auth_headers()
     
     if not headers:
         return None
     
-    session = requests.Session()
+    # コネクションプールはプロセス共有のアダプターを使い回す
+    session = create_session()
     session.headers.update(headers)
     
     return session, headers 
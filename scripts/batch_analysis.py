@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+睡眠・栄養の分析を何日分・何人分でもまとめて行うのだ！
+
+fetch_sleep.analyze_sleep_patterns / fetch_nutrition.analyze_nutrition_balance と同じ判定を、
+1日ずつの辞書ではなく列（NumPy 配列）に対して1回で行うのだ。
+分類結果はカテゴリー番号の配列、お勧めはビットマスクの配列で持ち、
+お勧めの文章は1日分を取り出したときに初めて組み立てるのだ。
+
+使い方（複数ユーザーの全期間をまとめて分析する）:
+    python batch_analysis.py --storage columnar --base-dirs data/alice data/bob --types sleep nutrition
+"""
+import argparse
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from codec import dumps_text
+from fetch_nutrition import round_percent
+from storage import STORAGE_BACKENDS, get_storage, unflatten_record
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# カテゴリー番号 → 名前（0 は判定できなかった日）
+SLEEP_DURATION_CATEGORIES = ("unknown", "optimal", "short", "long", "insufficient")
+SLEEP_QUALITY_CATEGORIES = ("unknown", "excellent", "good", "needs_improvement")
+CALORIE_BALANCE_CATEGORIES = ("unknown", "appropriate", "low", "high")
+MACRONUTRIENT_BALANCE_CATEGORIES = ("unknown", "excellent", "needs_adjustment")
+
+# ビット番号 → お勧めの文章（analyze_* が追加する順番）
+SLEEP_RECOMMENDATIONS = (
+    "もう少し長く眠ることをお勧めするのだ",
+    "睡眠時間が長すぎるかもしれないのだ",
+    "睡眠時間が不足しているのだ",
+    "睡眠の質を改善することをお勧めするのだ",
+    "REM睡眠が少ないかもしれないのだ",
+)
+NUTRITION_RECOMMENDATIONS = (
+    "カロリー摂取量が少ないかもしれないのだ",
+    "カロリー摂取量が多いかもしれないのだ",
+    "タンパク質をもう少し摂ることをお勧めするのだ",
+    "タンパク質の摂取量が多いかもしれないのだ",
+    "脂質の摂取量を控えめにすることをお勧めするのだ",
+    "良質な脂質をもう少し摂ることをお勧めするのだ",
+    "食物繊維をもっと摂ることをお勧めするのだ",
+    "水分をもっと摂ることをお勧めするのだ",
+)
+
+
+def render_recommendations(mask: int, texts: Sequence[str]) -> List[str]:
+    """
+    お勧めのビットマスクを文章のリストにするのだ
+
+    Args:
+        mask: ビットマスク
+        texts: ビット番号 → 文章
+
+    Returns:
+        お勧めの文章のリスト（ビット番号の順）
+    """
+    mask = int(mask)
+    return [text for bit, text in enumerate(texts) if mask >> bit & 1]
+
+
+def _bitmask(flags: Sequence[np.ndarray]) -> np.ndarray:
+    """真偽値の配列をビット番号の順に並べてビットマスクにする"""
+    mask = np.zeros(len(flags[0]) if flags else 0, dtype=np.uint16)
+    for bit, flag in enumerate(flags):
+        mask |= flag.astype(np.uint16) << np.uint16(bit)
+    return mask
+
+
+def _column(columns: Dict[str, Sequence], name: str) -> np.ndarray:
+    """列を float64 の配列にする（None と列がない場合は NaN）"""
+    values = columns.get(name)
+    if values is None:
+        return np.full(len(columns.get("date", ())), np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+
+@dataclass
+class BatchAnalysis:
+    """
+    複数日の分析結果
+
+    Attributes:
+        dates: 各行の日付
+        codes: 分類名 → カテゴリー番号の配列
+        labels: 分類名 → カテゴリー番号ごとの名前
+        recommendations: お勧めのビットマスクの配列
+        recommendation_texts: ビット番号 → お勧めの文章
+        values: 平坦化したキー（"pfc_ratio.protein" など）→ 数値の配列
+    """
+    dates: List[str]
+    codes: Dict[str, np.ndarray]
+    labels: Dict[str, Tuple[str, ...]]
+    recommendations: np.ndarray
+    recommendation_texts: Tuple[str, ...]
+    values: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __len__(self) -> int:
+        return len(self.recommendations)
+
+    def category(self, name: str) -> np.ndarray:
+        """分類名の配列を返す"""
+        return np.asarray(self.labels[name])[self.codes[name]]
+
+    def category_counts(self, name: str, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """
+        カテゴリーごとの日数を返す
+
+        Args:
+            name: 分類名
+            mask: 数える行（省略時は全て）
+
+        Returns:
+            カテゴリー名 → 日数
+        """
+        codes = self.codes[name] if mask is None else self.codes[name][mask]
+        counts = np.bincount(codes, minlength=len(self.labels[name]))
+        return {label: int(count) for label, count in zip(self.labels[name], counts)}
+
+    def recommendation_counts(self, mask: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """
+        お勧めごとの日数を返す
+
+        Args:
+            mask: 数える行（省略時は全て）
+
+        Returns:
+            お勧めの文章 → 日数
+        """
+        bits = self.recommendations if mask is None else self.recommendations[mask]
+        return {
+            text: int(np.count_nonzero(bits >> np.uint16(bit) & 1))
+            for bit, text in enumerate(self.recommendation_texts)
+        }
+
+    def __getitem__(self, index: int) -> Dict[str, Any]:
+        """1日分を analyze_* と同じ形の辞書で返す（お勧めの文章はここで組み立てる）"""
+        flat: Dict[str, Any] = {
+            name: self.labels[name][self.codes[name][index]] for name in self.codes
+        }
+        flat["recommendations"] = render_recommendations(self.recommendations[index], self.recommendation_texts)
+        flat.update({name: float(values[index]) for name, values in self.values.items()})
+        return unflatten_record(flat)
+
+    def __iter__(self):
+        return (self[index] for index in range(len(self)))
+
+
+def classify_sleep(columns: Dict[str, Sequence]) -> BatchAnalysis:
+    """
+    睡眠データの列をまとめて分類するのだ（analyze_sleep_patterns と同じ判定）
+
+    Args:
+        columns: 列名 → 値の配列（storage.load_columns("sleep") の戻り値など）
+
+    Returns:
+        BatchAnalysis
+    """
+    total = np.nan_to_num(_column(columns, "total_sleep_minutes"))
+    efficiency = np.nan_to_num(_column(columns, "sleep_efficiency"))
+    rem = np.nan_to_num(_column(columns, "rem_sleep_minutes"))
+
+    hours = total / 60
+    duration = np.select(
+        [(hours >= 7) & (hours <= 9), (hours >= 6) & (hours < 7), hours > 9],
+        [1, 2, 3],
+        default=4
+    ).astype(np.int8)
+
+    has_efficiency = efficiency != 0
+    quality = np.select(
+        [has_efficiency & (efficiency >= 0.85), has_efficiency & (efficiency >= 0.75), has_efficiency],
+        [1, 2, 3],
+        default=0
+    ).astype(np.int8)
+
+    has_rem = (rem != 0) & (total != 0)
+    rem_ratio = np.divide(rem, total, out=np.zeros_like(rem), where=has_rem)
+
+    recommendations = _bitmask([
+        duration == 2,
+        duration == 3,
+        duration == 4,
+        quality == 3,
+        has_rem & (rem_ratio < 0.15),
+    ])
+    return BatchAnalysis(
+        dates=list(columns.get("date", [])),
+        codes={"sleep_duration_category": duration, "sleep_quality_category": quality},
+        labels={
+            "sleep_duration_category": SLEEP_DURATION_CATEGORIES,
+            "sleep_quality_category": SLEEP_QUALITY_CATEGORIES,
+        },
+        recommendations=recommendations,
+        recommendation_texts=SLEEP_RECOMMENDATIONS,
+    )
+
+
+def classify_nutrition(columns: Dict[str, Sequence]) -> BatchAnalysis:
+    """
+    栄養データの列をまとめて分類するのだ（analyze_nutrition_balance と同じ判定）
+
+    Args:
+        columns: 列名 → 値の配列（storage.load_columns("nutrition") の戻り値など）
+
+    Returns:
+        BatchAnalysis
+    """
+    calories = _column(columns, "calories_consumed")
+
+    balance = np.select(
+        [(calories >= 1800) & (calories <= 2500), calories < 1800, calories > 2500],
+        [1, 2, 3],
+        default=0
+    ).astype(np.int8)
+
+    # PFCバランス（analyze_nutrition_balance と同じ round_percent で丸めてから判定する）
+    has_calories = calories > 0
+    zeros = np.zeros_like(calories)
+    pfc = {
+        name: round_percent(
+            np.divide(_column(columns, column) * kcal_per_g, calories, out=zeros.copy(), where=has_calories)
+        )
+        for name, column, kcal_per_g in (("protein", "protein_g", 4), ("fat", "fat_g", 9), ("carbs", "carbs_g", 4))
+    }
+    protein, fat, carbs = pfc["protein"], pfc["fat"], pfc["carbs"]
+
+    # 理想的なPFCバランス: P 15-20%, F 20-30%, C 50-65%
+    ideal = (15 <= protein) & (protein <= 20) & (20 <= fat) & (fat <= 30) & (50 <= carbs) & (carbs <= 65)
+    macronutrient = np.select([has_calories & ideal, has_calories], [1, 2], default=0).astype(np.int8)
+    adjust = macronutrient == 2
+
+    recommendations = _bitmask([
+        balance == 2,
+        balance == 3,
+        adjust & (protein < 15),
+        adjust & (protein > 20),
+        adjust & (fat > 30),
+        adjust & (fat < 20),
+        _column(columns, "fiber_g") < 20,
+        _column(columns, "water_ml") < 1500,
+    ])
+    return BatchAnalysis(
+        dates=list(columns.get("date", [])),
+        codes={"calorie_balance": balance, "macronutrient_balance": macronutrient},
+        labels={
+            "calorie_balance": CALORIE_BALANCE_CATEGORIES,
+            "macronutrient_balance": MACRONUTRIENT_BALANCE_CATEGORIES,
+        },
+        recommendations=recommendations,
+        recommendation_texts=NUTRITION_RECOMMENDATIONS,
+        values={f"pfc_ratio.{name}": values for name, values in pfc.items()},
+    )
+
+
+# データタイプ → 列をまとめて分析する関数
+BATCH_ANALYZERS: Dict[str, Callable[[Dict[str, Sequence]], BatchAnalysis]] = {
+    "sleep": classify_sleep,
+    "nutrition": classify_nutrition,
+}
+
+
+def load_history(storages: Sequence, data_type: str, start_date: Optional[str] = None,
+                 end_date: Optional[str] = None) -> Tuple[Dict[str, List[Any]], np.ndarray]:
+    """
+    複数ユーザーのストレージから同じデータタイプの列を読み込んで1つにつなげるのだ
+
+    Args:
+        storages: ユーザーごとのストレージ
+        data_type: データタイプ
+        start_date: 開始日（省略時は最初から）
+        end_date: 終了日（省略時は最後まで）
+
+    Returns:
+        (つなげた列, 各行のユーザー番号の配列)
+    """
+    merged: Dict[str, List[Any]] = {}
+    owners = []
+    total_rows = 0
+    for user_index, storage in enumerate(storages):
+        columns = storage.load_columns(data_type, start_date, end_date)
+        rows = len(columns.get("date", ()))
+        for column in columns:
+            if column not in merged:
+                merged[column] = [None] * total_rows
+        for column, values in merged.items():
+            values.extend(columns.get(column) or [None] * rows)
+        owners.append(np.full(rows, user_index, dtype=np.int32))
+        total_rows += rows
+    return merged, np.concatenate(owners) if owners else np.empty(0, dtype=np.int32)
+
+
+def summarize_by_user(analysis: BatchAnalysis, owners: np.ndarray, names: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    分析結果をユーザーごとの日数にまとめるのだ
+
+    Args:
+        analysis: 全ユーザー分の分析結果
+        owners: 各行のユーザー番号
+        names: ユーザー名（ユーザー番号の順）
+
+    Returns:
+        ユーザーごとの集計のリスト
+    """
+    summaries = []
+    for user_index, name in enumerate(names):
+        mask = owners == user_index
+        summaries.append({
+            "user": name,
+            "days": int(np.count_nonzero(mask)),
+            "categories": {category: analysis.category_counts(category, mask) for category in analysis.codes},
+            "recommendations": analysis.recommendation_counts(mask),
+        })
+    return summaries
+
+
+def main(argv=None):
+    """保存済みのデータを複数ユーザー分まとめて分析するのだ"""
+    parser = argparse.ArgumentParser(description="睡眠・栄養の分析を全期間・全ユーザー分まとめて行うのだ")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS), default="json", help="保存形式")
+    parser.add_argument("--base-dirs", nargs="+", default=["."], help="ユーザーごとの保存先ディレクトリ")
+    parser.add_argument("--types", nargs="+", choices=sorted(BATCH_ANALYZERS), default=sorted(BATCH_ANALYZERS),
+                        help="分析するデータタイプ")
+    parser.add_argument("--start", help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", help="終了日（YYYY-MM-DD）")
+    parser.add_argument("--output", help="結果の保存先（省略時は標準出力）")
+    args = parser.parse_args(argv)
+
+    storages = [get_storage(args.storage, base_dir) for base_dir in args.base_dirs]
+    try:
+        report = {}
+        for data_type in args.types:
+            columns, owners = load_history(storages, data_type, args.start, args.end)
+            analysis = BATCH_ANALYZERS[data_type](columns)
+            logger.info(f"[{data_type}] {len(analysis)}日分を分析したのだ")
+            report[data_type] = summarize_by_user(analysis, owners, args.base_dirs)
+    finally:
+        for storage in storages:
+            storage.close()
+
+    text = dumps_text(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"分析結果を保存したのだ: {args.output}")
+    else:
+        print(text)
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+収集パイプラインのベンチマークなのだ！
+
+シードつきの合成データ（分単位の歩数・秒単位の心拍数・1日1件の体重/睡眠/栄養）を
+ユーザー数・日数を指定して生成し、取得 → 集計 → 分析 → シリアライズ → 保存 の各段階の
+時間を測るのだ。結果はJSONで出力し、保存しておいた基準値と比べて遅くなった段階があれば
+終了コード1で終わるので、性能に関わる変更の前後で比べられるのだ。
+
+使い方:
+    python benchmark.py --users 4 --days 30 --output baseline.json
+    python benchmark.py --users 4 --days 30 --baseline baseline.json --tolerance 0.2
+"""
+import argparse
+import logging
+import platform
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from aggregate import aggregate
+from batch_analysis import BATCH_ANALYZERS
+from codec import CODECS, dumps_text, load_file
+from collect import PLUGINS
+from health_connect_client import HealthConnectClient
+from heart_rate import fetch_heart_rate_summary
+from mock_data import MockDataEngine
+from storage import STORAGE_BACKENDS, flatten_record, get_storage
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# 取得するデータタイプ
+FETCH_TYPES = ("steps", "heart_rate", "weight", "sleep", "nutrition")
+
+# 合成データの既定値
+DEFAULT_USERS = 2
+DEFAULT_DAYS = 7
+DEFAULT_STEPS_INTERVAL_SECONDS = 60
+DEFAULT_HEART_RATE_INTERVAL_SECONDS = 1
+DEFAULT_SEED = 42
+DEFAULT_START_DATE = "2024-01-01"
+
+# 基準値より何割遅くなったら回帰とみなすか
+DEFAULT_TOLERANCE = 0.2
+
+
+class SyntheticHealthConnectClient(HealthConnectClient):
+    """
+    シードつきの合成データを返すモッククライアント
+
+    データは mock_data.MockDataEngine で作るので、同じシード・ユーザー番号・期間なら
+    何度読んでも同じレコードを返すのだ。
+    """
+
+    def __init__(self, user_index: int = 0, seed: int = DEFAULT_SEED,
+                 steps_interval_seconds: int = DEFAULT_STEPS_INTERVAL_SECONDS,
+                 heart_rate_interval_seconds: int = DEFAULT_HEART_RATE_INTERVAL_SECONDS,
+                 max_concurrency: int = 4):
+        """
+        Args:
+            user_index: ユーザー番号（ユーザーごとに違うデータになる）
+            seed: 乱数のシード
+            steps_interval_seconds: 歩数レコードの間隔（秒）
+            heart_rate_interval_seconds: 心拍数サンプルの間隔（秒）
+            max_concurrency: read_many で同時に実行する読み取りの最大数
+        """
+        engine = MockDataEngine(seed, user_index, steps_interval_seconds, heart_rate_interval_seconds)
+        super().__init__(mock_mode=True, max_concurrency=max_concurrency, mock_engine=engine)
+        self.user_index = user_index
+        self.seed = seed
+
+
+def measure(func: Callable[[], int], repeat: int) -> Dict[str, Any]:
+    """
+    関数を repeat 回実行して時間を測るのだ
+
+    Args:
+        func: 処理した件数を返す関数
+        repeat: 実行回数
+
+    Returns:
+        {"seconds_min", "seconds_median", "records", "records_per_second"} の辞書
+    """
+    durations = []
+    records = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        records = func()
+        durations.append(time.perf_counter() - started)
+    best = min(durations)
+    return {
+        "seconds_min": round(best, 6),
+        "seconds_median": round(statistics.median(durations), 6),
+        "records": records,
+        "records_per_second": round(records / best, 1) if best > 0 else None,
+    }
+
+
+def build_day_records(records_by_type: Dict[str, List], days: List[datetime]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    取得したレコードを各パイプラインで日ごとに集計して、保存する形にするのだ
+
+    Args:
+        records_by_type: レコードタイプ → レコードのリスト
+        days: 対象日のリスト
+
+    Returns:
+        データタイプ名 → 日付文字列 → 保存するデータ
+    """
+    day_records = {}
+    for plugin in PLUGINS.values():
+        buckets = {day.strftime('%Y-%m-%d'): [] for day in days}
+        for record in records_by_type.get(plugin.record_type) or []:
+            bucket = buckets.get(plugin.day_key(record))
+            if bucket is not None:
+                bucket.append(record)
+        day_records[plugin.name] = {
+            date_str: plugin.build_record(date_str, plugin.summarize(records))
+            for date_str, records in buckets.items()
+        }
+    return day_records
+
+
+def run_benchmarks(users: int = DEFAULT_USERS, days: int = DEFAULT_DAYS, start: str = DEFAULT_START_DATE,
+                   seed: int = DEFAULT_SEED, steps_interval_seconds: int = DEFAULT_STEPS_INTERVAL_SECONDS,
+                   heart_rate_interval_seconds: int = DEFAULT_HEART_RATE_INTERVAL_SECONDS,
+                   repeat: int = 3, scenarios: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    全シナリオを実行して結果をまとめるのだ
+
+    Args:
+        users: ユーザー数
+        days: 日数
+        start: 開始日（YYYY-MM-DD）
+        seed: 乱数のシード
+        steps_interval_seconds: 歩数レコードの間隔（秒）
+        heart_rate_interval_seconds: 心拍数サンプルの間隔（秒）
+        repeat: 各シナリオの実行回数（最小値を比較に使う）
+        scenarios: 実行するシナリオ名の接頭辞（省略時は全て）
+
+    Returns:
+        {"meta": {...}, "results": {シナリオ名: 計測結果}}
+    """
+    start_date = datetime.strptime(start, '%Y-%m-%d')
+    end_date = start_date + timedelta(days=days) - timedelta(seconds=1)
+    day_list = [start_date + timedelta(days=i) for i in range(days)]
+    clients = [
+        SyntheticHealthConnectClient(user, seed, steps_interval_seconds, heart_rate_interval_seconds)
+        for user in range(users)
+    ]
+
+    def selected(name: str) -> bool:
+        return not scenarios or any(name.startswith(prefix) for prefix in scenarios)
+
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def run(name: str, func: Callable[[], int]):
+        if selected(name):
+            results[name] = measure(func, repeat)
+            logger.info(f"{name}: {results[name]['seconds_min'] * 1000:.1f}ms "
+                        f"({results[name]['records']}件, {results[name]['records_per_second']}件/秒)")
+
+    try:
+        # 取得（心拍数は件数が多いので本番と同じく RecordBatch に直接読み込む）
+        list_types = [record_type for record_type in FETCH_TYPES if record_type != "heart_rate"]
+
+        def fetch():
+            count = 0
+            for client in clients:
+                count += sum(len(records) for records in client.read_many_sync(list_types, start_date, end_date).values())
+                count += len(client.read_batch("heart_rate", start_date, end_date))
+            return count
+
+        run("fetch", fetch)
+
+        # 以降のシナリオの入力はまとめて1回だけ作る
+        fetched = [client.read_many_sync(list_types, start_date, end_date) for client in clients]
+        steps_batches = [client.read_batch("steps", start_date, end_date) for client in clients]
+        heart_rate_batches = [client.read_batch("heart_rate", start_date, end_date) for client in clients]
+        day_records = [build_day_records(records_by_type, day_list) for records_by_type in fetched]
+
+        # 集計
+        def aggregate_all():
+            count = 0
+            for steps, heart_rate in zip(steps_batches, heart_rate_batches):
+                aggregate("steps", steps, "day")
+                aggregate("heart_rate", heart_rate, "day")
+                count += len(steps) + len(heart_rate)
+            return count
+
+        def heart_rate_stream():
+            # 本番の収集と同じく、1日ずつページ単位で読みながら集計する（取得の時間も含む）
+            count = 0
+            for client in clients:
+                for day in day_list:
+                    summary = fetch_heart_rate_summary(client, day, day + timedelta(days=1) - timedelta(seconds=1))
+                    count += summary["samples"]
+            return count
+
+        run("aggregate", aggregate_all)
+        run("aggregate.heart_rate_stream", heart_rate_stream)
+
+        # 分析（1日ずつと、列に対してまとめて）
+        analyzed_types = [name for name, plugin in PLUGINS.items() if plugin.analyze]
+
+        def analyze_daily():
+            count = 0
+            for user_records in day_records:
+                for name in analyzed_types:
+                    for record in user_records[name].values():
+                        PLUGINS[name].analyze(record)
+                        count += 1
+            return count
+
+        columns_by_type = {}
+        for name in BATCH_ANALYZERS:
+            columns: Dict[str, List[Any]] = {}
+            rows = [flatten_record(record) for user_records in day_records for record in user_records[name].values()]
+            for row in rows:
+                for column in row:
+                    columns.setdefault(column, [])
+            for column, values in columns.items():
+                values.extend(row.get(column) for row in rows)
+            columns_by_type[name] = columns
+
+        def analyze_batch():
+            return sum(len(BATCH_ANALYZERS[name](columns)) for name, columns in columns_by_type.items())
+
+        run("analyze", analyze_daily)
+        run("analyze.batch", analyze_batch)
+
+        # シリアライズ（インストールされているコーデックごと）
+        all_day_records = [record for user_records in day_records
+                           for records in user_records.values() for record in records.values()]
+        for codec in CODECS.values():
+            if codec.available:
+                run(f"serialize.{codec.name}",
+                    lambda codec=codec: sum(1 for record in all_day_records if codec.encode(record)))
+
+        # 保存（毎回新しいディレクトリに書くので、差分による省略は起きない）
+        for kind in sorted(STORAGE_BACKENDS):
+            def save(kind=kind):
+                count = 0
+                with tempfile.TemporaryDirectory() as base_dir:
+                    for user, user_records in enumerate(day_records):
+                        storage = get_storage(kind, base_dir, user_id=f"user{user}")
+                        try:
+                            for data_type, records in user_records.items():
+                                storage.save_days(data_type, records)
+                                count += len(records)
+                        finally:
+                            storage.close()
+                return count
+
+            run(f"save.{kind}", save)
+    finally:
+        for client in clients:
+            client.close()
+
+    return {
+        "meta": {
+            "users": users,
+            "days": days,
+            "start": start,
+            "seed": seed,
+            "steps_interval_seconds": steps_interval_seconds,
+            "heart_rate_interval_seconds": heart_rate_interval_seconds,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now().isoformat(),
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = DEFAULT_TOLERANCE) -> Dict[str, Dict[str, Any]]:
+    """
+    基準値と比べて、各シナリオの速さの比を求めるのだ
+
+    Args:
+        current: run_benchmarks の結果
+        baseline: 保存しておいた run_benchmarks の結果
+        tolerance: 何割遅くなったら回帰とみなすか
+
+    Returns:
+        シナリオ名 → {"baseline", "current", "ratio", "regressed"}（両方にあるシナリオのみ）
+    """
+    if current["meta"]["users"] != baseline["meta"]["users"] or current["meta"]["days"] != baseline["meta"]["days"]:
+        logger.warning("基準値とユーザー数・日数が違うので、比較結果はあてにならないのだ")
+
+    comparison = {}
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if not base or not base["seconds_min"]:
+            continue
+        ratio = result["seconds_min"] / base["seconds_min"]
+        comparison[name] = {
+            "baseline": base["seconds_min"],
+            "current": result["seconds_min"],
+            "ratio": round(ratio, 3),
+            "regressed": ratio > 1 + tolerance,
+        }
+    return comparison
+
+
+def main(argv=None):
+    """ベンチマークを実行して、必要なら基準値と比べるのだ"""
+    parser = argparse.ArgumentParser(description="収集パイプラインのベンチマークを実行するのだ")
+    parser.add_argument("--users", type=int, default=DEFAULT_USERS, help="ユーザー数")
+    parser.add_argument("--days", type=int, default=DEFAULT_DAYS, help="日数")
+    parser.add_argument("--start", default=DEFAULT_START_DATE, help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="乱数のシード")
+    parser.add_argument("--steps-interval", type=int, default=DEFAULT_STEPS_INTERVAL_SECONDS,
+                        help="歩数レコードの間隔（秒）")
+    parser.add_argument("--heart-rate-interval", type=int, default=DEFAULT_HEART_RATE_INTERVAL_SECONDS,
+                        help="心拍数サンプルの間隔（秒）")
+    parser.add_argument("--repeat", type=int, default=3, help="各シナリオの実行回数（最小値を使う）")
+    parser.add_argument("--scenarios", nargs="+",
+                        help="実行するシナリオ名（接頭辞、例: fetch save.sqlite）")
+    parser.add_argument("--output", help="結果の保存先（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較する基準値（以前の --output）")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="何割遅くなったら回帰とみなすか")
+    args = parser.parse_args(argv)
+
+    # 各段階の INFO ログを出すと、ログの時間まで測ってしまう
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    report = run_benchmarks(args.users, args.days, args.start, args.seed, args.steps_interval,
+                            args.heart_rate_interval, args.repeat, args.scenarios)
+
+    regressed = []
+    if args.baseline:
+        report["comparison"] = compare(report, load_file(args.baseline), args.tolerance)
+        regressed = [name for name, result in report["comparison"].items() if result["regressed"]]
+        for name in regressed:
+            result = report["comparison"][name]
+            logger.error(f"{name}: 基準値の{result['ratio']:.2f}倍遅くなったのだ "
+                         f"({result['baseline'] * 1000:.1f}ms → {result['current'] * 1000:.1f}ms)")
+
+    text = dumps_text(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+        logger.info(f"ベンチマーク結果を保存したのだ: {args.output}")
+    else:
+        print(text)
+    return not regressed
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+cron などから起動するスクリプトの起動時間が予算内かを確認するのだ！
+
+各エントリーポイントを `python -S -X importtime -c "import <module>"` で別プロセスとして起動し、
+- 起動にかかった時間（インタープリタの起動を含む絶対時間、数回測って最小値）
+- このリポジトリのモジュール自身の読み込み時間（-X importtime の自身の時間の合計。
+  標準ライブラリの分はマシンの速さで大きく変わるので含めない）
+- 起動時に読み込んではいけない重いモジュール（使うときまで遅延させるもの）
+を確認して、予算を超えたら終了コード1で終わるのだ。test_check_startup.py から pytest でも確認する。
+
+-S で site を読み込まずに起動するのは、site-packages に入った .pth（証明書を差し込むフックなど）が
+certifi・importlib.resources・zipfile を読み込んで環境によって 40ms 以上かかるからなのだ。
+エントリーポイントは起動時に site-packages のパッケージを何も使わないので（LAZY_MODULES で確認している）、
+-S でもスクリプトの起動にかかる時間はそのまま測れる。
+
+使い方:
+    python check_startup.py
+    python check_startup.py --modules collect --repeat 20 --budget-ms 80
+"""
+import argparse
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# 確認するエントリーポイント
+ENTRY_POINTS = ("fetch_activity", "fetch_weight", "fetch_sleep", "fetch_nutrition", "collect", "multi_user")
+
+# 起動時間の予算（ミリ秒、インタープリタの起動を含む絶対時間）
+# インタープリタだけで 10ms 前後、logging・json・pathlib・typing で 35ms 前後、
+# 一番重い multi_user（全部の fetch_* を読み込む）で 50〜70ms になる
+STARTUP_BUDGET_MS = 100
+
+# このリポジトリのモジュール自身の読み込み時間の予算（ミリ秒、-X importtime の自身の時間の合計）
+# 一番多い multi_user で 13ms 前後（health_connect_client とそのデータクラスは起動時には読み込まない）
+IMPORT_BUDGET_MS = 20
+
+# -X importtime で読み込み時間を測る回数（最小値を使う）
+IMPORTTIME_RUNS = 3
+
+# 起動時に読み込まれてはいけない（使うときまで遅延させる）モジュール
+# dataclasses は inspect ごと読み込まれ、argparse と合わせて 15ms 前後かかるので CLI の引数解析や
+# レコードを作るときまで読み込まない（health_connect_client のレコードも dataclass なので同じ）
+LAZY_MODULES = ("asyncio", "sqlite3", "uuid", "orjson", "msgpack", "cbor2", "cProfile", "tracemalloc",
+                "concurrent.futures", "random", "numpy", "pandas", "matplotlib", "seaborn", "requests",
+                "dataclasses", "argparse", "health_connect_client")
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# このリポジトリのモジュール（読み込み時間の予算の対象）
+PROJECT_MODULES = frozenset(path.stem for path in SCRIPTS_DIR.glob("*.py"))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    -X importtime の出力を (モジュール名, 自身の時間μs, 累積時間μs) のリストにするのだ
+
+    Args:
+        stderr: python -X importtime の標準エラー出力
+
+    Returns:
+        読み込まれた順のリスト
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            # 見出し行
+            continue
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(module: str, repeat: int) -> Dict[str, object]:
+    """
+    1つのモジュールの起動時間を測るのだ
+
+    Args:
+        module: モジュール名
+        repeat: 起動する回数（最小値を使う）
+
+    Returns:
+        {"wall_ms", "import_ms", "imported", "slowest"} の辞書
+    """
+    env = dict(os.environ, PYTHONPATH=str(SCRIPTS_DIR))
+    # cron では .pyc が使われるので、毎回コンパイルし直さないようにキャッシュを有効にして測る
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    command = [sys.executable, "-S", "-c", f"import {module}"]
+
+    # 1回目は .pyc を作るためのウォームアップ。-X importtime 自体が遅くするので、起動時間はつけずに測る
+    subprocess.run(command, cwd=SCRIPTS_DIR, env=env, capture_output=True)
+    wall_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True)
+        wall_times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"{module} を読み込めなかったのだ:\n{result.stderr[-2000:]}")
+
+    project_us = None
+    for _ in range(IMPORTTIME_RUNS):
+        result = subprocess.run([sys.executable, "-X", "importtime", *command[1:]],
+                                cwd=SCRIPTS_DIR, env=env, capture_output=True, text=True)
+        run_entries = parse_importtime(result.stderr)
+        run_us = sum(self_us for name, self_us, _ in run_entries if name in PROJECT_MODULES)
+        if project_us is None or run_us < project_us:
+            project_us, entries = run_us, run_entries
+
+    return {
+        "wall_ms": min(wall_times) * 1000,
+        "import_ms": project_us / 1000,
+        "imported": {name for name, _, _ in entries},
+        "slowest": sorted(entries, key=lambda entry: entry[1], reverse=True)[:5],
+    }
+
+
+def check(modules, repeat: int, budget_ms: float, import_budget_ms: float) -> bool:
+    """
+    全エントリーポイントを測って予算内かを確認するのだ
+
+    Returns:
+        全て予算内かどうか
+    """
+    ok = True
+    for module in modules:
+        stats = measure(module, repeat)
+        eager = sorted(name for name in LAZY_MODULES if name in stats["imported"])
+        within = stats["wall_ms"] <= budget_ms and stats["import_ms"] <= import_budget_ms and not eager
+
+        log = logger.info if within else logger.error
+        log(f"{module}: 起動{stats['wall_ms']:.1f}ms (予算{budget_ms:.0f}ms), "
+            f"読み込み{stats['import_ms']:.1f}ms (予算{import_budget_ms:.0f}ms)")
+        if eager:
+            logger.error(f"{module}: 起動時に読み込まれてはいけないモジュールが読み込まれているのだ: {eager}")
+        if not within:
+            slowest = ", ".join(f"{name} {self_us / 1000:.1f}ms" for name, self_us, _ in stats["slowest"])
+            logger.error(f"{module}: 時間のかかっているモジュール: {slowest}")
+        ok = ok and within
+    return ok
+
+
+def main(argv=None):
+    """起動時間を確認するのだ"""
+    parser = argparse.ArgumentParser(description="エントリーポイントの起動時間が予算内かを確認するのだ")
+    parser.add_argument("--modules", nargs="+", default=list(ENTRY_POINTS), help="確認するモジュール")
+    parser.add_argument("--repeat", type=int, default=10, help="起動する回数（最小値を使う）")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS,
+                        help="起動時間の予算（ミリ秒、インタープリタの起動を含む）")
+    parser.add_argument("--import-budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help="このリポジトリのモジュール自身の読み込み時間の予算（ミリ秒）")
+    args = parser.parse_args(argv)
+
+    if check(args.modules, args.repeat, args.budget_ms, args.import_budget_ms):
+        logger.info("全てのエントリーポイントが起動時間の予算内なのだ")
+        return True
+    logger.error("起動時間の予算を超えたエントリーポイントがあるのだ")
+    return False
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,248 @@
+"""
+保存・読み込みに使うシリアライズ形式（コーデック）なのだ
+
+- json: 既定。orjson が入っていれば orjson（datetime・dataclass・NumPy をそのまま書ける）、
+  なければ標準の json モジュールを使う
+- msgpack: MessagePack（msgpack パッケージが必要）
+- cbor: CBOR（cbor2 パッケージが必要）
+
+読み込むときはファイルの先頭のバイトから形式を判定するので、
+途中でコーデックを切り替えても古いファイルをそのまま読めるのだ。
+"""
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from lazy_imports import is_available
+
+# orjson がなければ標準の json で書く（あっても最初に書き込むまでは読み込まない）。
+# 書き込みはワーカースレッドからも来るので、lazy_import ではなく使う関数の中で import する
+HAS_ORJSON = is_available("orjson")
+
+
+DEFAULT_CODEC = "json"
+
+# CBOR の自己記述タグ（RFC 8949 3.4.6）。MessagePack と見分けるために先頭に付ける
+CBOR_MAGIC = b'\xd9\xd9\xf7'
+
+
+def _default(obj: Any) -> Any:
+    """各形式がそのまま書けない値を書ける値に変換する"""
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if hasattr(obj, "__dataclass_fields__") and not isinstance(obj, type):
+        # dataclass のインスタンスがあるなら dataclasses は読み込み済みなので、ここで import しても重くない
+        import dataclasses
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if hasattr(obj, "tolist"):
+        # NumPy の配列・スカラー
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"シリアライズできない型なのだ: {type(obj).__name__}")
+
+
+class Codec:
+    """シリアライズ形式の基底クラス"""
+
+    # get_codec() で指定する名前
+    name = ""
+    # 保存するファイルの拡張子
+    extension = ""
+    # 必要なパッケージ（標準ライブラリだけで動く場合は None）
+    package = None
+
+    @property
+    def available(self) -> bool:
+        """必要なパッケージが入っているかどうか"""
+        return True
+
+    def encode(self, obj: Any, pretty: bool = False, sort_keys: bool = False) -> bytes:
+        """
+        値をバイト列に変換
+
+        Args:
+            obj: 変換する値
+            pretty: 人が読みやすいように整形する（JSONのみ）
+            sort_keys: 辞書のキーを並べ替える（JSON・CBORのみ）
+
+        Returns:
+            バイト列
+        """
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        """バイト列を値に戻す"""
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """JSON（orjson があれば orjson を使う）"""
+
+    name = "json"
+    extension = ".json"
+
+    def encode(self, obj, pretty=False, sort_keys=False):
+        if HAS_ORJSON:
+            import orjson
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if pretty:
+                option |= orjson.OPT_INDENT_2
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=_default, option=option)
+
+        text = json.dumps(
+            obj, ensure_ascii=False, default=_default, sort_keys=sort_keys,
+            indent=2 if pretty else None, separators=None if pretty else (',', ':')
+        )
+        return text.encode('utf-8')
+
+    def decode(self, data):
+        if HAS_ORJSON:
+            import orjson
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack"""
+
+    name = "msgpack"
+    extension = ".msgpack"
+    package = "msgpack"
+
+    @property
+    def available(self):
+        return is_available(self.package)
+
+    def encode(self, obj, pretty=False, sort_keys=False):
+        import msgpack
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+    def decode(self, data):
+        import msgpack
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+
+
+class CborCodec(Codec):
+    """CBOR（先頭に自己記述タグを付けて書く）"""
+
+    name = "cbor"
+    extension = ".cbor"
+    package = "cbor2"
+
+    @property
+    def available(self):
+        return is_available(self.package)
+
+    def encode(self, obj, pretty=False, sort_keys=False):
+        import cbor2
+        return CBOR_MAGIC + cbor2.dumps(obj, default=lambda encoder, value: encoder.encode(_default(value)),
+                                        canonical=sort_keys)
+
+    def decode(self, data):
+        import cbor2
+        if data.startswith(CBOR_MAGIC):
+            data = data[len(CBOR_MAGIC):]
+        return cbor2.loads(data)
+
+
+JSON_CODEC = JsonCodec()
+
+# 名前 → コーデック
+CODECS: Dict[str, Codec] = {
+    codec.name: codec for codec in (JSON_CODEC, MsgpackCodec(), CborCodec())
+}
+
+# 保存するファイルの拡張子（読み込むときはどれでも探す）
+CODEC_EXTENSIONS = tuple(codec.extension for codec in CODECS.values())
+
+
+def get_codec(name: str = DEFAULT_CODEC) -> Codec:
+    """
+    名前からコーデックを取得するのだ
+
+    Args:
+        name: コーデック名（CODECS のキー）
+
+    Returns:
+        Codecインスタンス
+    """
+    if name not in CODECS:
+        raise ValueError(f"未対応のコーデックなのだ: {name}")
+    codec = CODECS[name]
+    if not codec.available:
+        raise ImportError(f"{name} 形式を使うには {codec.package} をインストールするのだ")
+    return codec
+
+
+def detect_codec(data: bytes) -> Codec:
+    """
+    バイト列の先頭から形式を判定するのだ
+
+    Args:
+        data: 保存されていたバイト列
+
+    Returns:
+        Codecインスタンス
+    """
+    if data.startswith(CBOR_MAGIC):
+        return get_codec("cbor")
+    head = data.lstrip()[:1]
+    if not head or head in b'{["':
+        return JSON_CODEC
+    return get_codec("msgpack")
+
+
+def dumps(obj: Any, codec: str = DEFAULT_CODEC, pretty: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    値をバイト列に変換するのだ
+
+    Args:
+        obj: 変換する値
+        codec: コーデック名
+        pretty: 人が読みやすいように整形する（JSONのみ）
+        sort_keys: 辞書のキーを並べ替える（JSON・CBORのみ）
+
+    Returns:
+        バイト列
+    """
+    return get_codec(codec).encode(obj, pretty=pretty, sort_keys=sort_keys)
+
+
+def dumps_text(obj: Any, pretty: bool = True) -> str:
+    """値をJSON文字列に変換するのだ（標準出力やレポート用）"""
+    return JSON_CODEC.encode(obj, pretty=pretty).decode('utf-8')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    バイト列（または文字列）を値に戻すのだ（形式は自動で判定する）
+
+    Args:
+        data: 保存されていたバイト列
+
+    Returns:
+        値
+    """
+    if isinstance(data, str):
+        return JSON_CODEC.decode(data)
+    return detect_codec(data).decode(data)
+
+
+def load_file(path: Union[str, Path]) -> Any:
+    """
+    ファイルを読み込んで値に戻すのだ（形式は自動で判定する）
+
+    Args:
+        path: ファイルのパス
+
+    Returns:
+        値
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read())
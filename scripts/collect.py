@@ -0,0 +1,630 @@
+#!/usr/bin/env python3
+"""
+全データタイプを1つのプロセスでまとめて収集するのだ！
+
+fetch_activity.py / fetch_weight.py / fetch_sleep.py / fetch_nutrition.py を個別に起動する代わりに、
+Health Connectクライアントの作成・権限確認・日付計算を1回だけ行い、
+登録済みの各データタイプのパイプライン（取得 → 分析 → 保存）を順番に実行するのだ。
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+import fetch_activity
+import fetch_nutrition
+import fetch_sleep
+import fetch_weight
+from analysis_cache import AnalysisCache
+from codec import CODECS, DEFAULT_CODEC
+from daily_summary import update_daily_summary
+from fetch_activity import get_yesterday_date
+from metrics import METRICS_FILE_ENV, export_metrics, span
+from profiling import add_profile_arguments, maybe_profile
+from storage import STORAGE_BACKENDS, JsonDailyStorage, get_storage
+from sync_state import SyncState
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class CollectorPlugin:
+    """
+    データタイプごとの収集パイプライン定義
+
+    モジュールを読み込むときに登録するので dataclass にはしない
+    （dataclasses は inspect ごと読み込まれ、それだけで起動が 10ms 以上遅くなる）
+    """
+
+    def __init__(self, *, name: str, required_permissions: List[str], get_time_range: Callable,
+                 fetch: Callable, save: Callable, build_record: Callable, is_empty: Callable[[dict], bool],
+                 analyze: Optional[Callable] = None, analyzer_version: int = 1, save_when_empty: bool = True,
+                 record_type: Optional[str] = None, summarize: Optional[Callable] = None,
+                 day_offset: timedelta = timedelta(0), daily_fetchers: Optional[Dict[str, Callable]] = None,
+                 finalize: Optional[Callable] = None):
+        self.name = name
+        self.required_permissions = required_permissions
+        self.get_time_range = get_time_range
+        self.fetch = fetch
+        self.save = save
+        self.build_record = build_record
+        self.is_empty = is_empty
+        self.analyze = analyze
+        # 分析ロジックを変えたら上げる（分析キャッシュのキーに含まれる）
+        self.analyzer_version = analyzer_version
+        self.save_when_empty = save_when_empty
+        # 期間まとめ取得用（HealthConnectClient.RECORD_READERS のキー、ないタイプは日ごとに fetch する）
+        self.record_type = record_type
+        self.summarize = summarize
+        # レコードを日付に振り分けるときのずらし幅（睡眠は夜〜翌朝を前日扱いにする）
+        self.day_offset = day_offset
+        # 期間まとめ取得のときに日ごとに追加で取得する値（キー → fetch(client, start_time, end_time)）
+        # 心拍数のように1日に数万件あって期間全体を溜めたくないものはストリームで集計する
+        self.daily_fetchers = daily_fetchers or {}
+        # 保存直前に保存先の情報を使って期間のデータをまとめて補完する処理
+        # finalize(日付 → データ, storage) → 日付 → データ（プロフィールや保存済みの状態を使うトレンド計算など）
+        self.finalize = finalize
+
+    def __repr__(self) -> str:
+        return f"CollectorPlugin(name={self.name!r})"
+
+    def day_key(self, record) -> str:
+        """レコードが属する日付文字列を返すのだ"""
+        return (record.timestamp - self.day_offset).strftime('%Y-%m-%d')
+
+
+# データタイプ名 → パイプライン定義
+PLUGINS: Dict[str, CollectorPlugin] = {}
+
+
+def register_plugin(plugin: CollectorPlugin) -> CollectorPlugin:
+    """
+    収集パイプラインを登録するのだ
+
+    Args:
+        plugin: 登録するパイプライン定義
+
+    Returns:
+        登録したパイプライン定義
+    """
+    PLUGINS[plugin.name] = plugin
+    return plugin
+
+
+register_plugin(CollectorPlugin(
+    name="activity",
+    required_permissions=fetch_activity.REQUIRED_PERMISSIONS,
+    get_time_range=fetch_activity.get_time_range,
+    fetch=fetch_activity.fetch_activity_data_from_health_connect,
+    save=fetch_activity.save_activity_data,
+    build_record=fetch_activity.build_activity_record,
+    is_empty=lambda data: data['steps'] == 0,
+    record_type="steps",
+    summarize=fetch_activity.summarize_activity_records,
+    daily_fetchers={"heart_rate": fetch_activity.fetch_heart_rate},
+))
+
+register_plugin(CollectorPlugin(
+    name="weight",
+    required_permissions=fetch_weight.REQUIRED_PERMISSIONS,
+    get_time_range=fetch_weight.get_time_range,
+    fetch=fetch_weight.fetch_weight_data_from_health_connect,
+    save=fetch_weight.save_weight_data,
+    build_record=fetch_weight.build_weight_record,
+    is_empty=lambda data: data['weight_kg'] == 0.0,
+    record_type="weight",
+    summarize=fetch_weight.summarize_weight_records,
+    finalize=fetch_weight.add_weight_trends,
+))
+
+register_plugin(CollectorPlugin(
+    name="sleep",
+    required_permissions=fetch_sleep.REQUIRED_PERMISSIONS,
+    get_time_range=fetch_sleep.get_time_range,
+    fetch=fetch_sleep.fetch_sleep_data_from_health_connect,
+    save=fetch_sleep.save_sleep_data,
+    build_record=fetch_sleep.build_sleep_record,
+    is_empty=lambda data: data['total_sleep_minutes'] == 0,
+    analyze=fetch_sleep.analyze_sleep_patterns,
+    analyzer_version=fetch_sleep.ANALYZER_VERSION,
+    record_type="sleep",
+    summarize=fetch_sleep.summarize_sleep_records,
+    day_offset=timedelta(hours=12),
+))
+
+register_plugin(CollectorPlugin(
+    name="nutrition",
+    required_permissions=fetch_nutrition.REQUIRED_PERMISSIONS,
+    get_time_range=fetch_nutrition.get_time_range,
+    fetch=fetch_nutrition.fetch_nutrition_data_from_health_connect,
+    save=fetch_nutrition.save_nutrition_data,
+    build_record=fetch_nutrition.build_nutrition_record,
+    is_empty=lambda data: data['calories_consumed'] == 0.0,
+    analyze=fetch_nutrition.analyze_nutrition_balance,
+    analyzer_version=fetch_nutrition.ANALYZER_VERSION,
+    save_when_empty=False,
+    record_type="nutrition",
+    summarize=fetch_nutrition.summarize_nutrition_records,
+))
+
+
+def check_all_permissions(client, plugins):
+    """
+    全パイプラインに必要な権限をまとめて1回で確認するのだ
+
+    Args:
+        client: Health Connectクライアント
+        plugins: 確認対象のパイプライン定義のリスト
+
+    Returns:
+        権限が揃っているパイプライン定義のリスト
+    """
+    required = sorted({perm for plugin in plugins for perm in plugin.required_permissions})
+    permissions = client.check_permissions(required)
+
+    granted_plugins = []
+    for plugin in plugins:
+        missing_permissions = [perm for perm in plugin.required_permissions if not permissions.get(perm)]
+        if missing_permissions:
+            logger.warning(f"[{plugin.name}] 以下の権限が不足しているのだ: {missing_permissions}")
+        else:
+            granted_plugins.append(plugin)
+
+    logger.info(f"Health Connectの権限確認完了なのだ: {[plugin.name for plugin in granted_plugins]}")
+    return granted_plugins
+
+
+def prepare_day(plugin, client, data, analysis_cache=None):
+    """
+    取得済みの1日分のデータを検証・補完して分析するのだ
+
+    Args:
+        plugin: パイプライン定義
+        client: Health Connectクライアント
+        data: 1日分のデータ
+        analysis_cache: 分析キャッシュ（省略時は毎回分析する）
+
+    Returns:
+        保存するデータ、保存しない場合はNone
+    """
+    if not data or plugin.is_empty(data):
+        logger.warning(f"[{plugin.name}] 有効なデータが取得できなかったのだ")
+        if not plugin.save_when_empty:
+            return None
+
+    if plugin.analyze:
+        with span("analyze", data_type=plugin.name) as analyze_span:
+            if analysis_cache is not None:
+                analysis = analysis_cache.analyze(plugin.analyze, data, plugin.analyzer_version)
+            else:
+                analysis = plugin.analyze(data)
+            analyze_span.records = 1
+        logger.info(f"[{plugin.name}] 分析結果: {analysis}")
+
+    return data
+
+
+def process_day(plugin, client, date_str, data, storage, analysis_cache=None):
+    """
+    取得済みの1日分のデータを分析して保存するのだ
+
+    Args:
+        plugin: パイプライン定義
+        client: Health Connectクライアント
+        date_str: 保存する日付文字列
+        data: 1日分のデータ
+        storage: 保存先のストレージ
+        analysis_cache: 分析キャッシュ
+
+    Returns:
+        成功したかどうか
+    """
+    data = prepare_day(plugin, client, data, analysis_cache)
+    if data is None:
+        return False
+
+    if plugin.finalize:
+        data = plugin.finalize({date_str: data}, storage)[date_str]
+
+    return plugin.save(date_str, data, storage=storage) is not None
+
+
+def run_plugin(plugin, client, date_str, target_date, storage, analysis_cache=None):
+    """
+    1つのデータタイプについて取得 → 分析 → 保存を実行するのだ
+
+    Args:
+        plugin: パイプライン定義
+        client: Health Connectクライアント
+        date_str: 保存する日付文字列
+        target_date: 取得対象日
+        storage: 保存先のストレージ
+        analysis_cache: 分析キャッシュ
+
+    Returns:
+        成功したかどうか
+    """
+    start_time, end_time = plugin.get_time_range(target_date)
+    data = plugin.fetch(client, start_time, end_time)
+    return process_day(plugin, client, date_str, data, storage, analysis_cache)
+
+
+def iter_days(start_date, end_date):
+    """開始日から終了日まで（両端を含む）の日付を順に返すのだ"""
+    current_date = start_date
+    while current_date <= end_date:
+        yield current_date
+        current_date += timedelta(days=1)
+
+
+def fetch_all_records(client, plugins, start_date, end_date, since=None):
+    """
+    期間まとめ取得に対応したデータタイプのレコードを並行して取得するのだ
+
+    Args:
+        client: Health Connectクライアント
+        plugins: パイプライン定義のリスト
+        start_date: 開始日
+        end_date: 終了日
+        since: レコードタイプ → ウォーターマーク（指定したタイプはそれより新しいレコードのみ取得）
+
+    Returns:
+        データタイプ名 → レコードのリスト（失敗時は例外オブジェクト） の辞書
+    """
+    ranges = {}
+    for plugin in plugins:
+        if plugin.record_type:
+            range_start, _ = plugin.get_time_range(start_date)
+            _, range_end = plugin.get_time_range(end_date)
+            ranges[plugin.record_type] = (range_start, range_end)
+
+    if not ranges:
+        return {}
+
+    with span("fetch.read_many") as fetch_span:
+        records_by_type = client.read_many_sync(list(ranges), ranges=ranges, return_exceptions=True, since=since)
+        fetch_span.records = sum(len(records) for records in records_by_type.values()
+                                 if not isinstance(records, Exception))
+    return records_by_type
+
+
+def process_range(plugin, client, days, records, storage, analysis_cache=None):
+    """
+    期間全体のレコードを日ごとに振り分けて、まとめて保存するのだ
+
+    Args:
+        plugin: パイプライン定義
+        client: Health Connectクライアント
+        days: 対象日のリスト
+        records: 期間全体のレコードのリスト
+        storage: 保存先のストレージ
+        analysis_cache: 分析キャッシュ
+
+    Returns:
+        全ての日で成功したかどうか
+    """
+    records = records or []
+    logger.info(f"[{plugin.name}] 期間データ取得完了: {len(records)}件")
+
+    # 1回の走査で日ごとに振り分け
+    buckets = {day.strftime('%Y-%m-%d'): [] for day in days}
+    for record in records:
+        bucket = buckets.get(plugin.day_key(record))
+        if bucket is not None:
+            bucket.append(record)
+
+    prepared = {}
+    # データがなく、保存しないことになっている日（栄養など）
+    empty_days = []
+    for day, (date_str, day_records) in zip(days, buckets.items()):
+        data = plugin.summarize(day_records)
+        if plugin.daily_fetchers:
+            start_time, end_time = plugin.get_time_range(day)
+            for key, fetch in plugin.daily_fetchers.items():
+                value = fetch(client, start_time, end_time)
+                if value is not None:
+                    data[key] = value
+
+        data = prepare_day(plugin, client, data, analysis_cache)
+        if data is not None:
+            prepared[date_str] = data
+        elif not plugin.save_when_empty:
+            empty_days.append(date_str)
+
+    # 期間の日をまとめて補完する（プロフィールの読み込みや保存済みの状態の更新は期間ごとに1回）
+    if plugin.finalize and prepared:
+        prepared = plugin.finalize(prepared, storage)
+    to_save = {date_str: plugin.build_record(date_str, data) for date_str, data in prepared.items()}
+
+    # 生のレコードも保存できるストレージ（SQLite）なら一緒に保存する
+    if records and hasattr(storage, 'insert_records'):
+        storage.insert_records(records, plugin.day_key)
+
+    # 全日分を1回でストレージに書き込む
+    written = storage.save_changed_days(plugin.name, to_save) if to_save else set()
+    logger.info(f"[{plugin.name}] {len(written)}日分のデータを保存したのだ"
+                f"（変更なし: {len(to_save) - len(written)}日分, データなし: {len(empty_days)}日分）")
+
+    return len(to_save) + len(empty_days) == len(buckets)
+
+
+def process_changes(plugin, client, days, changed_records, storage, sync_state, analysis_cache=None):
+    """
+    ウォーターマークより新しいレコードがあった日だけを集計し直して保存するのだ
+
+    Args:
+        plugin: パイプライン定義
+        client: Health Connectクライアント
+        days: 対象日のリスト
+        changed_records: ウォーターマークより新しいレコードのリスト
+        storage: 保存先のストレージ
+        sync_state: 同期状態
+        analysis_cache: 分析キャッシュ
+
+    Returns:
+        全ての変更日で成功したかどうか
+    """
+    changed_keys = {plugin.day_key(record) for record in changed_records or []}
+    changed_days = [day for day in days if day.strftime('%Y-%m-%d') in changed_keys]
+    if not changed_days:
+        logger.info(f"[{plugin.name}] 前回の同期から変更がないのでスキップするのだ")
+        return True
+
+    logger.info(f"[{plugin.name}] 変更のあった日: {[day.strftime('%Y-%m-%d') for day in changed_days]}")
+
+    # 1日分の集計には新しいレコードだけでなくその日の全レコードが必要なので、変更日の範囲を取り直す
+    records = fetch_all_records(client, [plugin], changed_days[0], changed_days[-1])[plugin.record_type]
+    if isinstance(records, Exception):
+        raise records
+
+    success = process_range(plugin, client, changed_days, records, storage, analysis_cache)
+    if success:
+        sync_state.advance(plugin.record_type, max(record.timestamp for record in changed_records))
+    return success
+
+
+def collect_range(client, plugin_names=None, start_date=None, end_date=None, base_dir='.', storage=None,
+                  sync_state=None):
+    """
+    指定期間について登録済みのパイプラインをまとめて実行するのだ
+
+    期間まとめ取得に対応したタイプは read_many で並行に1回ずつ取得し、
+    それ以外のタイプは日ごとに fetch するのだ。
+    sync_state を渡すと、前回の同期より新しいレコードがあった日だけを保存し直すのだ。
+
+    Args:
+        client: Health Connectクライアント
+        plugin_names: 実行するデータタイプ名のリスト（省略時は全て）
+        start_date: 開始日
+        end_date: 終了日
+        base_dir: 保存先のベースディレクトリ
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        sync_state: 同期状態（省略時は期間全体を取得して保存する）
+
+    Returns:
+        データタイプ名 → 全ての日で成功したかどうか の辞書
+    """
+    storage = storage or JsonDailyStorage(base_dir)
+    plugins = [PLUGINS[name] for name in (plugin_names or PLUGINS)]
+    days = list(iter_days(start_date, end_date))
+    # 分析結果はデータと同じ場所にキャッシュして、入力が変わらない日は分析し直さない
+    analysis_cache = AnalysisCache(storage.base_dir)
+
+    results = {plugin.name: False for plugin in plugins}
+    granted_plugins = check_all_permissions(client, plugins)
+    since = sync_state.get_watermarks() if sync_state else None
+    records_by_type = fetch_all_records(client, granted_plugins, start_date, end_date, since)
+
+    for plugin in granted_plugins:
+        try:
+            if not plugin.record_type:
+                # 期間取得ができないタイプは日ごとに取得する
+                with span("process", data_type=plugin.name):
+                    results[plugin.name] = all([
+                        run_plugin(plugin, client, day.strftime('%Y-%m-%d'), day, storage, analysis_cache)
+                        for day in days
+                    ])
+                continue
+
+            records = records_by_type[plugin.record_type]
+            if isinstance(records, Exception):
+                raise records
+
+            with span("process", data_type=plugin.name) as process_span:
+                if sync_state:
+                    results[plugin.name] = process_changes(plugin, client, days, records, storage, sync_state,
+                                                              analysis_cache)
+                else:
+                    results[plugin.name] = process_range(plugin, client, days, records, storage, analysis_cache)
+                process_span.records = len(records)
+        except Exception as e:
+            logger.error(f"[{plugin.name}] 処理中に予期しないエラーが発生したのだ: {e}")
+
+    if sync_state:
+        sync_state.save()
+    analysis_cache.save()
+
+    # 書き換わった日だけ日次サマリーを作り直す
+    try:
+        with span("daily_summary") as summary_span:
+            summary_span.records = update_daily_summary(storage, storage.pop_changed_days())
+    except Exception as e:
+        logger.error(f"日次サマリーの更新中にエラーが発生したのだ: {e}")
+
+    return results
+
+
+def collect(client, plugin_names=None, target_date=None, base_dir='.', storage=None, sync_state=None):
+    """
+    登録済みのパイプラインを1つのクライアントでまとめて実行するのだ
+
+    Args:
+        client: Health Connectクライアント
+        plugin_names: 実行するデータタイプ名のリスト（省略時は全て）
+        target_date: 取得対象日（省略時は昨日）
+        base_dir: 保存先のベースディレクトリ
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        sync_state: 同期状態（指定すると前回から変更のあった日だけ保存する）
+
+    Returns:
+        データタイプ名 → 成功したかどうか の辞書
+    """
+    target_date = target_date or datetime.now(timezone.utc) - timedelta(days=1)
+    logger.info(f"取得対象日: {target_date:%Y-%m-%d}")
+    return collect_range(client, plugin_names, target_date, target_date, base_dir, storage, sync_state)
+
+
+def backfill(client, plugin_names=None, start_date=None, end_date=None, base_dir='.', storage=None,
+             sync_state=None):
+    """
+    指定期間の全データタイプをまとめて取得するのだ（バックフィル）
+
+    Args:
+        client: Health Connectクライアント
+        plugin_names: 実行するデータタイプ名のリスト（省略時は全て）
+        start_date: 開始日
+        end_date: 終了日
+        base_dir: 保存先のベースディレクトリ
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        sync_state: 同期状態（指定すると前回から変更のあった日だけ保存する）
+
+    Returns:
+        データタイプ名 → 全ての日で成功したかどうか の辞書
+    """
+    logger.info(f"バックフィル対象期間: {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}")
+    return collect_range(client, plugin_names, start_date, end_date, base_dir, storage, sync_state)
+
+
+def parse_date(value):
+    """YYYY-MM-DD 形式の日付文字列をUTCのdatetimeに変換するのだ"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        import argparse
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD 形式で指定するのだ: {value}")
+
+
+def resolve_date_range(parser, args):
+    """
+    --start/--end の組み合わせを検証し、--end を補完するのだ
+
+    Args:
+        parser: 引数パーサー（エラー表示用）
+        args: 解析済みの引数
+    """
+    if args.end and not args.start:
+        parser.error("--end を指定する場合は --start も指定するのだ")
+    if args.start:
+        args.end = args.end or parse_date(get_yesterday_date())
+        if args.start > args.end:
+            parser.error("--start は --end 以前の日付を指定するのだ")
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析するのだ"""
+    # argparse はコマンドラインから起動したときだけ使うので、ここで読み込む
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Health Connectから全データタイプをまとめて取得するのだ")
+    parser.add_argument(
+        "--types",
+        nargs="+",
+        choices=sorted(PLUGINS),
+        help="取得するデータタイプ（省略時は全て）"
+    )
+    parser.add_argument("--start", type=parse_date, help="バックフィル開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", type=parse_date, help="バックフィル終了日（YYYY-MM-DD、省略時は昨日）")
+    parser.add_argument("--output-dir", default=".", help="保存先のベースディレクトリ（省略時はカレントディレクトリ）")
+    parser.add_argument(
+        "--storage",
+        choices=sorted(STORAGE_BACKENDS),
+        default="json",
+        help="保存形式（json: 1日1ファイル, columnar: 1年1ファイルの列指向, sqlite: 組み込みSQLite）"
+    )
+    parser.add_argument(
+        "--codec",
+        choices=sorted(CODECS),
+        default=DEFAULT_CODEC,
+        help="ファイルの中身の形式（json: 既定, msgpack / cbor: 小さく速いバイナリ形式）"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="前回の同期より新しいレコードがあった日だけを取得・保存する"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help=f"段階ごとの時間と件数の書き出し先（.prom: Prometheus textfile, それ以外: JSON Lines、"
+             f"省略時は環境変数 {METRICS_FILE_ENV}）"
+    )
+    parser.add_argument(
+        "--device",
+        metavar="HOST:PORT",
+        help="端末のコンパニオンアプリ（または device_emulator.py）の接続先。指定すると実モードで取得する"
+    )
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    resolve_date_range(parser, args)
+
+    return args
+
+
+def main(argv=None):
+    """メイン処理なのだ（--profile が指定されていればプロファイルつきで実行する）"""
+    args = parse_args(argv)
+    return maybe_profile("collect", run, args, enabled=args.profile, output_dir=args.profile_dir,
+                         sample_percent=args.profile_sample, memory=args.profile_memory)
+
+
+def run(args):
+    """
+    解析済みの引数で収集を実行するのだ
+
+    Args:
+        args: parse_args() の戻り値
+
+    Returns:
+        全てのデータタイプで成功したかどうか
+    """
+    logger.info("=== Health Connect データ一括取得開始 ===")
+
+    client = None
+    storage = None
+    try:
+        # Health Connectクライアントを1回だけ作成（--device がなければモックモード）
+        from health_connect_client import create_health_connect_client
+        client = create_health_connect_client(mock_mode=not args.device, device_address=args.device)
+
+        storage = get_storage(args.storage, args.output_dir, codec=args.codec)
+        sync_state = SyncState(args.output_dir) if args.incremental else None
+
+        if args.start:
+            results = backfill(client, args.types, args.start, args.end, storage=storage, sync_state=sync_state)
+        else:
+            results = collect(client, args.types, storage=storage, sync_state=sync_state)
+
+        logger.info(f"取得結果: {results}")
+        if all(results.values()):
+            logger.info("=== データ一括取得完了 ===")
+            return True
+        else:
+            logger.error("一部のデータタイプで取得に失敗したのだ")
+            return False
+
+    except Exception as e:
+        logger.error(f"処理中に予期しないエラーが発生したのだ: {e}")
+        return False
+
+    finally:
+        if client is not None:
+            client.close()
+        if storage is not None:
+            storage.close()
+        export_metrics(args.metrics_file, entry_point="collect")
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
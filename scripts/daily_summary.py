@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+アクティビティ・睡眠・栄養・体重を1日1行の日次サマリーにまとめるのだ！
+
+各データタイプを列指向で読み込んで日付で突き合わせ、エネルギー収支などの
+データタイプをまたぐ値も計算して、ストレージに `daily_summary` として保存するのだ。
+睡眠は起床した日の行に入れる（前日の夜に寝た分がその日の行に入る）のだ。
+
+collect.py は保存のたびに書き換わった日だけのサマリーを作り直すので、
+全期間を作り直すのはこのスクリプトを直接実行したときだけなのだ。
+
+使い方:
+    python daily_summary.py --storage columnar --base-dir . --start 2025-01-01
+"""
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Optional
+
+from storage import STORAGE_BACKENDS, get_storage
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# 保存先のデータタイプ名
+SUMMARY_TYPE = "daily_summary"
+
+# サマリーの列 → (データタイプ, 元の列)
+SUMMARY_COLUMNS = {
+    "steps": ("activity", "steps"),
+    "distance_meters": ("activity", "distance_meters"),
+    "active_calories": ("activity", "active_calories"),
+    "total_calories": ("activity", "total_calories"),
+    "resting_heart_rate": ("activity", "heart_rate.resting"),
+    "sleep_minutes": ("sleep", "total_sleep_minutes"),
+    "sleep_efficiency": ("sleep", "sleep_efficiency"),
+    "sleep_quality_score": ("sleep", "sleep_quality_score"),
+    "calories_consumed": ("nutrition", "calories_consumed"),
+    "protein_g": ("nutrition", "protein_g"),
+    "carbs_g": ("nutrition", "carbs_g"),
+    "fat_g": ("nutrition", "fat_g"),
+    "weight_kg": ("weight", "weight_kg"),
+    "weight_ewma_kg": ("weight", "trend.ewma_kg"),
+    "bmi": ("weight", "bmi"),
+}
+
+# データタイプ → 保存日からサマリーの日付へのずらし日数（睡眠は夜の日付で保存されているので起床日へ）
+DAY_SHIFTS = {"sleep": 1}
+
+SOURCE_TYPES = sorted({data_type for data_type, _ in SUMMARY_COLUMNS.values()})
+
+
+def _shift(date_str: str, days: int) -> str:
+    return (date.fromisoformat(date_str) + timedelta(days=days)).isoformat()
+
+
+def load_sources(storage, start_date: Optional[str], end_date: Optional[str]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    各データタイプを列指向で読み込んで、サマリーの日付 → 行 の索引にするのだ
+
+    Args:
+        storage: 読み込み元のストレージ
+        start_date: サマリーの開始日（省略時は最初から）
+        end_date: サマリーの終了日（省略時は最後まで）
+
+    Returns:
+        データタイプ → サマリーの日付 → 平坦化した行
+    """
+    sources = {}
+    for data_type in SOURCE_TYPES:
+        shift = DAY_SHIFTS.get(data_type, 0)
+        columns = storage.load_columns(
+            data_type,
+            _shift(start_date, -shift) if start_date else None,
+            _shift(end_date, -shift) if end_date else None
+        )
+        names = list(columns)
+        index = {}
+        for row in zip(*columns.values()):
+            flat = dict(zip(names, row))
+            index[_shift(flat["date"], shift)] = flat
+        sources[data_type] = index
+    return sources
+
+
+def build_summary_rows(sources: Dict[str, Dict[str, Dict[str, Any]]],
+                       dates: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    日付ごとに各データタイプの行を突き合わせてサマリーの行を作るのだ
+
+    Args:
+        sources: load_sources() の戻り値
+        dates: 作る日付（省略時はどれかのデータタイプにデータがある全ての日）
+
+    Returns:
+        日付 → サマリーの行
+    """
+    if dates is None:
+        dates = {date_str for index in sources.values() for date_str in index}
+
+    rows = {}
+    for date_str in sorted(dates):
+        day_rows = {data_type: index.get(date_str) for data_type, index in sources.items()}
+        if not any(day_rows.values()):
+            continue
+
+        row: Dict[str, Any] = {"date": date_str}
+        for column, (data_type, source_column) in SUMMARY_COLUMNS.items():
+            source_row = day_rows[data_type]
+            row[column] = source_row.get(source_column) if source_row else None
+
+        # データタイプをまたぐ値
+        if row["calories_consumed"] is not None and row["total_calories"]:
+            row["energy_balance_kcal"] = round(row["calories_consumed"] - row["total_calories"], 1)
+        else:
+            row["energy_balance_kcal"] = None
+        row["sources"] = sorted(data_type for data_type, source_row in day_rows.items() if source_row)
+
+        rows[date_str] = row
+    return rows
+
+
+def affected_dates(changed_days: Dict[str, Iterable[str]]) -> set:
+    """
+    書き換わった元データの日付から、作り直しが必要なサマリーの日付を求めるのだ
+
+    Args:
+        changed_days: データタイプ → 書き換わった日付
+
+    Returns:
+        サマリーの日付の集合
+    """
+    dates = set()
+    for data_type, days in changed_days.items():
+        if data_type in SOURCE_TYPES:
+            shift = DAY_SHIFTS.get(data_type, 0)
+            dates.update(_shift(date_str, shift) for date_str in days)
+    return dates
+
+
+def update_daily_summary(storage, changed_days: Dict[str, Iterable[str]]) -> int:
+    """
+    書き換わった元データの日だけサマリーを作り直して保存するのだ
+
+    Args:
+        storage: 読み書きするストレージ
+        changed_days: データタイプ → 書き換わった日付
+
+    Returns:
+        作り直したサマリーの日数
+    """
+    dates = affected_dates(changed_days)
+    if not dates:
+        return 0
+
+    sources = load_sources(storage, min(dates), max(dates))
+    rows = build_summary_rows(sources, dates)
+    if rows:
+        storage.save_days(SUMMARY_TYPE, rows)
+    logger.info(f"日次サマリーを{len(rows)}日分更新したのだ")
+    return len(rows)
+
+
+def rebuild_daily_summary(storage, start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+    """
+    期間内の日次サマリーを全部作り直すのだ
+
+    Args:
+        storage: 読み書きするストレージ
+        start_date: 開始日（省略時は最初から）
+        end_date: 終了日（省略時は最後まで）
+
+    Returns:
+        作ったサマリーの日数
+    """
+    sources = load_sources(storage, start_date, end_date)
+    rows = build_summary_rows(sources)
+    rows = {
+        date_str: row for date_str, row in rows.items()
+        if not (start_date and date_str < start_date) and not (end_date and date_str > end_date)
+    }
+    if rows:
+        storage.save_days(SUMMARY_TYPE, rows)
+    logger.info(f"日次サマリーを{len(rows)}日分作り直したのだ")
+    return len(rows)
+
+
+def main(argv=None):
+    """保存済みのデータから日次サマリーを作り直すのだ"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="データタイプをまたいだ日次サマリーを作るのだ")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS), default="json", help="保存形式")
+    parser.add_argument("--base-dir", default=".", help="保存先のベースディレクトリ")
+    parser.add_argument("--start", help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", help="終了日（YYYY-MM-DD）")
+    args = parser.parse_args(argv)
+
+    storage = get_storage(args.storage, args.base_dir)
+    try:
+        rebuild_daily_summary(storage, args.start, args.end)
+    finally:
+        storage.close()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+端末のコンパニオンアプリの代わりに device_protocol を話すスタンドインサーバーなのだ！
+
+実機がなくても実モード（mock_mode=False）の HealthConnectClient を動かせるよう、
+mock_data.MockDataEngine で作ったデータを端末と同じフレームで返すのだ。
+複数のデータタイプを頼まれたときは、実機と同じく各タイプのチャンクを交互に送る。
+
+使い方:
+    python device_emulator.py --port 8787 --seed 42
+    python collect.py --device 127.0.0.1:8787
+
+    # 同じプロセスで動かす場合
+    emulator = DeviceEmulator(("127.0.0.1", 0), seed=42)
+    address = emulator.start_background()
+"""
+import argparse
+import logging
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+
+from codec import JSON_CODEC
+from device_protocol import (
+    ALL_PARTS, BATCH, CANCEL, DEFAULT_CHUNK_SIZE, DEFAULT_PORT, END, ERROR, HELLO, PROTOCOL_VERSION,
+    RECORDS, REQUEST, RESULT, encode_batch, frame, read_frame
+)
+from health_connect_client import BATCH_COLUMNS
+from mock_data import RECORD_TYPES, MockDataEngine
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# 1チャンクの件数の上限（クライアントがもっと大きく頼んでもこれで区切る）
+MAX_CHUNK_SIZE = 65536
+# 1接続で同時に処理するリクエスト数
+MAX_CONCURRENT_REQUESTS = 4
+
+# 列の型コード → 送るときのリトルエンディアンの型
+_WIRE_DTYPES = {"q": "<i8", "d": "<f8"}
+
+
+def _datetime(millis: Optional[int]) -> Optional[datetime]:
+    return None if millis is None else datetime.fromtimestamp(millis / 1000, tz=timezone.utc)
+
+
+class _Connection(socketserver.BaseRequestHandler):
+    """1本の接続を処理する（リクエストはスレッドプールで並行に処理する）"""
+
+    server: "DeviceEmulator"
+
+    def setup(self):
+        self.send_lock = threading.Lock()
+        self.cancelled: Set[int] = set()
+        self.executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS,
+                                           thread_name_prefix="device-emulator")
+
+    def send(self, frame_type: int, stream_id: int, payload: bytes = b"", part: int = 0):
+        with self.send_lock:
+            self.request.sendall(frame(frame_type, stream_id, payload, part))
+
+    def handle(self):
+        sock: socket.socket = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            frame_type, _, _, payload = read_frame(sock)
+            if frame_type != HELLO:
+                return
+            logger.info(f"クライアントが接続したのだ: {self.client_address} {JSON_CODEC.decode(payload)}")
+            self.send(HELLO, 0, JSON_CODEC.encode({
+                "protocol": PROTOCOL_VERSION, "device": "device_emulator", "record_types": list(RECORD_TYPES)
+            }))
+            while True:
+                frame_type, _, stream_id, payload = read_frame(sock)
+                if frame_type == REQUEST:
+                    self.executor.submit(self.process, stream_id, JSON_CODEC.decode(payload))
+                elif frame_type == CANCEL:
+                    self.cancelled.add(stream_id)
+        except (ConnectionError, OSError):
+            logger.info(f"クライアントが切断したのだ: {self.client_address}")
+
+    def finish(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def process(self, stream_id: int, request: Dict[str, Any]):
+        """1リクエストを処理して応答を送る"""
+        try:
+            if self.server.latency_seconds:
+                time.sleep(self.server.latency_seconds)
+            op = request.get("op")
+            if op == "read":
+                self.read(stream_id, request)
+            elif op == "permissions":
+                granted = {permission: permission not in self.server.denied_permissions
+                           for permission in request.get("permissions", [])}
+                self.send(RESULT, stream_id, JSON_CODEC.encode({"granted": granted}))
+            elif op == "insert":
+                self.server.inserted.append(request["record"])
+                self.send(RESULT, stream_id, JSON_CODEC.encode({"inserted": 1}))
+            else:
+                raise ValueError(f"未対応の操作なのだ: {op}")
+        except OSError:
+            pass
+        except Exception as e:
+            logger.error(f"リクエストの処理に失敗したのだ: {e}")
+            try:
+                self.send(ERROR, stream_id, JSON_CODEC.encode({"message": str(e)}), ALL_PARTS)
+            except OSError:
+                pass
+        finally:
+            self.cancelled.discard(stream_id)
+
+    def read(self, stream_id: int, request: Dict[str, Any]):
+        """データタイプごとのチャンクを交互に送る"""
+        chunk_size = min(int(request.get("chunk_size") or DEFAULT_CHUNK_SIZE), MAX_CHUNK_SIZE)
+        parts = {part: self.server.chunks(read, chunk_size) for part, read in enumerate(request["reads"])}
+        counts = dict.fromkeys(parts, 0)
+        while parts:
+            for part in list(parts):
+                if stream_id in self.cancelled:
+                    return
+                try:
+                    frame_type, count, payload = next(parts[part])
+                except StopIteration:
+                    del parts[part]
+                    self.send(END, stream_id, JSON_CODEC.encode({"count": counts[part]}), part)
+                    continue
+                except Exception as e:
+                    del parts[part]
+                    self.send(ERROR, stream_id, JSON_CODEC.encode({"message": str(e)}), part)
+                    continue
+                counts[part] += count
+                self.send(frame_type, stream_id, payload, part)
+
+
+class DeviceEmulator(socketserver.ThreadingTCPServer):
+    """スタンドインサーバー"""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", DEFAULT_PORT), seed: Optional[int] = None,
+                 engine: Optional[MockDataEngine] = None, latency_ms: float = 0,
+                 denied_permissions: Optional[List[str]] = None):
+        """
+        Args:
+            address: 待ち受けるアドレス（ポート0なら空いているポート）
+            seed: データのシード（engine を指定しない場合）
+            engine: データを作るエンジン（間隔などを変えたいとき）
+            latency_ms: 1リクエストごとに待つミリ秒（端末との往復の遅さを再現する）
+            denied_permissions: 許可されていないことにする権限
+        """
+        super().__init__(address, _Connection)
+        self.engine = engine or MockDataEngine(seed=seed)
+        self.latency_seconds = latency_ms / 1000
+        self.denied_permissions = set(denied_permissions or [])
+        # insert で受け取ったレコード
+        self.inserted: List[Dict[str, Any]] = []
+
+    def chunks(self, read: Dict[str, Any], chunk_size: int) -> Iterator[tuple]:
+        """
+        1つのデータタイプの読み取りをチャンクに分けて作る
+
+        Yields:
+            (フレームの種類, 件数, ペイロード)
+        """
+        record_type = read["record_type"]
+        if record_type not in RECORD_TYPES:
+            raise ValueError(f"未対応のデータタイプなのだ: {record_type}")
+        start, end, since = _datetime(read["start"]), _datetime(read["end"]), read.get("since")
+
+        if record_type in BATCH_COLUMNS:
+            for timestamps, columns in self.engine.iter_columns(record_type, start, end):
+                if since is not None:
+                    mask = timestamps > since
+                    timestamps = timestamps[mask]
+                    columns = {name: column[mask] for name, column in columns.items()}
+                for i in range(0, len(timestamps), chunk_size):
+                    j = i + chunk_size
+                    # 文字列の列は心拍数の measurement_type だけ（エンジンのサンプルは全て "sample"）
+                    wire = {
+                        name: np.ascontiguousarray(columns[name][i:j], dtype=_WIRE_DTYPES[typecode]) if typecode
+                        else ["sample"] * len(timestamps[i:j])
+                        for name, typecode in BATCH_COLUMNS[record_type].items()
+                    }
+                    chunk = np.ascontiguousarray(timestamps[i:j], dtype="<i8")
+                    yield BATCH, len(chunk), encode_batch(record_type, chunk, wire)
+            return
+
+        records = []
+        for record in self.engine.iter_records(record_type, start, end):
+            fields = record.to_dict()
+            fields["timestamp"] = int(record.timestamp.timestamp() * 1000)
+            del fields["record_type"]
+            if since is not None and fields["timestamp"] <= since:
+                continue
+            records.append(fields)
+            if len(records) >= chunk_size:
+                yield RECORDS, len(records), JSON_CODEC.encode(records)
+                records = []
+        if records:
+            yield RECORDS, len(records), JSON_CODEC.encode(records)
+
+    def start_background(self) -> str:
+        """
+        別スレッドで待ち受けを始める
+
+        Returns:
+            接続先の "host:port"
+        """
+        threading.Thread(target=self.serve_forever, name="device-emulator", daemon=True).start()
+        host, port = self.server_address[:2]
+        return f"{host}:{port}"
+
+
+def main(argv=None):
+    """メイン処理なのだ"""
+    parser = argparse.ArgumentParser(description="Health Connect のコンパニオンアプリの代わりに応答するのだ")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けるポート")
+    parser.add_argument("--seed", type=int, help="データのシード（省略時は毎回変わる）")
+    parser.add_argument("--latency-ms", type=float, default=0, help="1リクエストごとに待つミリ秒")
+    parser.add_argument("--deny", nargs="*", default=[], help="許可されていないことにする権限")
+    args = parser.parse_args(argv)
+
+    emulator = DeviceEmulator((args.host, args.port), seed=args.seed, latency_ms=args.latency_ms,
+                              denied_permissions=args.deny)
+    logger.info(f"スタンドインサーバーを起動したのだ: {args.host}:{args.port}")
+    try:
+        emulator.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("スタンドインサーバーを停止したのだ")
+    finally:
+        emulator.server_close()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,588 @@
+"""
+Android 端末のコンパニオンアプリと Health Connect のデータをやり取りするのだ
+
+端末のコンパニオンアプリは TCP でこのプロトコルを待ち受け、PC からは
+`adb forward` で転送したポート（またはスタンドインサーバー device_emulator.py）に
+1本の接続を張りっぱなしにして、何度でも読み取りを送るのだ。
+
+フレーム（数値は全てリトルエンディアン）:
+    ヘッダー 10バイト: 種類 uint8, パート番号 uint8, ストリームID uint32, ペイロード長 uint32
+    ペイロード: 種類ごとの形式（下記）
+
+- HELLO (PC ⇄ 端末): 接続直後に1回ずつ。JSON {"protocol": 1, ...}
+- REQUEST (PC → 端末): JSON。ストリームIDは PC が決める
+    {"op": "read", "reads": [{"record_type", "start", "end", "since"}...], "chunk_size": N}
+    （時刻はUNIXエポックのミリ秒。複数のデータタイプを1回のリクエストで頼め、
+     パート番号は reads の何番目かを表す）
+    {"op": "permissions", "permissions": [...]}
+    {"op": "insert", "record": {"record_type", "timestamp", ...}}
+- BATCH (端末 → PC): 歩数・心拍数など BATCH_COLUMNS にあるタイプの列指向のチャンク
+    件数 uint32, タイムスタンプ int64 x 件数, 数値の列 (int64 / float64) x 件数 を BATCH_COLUMNS の順に,
+    文字列などの列は 長さ uint32 + JSON の配列
+- RECORDS (端末 → PC): それ以外のタイプのチャンク。JSON のレコードの配列（timestamp はミリ秒）
+- END (端末 → PC): パートの終わり。JSON {"count": 件数}
+- RESULT (端末 → PC): read 以外のリクエストの結果。JSON
+- ERROR (端末 → PC): JSON {"message": ...}。パート番号が ALL_PARTS ならリクエスト全体の失敗
+- CANCEL (PC → 端末): ストリームの残りを送らなくてよい（途中で読むのをやめたとき）
+
+端末は複数のリクエストのチャンクを交互に送ってよい（ストリームIDで振り分ける）。
+
+    connection = DeviceConnection.from_address("127.0.0.1:8787")
+    futures = connection.read_many({"steps": (start, end, None), "sleep": (start, end, None)})
+    steps = futures["steps"].result()
+"""
+import logging
+import os
+import queue
+import socket
+import struct
+import subprocess
+import sys
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from codec import JSON_CODEC
+from health_connect_client import BATCH_COLUMNS, RECORD_CLASSES, HealthRecord, RecordBatch
+
+
+logger = logging.getLogger(__name__)
+
+
+PROTOCOL_VERSION = 1
+
+# 接続先を指定する環境変数（host:port）と、adb forward を使う端末のシリアル番号
+DEVICE_ADDRESS_ENV = "HEALTH_CONNECT_ADDRESS"
+ADB_SERIAL_ENV = "HEALTH_CONNECT_ADB_SERIAL"
+
+DEFAULT_HOST = "127.0.0.1"
+# コンパニオンアプリが端末上で待ち受けるポート（PC 側も同じ番号に転送する）
+DEFAULT_PORT = 8787
+# 1フレームを待つ最大秒数
+DEFAULT_TIMEOUT = 30.0
+# 端末に頼む1チャンクの最大件数
+DEFAULT_CHUNK_SIZE = 8192
+# 壊れたデータで巨大なバッファを確保しないための1フレームの上限
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+FRAME_HEADER = struct.Struct("<BBII")
+COUNT = struct.Struct("<I")
+
+# フレームの種類
+HELLO = 1
+REQUEST = 2
+BATCH = 3
+RECORDS = 4
+END = 5
+RESULT = 6
+ERROR = 7
+CANCEL = 8
+
+# ERROR のパート番号: リクエスト全体の失敗
+ALL_PARTS = 0xFF
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    """
+    ちょうど size バイト受け取る
+
+    Raises:
+        ConnectionError: 途中で接続が切れた場合
+    """
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        try:
+            n = sock.recv_into(view[received:])
+        except socket.timeout:
+            if received:
+                # フレームの途中で止まったら、続きを読んでも区切りがずれるので接続ごと捨てる
+                raise ConnectionError("端末からのフレームが途中で止まったのだ")
+            raise
+        if n == 0:
+            raise ConnectionError("端末との接続が切れたのだ")
+        received += n
+    return bytes(buffer)
+
+
+def read_frame(sock: socket.socket) -> Tuple[int, int, int, bytes]:
+    """
+    1フレーム読む
+
+    Returns:
+        (種類, パート番号, ストリームID, ペイロード)
+    """
+    frame_type, part, stream_id, length = FRAME_HEADER.unpack(recv_exact(sock, FRAME_HEADER.size))
+    if length > MAX_FRAME_BYTES:
+        raise ConnectionError(f"フレームが大きすぎるのだ: {length}バイト")
+    return frame_type, part, stream_id, recv_exact(sock, length) if length else b""
+
+
+def frame(frame_type: int, stream_id: int, payload: bytes = b"", part: int = 0) -> bytes:
+    """1フレーム分のバイト列を作る"""
+    return FRAME_HEADER.pack(frame_type, part, stream_id, len(payload)) + payload
+
+
+def to_millis(value: Optional[datetime]) -> Optional[int]:
+    """datetime をUNIXエポックのミリ秒にする（Noneはそのまま）"""
+    return None if value is None else int(value.timestamp() * 1000)
+
+
+def encode_batch(record_type: str, timestamps, columns: Dict[str, Any]) -> bytes:
+    """
+    BATCH フレームのペイロードを作る
+
+    Args:
+        record_type: BATCH_COLUMNS のキー
+        timestamps: ミリ秒の int64 配列（リトルエンディアンのバッファ）
+        columns: 列名 → 配列（数値の列はリトルエンディアンのバッファ、それ以外はリスト）
+
+    Returns:
+        ペイロード
+    """
+    parts = [COUNT.pack(len(timestamps)), memoryview(timestamps).cast('B')]
+    for name, typecode in BATCH_COLUMNS[record_type].items():
+        if typecode:
+            parts.append(memoryview(columns[name]).cast('B'))
+        else:
+            encoded = JSON_CODEC.encode(list(columns[name]))
+            parts += [COUNT.pack(len(encoded)), encoded]
+    return b"".join(parts)
+
+
+def decode_batch_into(batch: RecordBatch, payload: bytes):
+    """BATCH フレームのペイロードを batch の後ろに追加する"""
+    (count,) = COUNT.unpack_from(payload)
+    view = memoryview(payload)
+    offset = COUNT.size
+
+    def take(size: int) -> memoryview:
+        nonlocal offset
+        chunk = view[offset:offset + size]
+        if len(chunk) != size:
+            raise ValueError("BATCH フレームが途中で切れているのだ")
+        offset += size
+        return chunk
+
+    arrays = [(batch.timestamps, take(count * 8))]
+    lists = []
+    for name, column in batch.columns.items():
+        if isinstance(column, list):
+            (length,) = COUNT.unpack(take(COUNT.size))
+            lists.append((column, JSON_CODEC.decode(bytes(take(length)))))
+        else:
+            arrays.append((column, take(count * column.itemsize)))
+
+    for column, data in arrays:
+        start = len(column)
+        column.frombytes(data)
+        if sys.byteorder == "big":
+            # 後ろに足した分だけ並べ替える
+            tail = column[start:]
+            tail.byteswap()
+            column[start:] = tail
+    for column, values in lists:
+        column.extend(values)
+
+
+def records_from_payload(record_type: str, payload: bytes, tzinfo=None) -> List[HealthRecord]:
+    """RECORDS フレームのペイロードをレコードに戻す"""
+    record_class = RECORD_CLASSES[record_type]
+    records = []
+    for fields in JSON_CODEC.decode(payload):
+        fields["timestamp"] = datetime.fromtimestamp(fields["timestamp"] / 1000, tz=tzinfo)
+        fields["record_type"] = record_type
+        records.append(record_class(**fields))
+    return records
+
+
+def adb_forward(port: int = DEFAULT_PORT, device_port: int = DEFAULT_PORT, serial: Optional[str] = None):
+    """
+    PC のポートを端末のコンパニオンアプリのポートへ転送する（adb コマンドが必要）
+
+    Args:
+        port: PC 側のポート
+        device_port: 端末側のポート
+        serial: 端末のシリアル番号（1台だけつながっているならNone）
+    """
+    command = ["adb"] + (["-s", serial] if serial else []) + ["forward", f"tcp:{port}", f"tcp:{device_port}"]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ConnectionError(f"adb forward に失敗したのだ: {result.stderr.strip()}")
+    logger.info(f"adb forward を設定したのだ: tcp:{port} → 端末 tcp:{device_port}")
+
+
+class _Stream:
+    """1リクエスト分の応答の受け取り先（受信スレッドから deliver が呼ばれる）"""
+
+    def __init__(self, parts: int):
+        self.open_parts = set(range(parts))
+
+    def deliver(self, frame_type: int, part: int, payload: bytes) -> bool:
+        """フレームを受け取る。リクエストの応答が全て届いたら True を返す"""
+        raise NotImplementedError
+
+    def fail(self, error: Exception):
+        """接続が切れたときなどに、残りのパートを失敗させる"""
+        raise NotImplementedError
+
+
+class _QueueStream(_Stream):
+    """フレームをキューに入れて、読む側のスレッドに渡す"""
+
+    def __init__(self, parts: int = 1):
+        super().__init__(parts)
+        self.frames: "queue.Queue[Tuple[int, int, Any]]" = queue.Queue()
+
+    def deliver(self, frame_type, part, payload):
+        self.frames.put((frame_type, part, payload))
+        if frame_type in (END, ERROR):
+            self.open_parts.discard(part)
+            if part == ALL_PARTS:
+                self.open_parts.clear()
+        return frame_type == RESULT or not self.open_parts
+
+    def fail(self, error):
+        self.frames.put((ERROR, ALL_PARTS, error))
+
+
+class _CollectStream(_Stream):
+    """パートごとにレコードを溜めて、終わったパートから Future を完了させる"""
+
+    def __init__(self, record_types: List[str], tzinfos: List[Any]):
+        super().__init__(len(record_types))
+        self.record_types = record_types
+        self.tzinfos = tzinfos
+        self.records: List[List[HealthRecord]] = [[] for _ in record_types]
+        self.batches: List[Optional[RecordBatch]] = [None] * len(record_types)
+        self.futures: List[Future] = [Future() for _ in record_types]
+
+    def deliver(self, frame_type, part, payload):
+        if frame_type == ERROR:
+            message = JSON_CODEC.decode(payload).get("message", "")
+            parts = list(self.open_parts) if part == ALL_PARTS else [part]
+            for index in parts:
+                self._finish(index, RuntimeError(f"端末での読み取りに失敗したのだ: {message}"))
+        elif part in self.open_parts:
+            record_type = self.record_types[part]
+            try:
+                if frame_type == BATCH:
+                    if self.batches[part] is None:
+                        self.batches[part] = RecordBatch(record_type, tzinfo=self.tzinfos[part])
+                    decode_batch_into(self.batches[part], payload)
+                elif frame_type == RECORDS:
+                    self.records[part].extend(records_from_payload(record_type, payload, self.tzinfos[part]))
+                elif frame_type == END:
+                    batch = self.batches[part]
+                    self._finish(part, (batch.to_records() if batch else []) + self.records[part])
+            except Exception as e:
+                self._finish(part, e)
+        return not self.open_parts
+
+    def _finish(self, part: int, result):
+        self.open_parts.discard(part)
+        if isinstance(result, Exception):
+            self.futures[part].set_exception(result)
+        else:
+            self.futures[part].set_result(result)
+
+    def fail(self, error):
+        for part in list(self.open_parts):
+            self._finish(part, error)
+
+
+class DeviceConnection:
+    """
+    コンパニオンアプリとの1本の接続（スレッドセーフ）
+
+    接続は最初のリクエストで張り、切れるまで使い回す（切れたら次のリクエストで張り直す）。
+    応答は受信スレッドがストリームIDごとに振り分けるので、複数のスレッドから同時に
+    リクエストを送れるのだ。
+    """
+
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = DEFAULT_TIMEOUT,
+                 adb_serial: Optional[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            host: 接続先（adb forward を使う場合は 127.0.0.1）
+            port: 接続先のポート
+            timeout: 接続と、応答の1フレームを待つ最大秒数
+            adb_serial: 指定すると、接続の前にこの端末へ adb forward する
+            chunk_size: 端末に頼む1チャンクの最大件数
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.adb_serial = adb_serial
+        self.chunk_size = chunk_size
+        self.device_info: Dict[str, Any] = {}
+
+        self._sock: Optional[socket.socket] = None
+        self._connect_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._streams: Dict[int, _Stream] = {}
+        self._streams_lock = threading.Lock()
+        self._next_stream_id = 1
+
+    @classmethod
+    def from_address(cls, address: Optional[str] = None, **kwargs) -> "DeviceConnection":
+        """
+        "host:port" から作成（省略時は環境変数 HEALTH_CONNECT_ADDRESS、なければ 127.0.0.1:8787）
+
+        環境変数 HEALTH_CONNECT_ADB_SERIAL があれば、その端末へ adb forward してから接続する。
+        """
+        address = address or os.getenv(DEVICE_ADDRESS_ENV) or f"{DEFAULT_HOST}:{DEFAULT_PORT}"
+        host, _, port = address.rpartition(":")
+        kwargs.setdefault("adb_serial", os.getenv(ADB_SERIAL_ENV))
+        return cls(host or DEFAULT_HOST, int(port), **kwargs)
+
+    # ---- 接続 ----
+
+    def _connect(self) -> socket.socket:
+        """接続していなければ接続して HELLO を交換する"""
+        with self._connect_lock:
+            if self._sock is not None:
+                return self._sock
+
+            if self.adb_serial:
+                adb_forward(self.port, DEFAULT_PORT, self.adb_serial)
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            try:
+                sock.sendall(frame(HELLO, 0, JSON_CODEC.encode({"protocol": PROTOCOL_VERSION})))
+                frame_type, _, _, payload = read_frame(sock)
+                hello = JSON_CODEC.decode(payload) if frame_type == HELLO else {}
+                if hello.get("protocol") != PROTOCOL_VERSION:
+                    raise ConnectionError(f"端末のプロトコルに対応していないのだ: {hello}")
+            except Exception:
+                sock.close()
+                raise
+
+            self.device_info = hello
+            self._sock = sock
+            threading.Thread(target=self._receive, args=(sock,), name="health-connect-device", daemon=True).start()
+            logger.info(f"端末に接続したのだ: {self.host}:{self.port} ({hello.get('device', '不明な端末')})")
+            return sock
+
+    def _receive(self, sock: socket.socket):
+        """受信スレッド: フレームをストリームごとに振り分ける"""
+        error: Exception = ConnectionError("端末との接続が閉じられたのだ")
+        try:
+            while True:
+                try:
+                    frame_type, part, stream_id, payload = read_frame(sock)
+                except socket.timeout:
+                    with self._streams_lock:
+                        waiting = bool(self._streams)
+                    if waiting:
+                        raise TimeoutError(f"端末から{self.timeout}秒応答がないのだ")
+                    # 待っている応答がなければ接続を保ったまま待つ
+                    continue
+                with self._streams_lock:
+                    stream = self._streams.get(stream_id)
+                if stream is not None and stream.deliver(frame_type, part, payload):
+                    with self._streams_lock:
+                        self._streams.pop(stream_id, None)
+        except Exception as e:
+            error = e
+        finally:
+            self._drop(sock, error)
+
+    def _drop(self, sock: socket.socket, error: Exception):
+        """接続を捨てて、応答を待っているストリームを全て失敗させる"""
+        with self._connect_lock:
+            if self._sock is sock:
+                self._sock = None
+        try:
+            sock.close()
+        except OSError:
+            pass
+        with self._streams_lock:
+            streams = list(self._streams.values())
+            self._streams.clear()
+        for stream in streams:
+            stream.fail(error)
+        if streams:
+            logger.error(f"端末との接続が切れたのだ: {error}")
+
+    def close(self):
+        """接続を閉じる"""
+        with self._connect_lock:
+            sock = self._sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._drop(sock, ConnectionError("接続を閉じたのだ"))
+
+    # ---- リクエスト ----
+
+    def _send_request(self, request: Dict[str, Any], stream: _Stream) -> int:
+        """リクエストを送り、応答の受け取り先を登録する"""
+        sock = self._connect()
+        with self._streams_lock:
+            stream_id = self._next_stream_id
+            self._next_stream_id = self._next_stream_id % 0xFFFFFFFF + 1
+            self._streams[stream_id] = stream
+        try:
+            with self._send_lock:
+                sock.sendall(frame(REQUEST, stream_id, JSON_CODEC.encode(request)))
+        except OSError as e:
+            self._drop(sock, e)
+            raise ConnectionError(f"端末へのリクエストの送信に失敗したのだ: {e}") from e
+        return stream_id
+
+    def _cancel(self, stream_id: int):
+        """ストリームの残りを捨てる（端末にも送らなくてよいと伝える）"""
+        with self._streams_lock:
+            if self._streams.pop(stream_id, None) is None:
+                return
+        sock = self._sock
+        if sock is None:
+            return
+        try:
+            with self._send_lock:
+                sock.sendall(frame(CANCEL, stream_id))
+        except OSError:
+            pass
+
+    def _frames(self, stream_id: int, stream: _QueueStream) -> Iterator[Tuple[int, int, Any]]:
+        """キューに届いたフレームを順に返す（ERROR は例外にする）"""
+        finished = False
+        try:
+            while True:
+                try:
+                    frame_type, part, payload = stream.frames.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"端末から{self.timeout}秒応答がないのだ")
+                if frame_type == ERROR:
+                    finished = True
+                    if isinstance(payload, Exception):
+                        raise payload
+                    raise RuntimeError(f"端末での処理に失敗したのだ: {JSON_CODEC.decode(payload).get('message', '')}")
+                if frame_type in (RESULT, END):
+                    finished = True
+                yield frame_type, part, payload
+                if finished:
+                    return
+        finally:
+            if not finished:
+                self._cancel(stream_id)
+
+    def _call(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """結果が1つだけのリクエストを送って RESULT を受け取る"""
+        stream = _QueueStream()
+        stream_id = self._send_request(request, stream)
+        for frame_type, _, payload in self._frames(stream_id, stream):
+            if frame_type == RESULT:
+                return JSON_CODEC.decode(payload)
+        return {}
+
+    @staticmethod
+    def _read_spec(record_type: str, start_date: datetime, end_date: datetime,
+                   since: Optional[datetime]) -> Dict[str, Any]:
+        return {"record_type": record_type, "start": to_millis(start_date),
+                "end": to_millis(end_date), "since": to_millis(since)}
+
+    def check_permissions(self, permission_types: List[str]) -> Dict[str, bool]:
+        """
+        権限が許可されているかを端末に問い合わせる
+
+        Args:
+            permission_types: 確認する権限のリスト
+
+        Returns:
+            権限 → 許可されているか
+        """
+        result = self._call({"op": "permissions", "permissions": list(permission_types)})
+        granted = result.get("granted", {})
+        return {permission: bool(granted.get(permission)) for permission in permission_types}
+
+    def insert_record(self, record: HealthRecord) -> bool:
+        """
+        レコードを端末の Health Connect に書き込む
+
+        Returns:
+            書き込めたかどうか
+        """
+        fields = record.to_dict()
+        fields["timestamp"] = to_millis(record.timestamp)
+        return bool(self._call({"op": "insert", "record": fields}).get("inserted"))
+
+    def iter_records(self, record_type: str, start_date: datetime, end_date: datetime,
+                     since: Optional[datetime] = None) -> Iterator[HealthRecord]:
+        """
+        1種類のデータタイプを読み、届いたチャンクから1件ずつ返す
+
+        途中で読むのをやめると（ジェネレーターを閉じると）端末に CANCEL を送る。
+        """
+        stream = _QueueStream()
+        stream_id = self._send_request(
+            {"op": "read", "reads": [self._read_spec(record_type, start_date, end_date, since)],
+             "chunk_size": self.chunk_size},
+            stream
+        )
+        tzinfo = start_date.tzinfo
+        for frame_type, _, payload in self._frames(stream_id, stream):
+            if frame_type == BATCH:
+                batch = RecordBatch(record_type, tzinfo=tzinfo)
+                decode_batch_into(batch, payload)
+                yield from batch
+            elif frame_type == RECORDS:
+                yield from records_from_payload(record_type, payload, tzinfo)
+
+    def read_batch(self, record_type: str, start_date: datetime, end_date: datetime,
+                   since: Optional[datetime] = None) -> RecordBatch:
+        """
+        1種類のデータタイプを RecordBatch に直接読み込む（レコードを1件ずつ作らない）
+
+        Args:
+            record_type: BATCH_COLUMNS のキー
+            start_date: 開始日時
+            end_date: 終了日時
+            since: ウォーターマーク（これより新しいレコードのみ）
+
+        Returns:
+            RecordBatchインスタンス
+        """
+        stream = _QueueStream()
+        stream_id = self._send_request(
+            {"op": "read", "reads": [self._read_spec(record_type, start_date, end_date, since)],
+             "chunk_size": self.chunk_size},
+            stream
+        )
+        batch = RecordBatch(record_type, tzinfo=start_date.tzinfo)
+        for frame_type, _, payload in self._frames(stream_id, stream):
+            if frame_type == BATCH:
+                decode_batch_into(batch, payload)
+            elif frame_type == RECORDS:
+                for record in records_from_payload(record_type, payload, start_date.tzinfo):
+                    batch.append(record.timestamp, **{name: getattr(record, name) for name in batch.columns})
+        return batch
+
+    def read_many(self, reads: Dict[str, Tuple[datetime, datetime, Optional[datetime]]]) -> Dict[str, Future]:
+        """
+        複数のデータタイプを1回のリクエストでまとめて読む
+
+        端末は各タイプのチャンクを交互に送ってくるので、1往復で全てのタイプが届く。
+        タイプごとの Future は、そのタイプの最後のチャンクが届いた時点で完了する。
+
+        Args:
+            reads: データタイプ名 → (開始日時, 終了日時, ウォーターマーク)
+
+        Returns:
+            データタイプ名 → レコードのリストを返す Future
+        """
+        record_types = list(reads)
+        if len(record_types) >= ALL_PARTS:
+            raise ValueError(f"1回に読めるデータタイプは{ALL_PARTS - 1}種類までなのだ")
+        stream = _CollectStream(record_types, [start.tzinfo for start, _, _ in reads.values()])
+        self._send_request(
+            {"op": "read", "chunk_size": self.chunk_size,
+             "reads": [self._read_spec(record_type, *reads[record_type]) for record_type in record_types]},
+            stream
+        )
+        return dict(zip(record_types, stream.futures))
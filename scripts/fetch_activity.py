@@ -5,11 +5,12 @@ Android Health Connectからアクティビティデータを取得して保存
 現在はモックアップ実装だが、将来的には実際のHealth Connect APIを使用するのだ。
 """
 import os
-import json
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from health_connect_client import create_health_connect_client, StepsRecord, DistanceRecord, CaloriesRecord
+from storage import JsonDailyStorage
+from metrics import export_metrics, increment, span
+from profiling import maybe_profile
+from heart_rate import fetch_heart_rate_summary
 
 
 # ログ設定
@@ -17,35 +18,47 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# 必要なHealth Connect権限
+REQUIRED_PERMISSIONS = [
+    "READ_STEPS",
+    "READ_DISTANCE",
+    "READ_TOTAL_CALORIES_BURNED",
+    "READ_ACTIVE_CALORIES_BURNED",
+    "READ_HEART_RATE"
+]
+
+
 def get_yesterday_date():
     """昨日の日付を取得するのだ"""
     yesterday = datetime.now(timezone.utc) - timedelta(days=1)
     return yesterday.strftime('%Y-%m-%d')
 
 
-def get_time_range():
-    """昨日の開始・終了時刻を取得するのだ"""
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+def get_time_range(target_date=None):
+    """
+    対象日の開始・終了時刻を取得するのだ
+
+    Args:
+        target_date: 対象日（省略時は昨日）
+    """
+    yesterday = target_date or datetime.now(timezone.utc) - timedelta(days=1)
     start_time = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
     end_time = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
     
     return start_time, end_time
 
 
-def fetch_activity_data_from_health_connect(client, start_time, end_time):
+def summarize_activity_records(records, heart_rate=None):
     """
-    Health Connectからアクティビティデータを取得するのだ
+    取得した歩数レコードを1日分のアクティビティデータに集計するのだ
     
     Args:
-        client: Health Connectクライアント
-        start_time: 開始日時
-        end_time: 終了日時
+        records: 歩数レコードのリスト
+        heart_rate: 心拍数の集計結果（heart_rate.fetch_heart_rate_summary の戻り値）
         
     Returns:
         アクティビティデータの辞書
     """
-    logger.info(f"Health Connectからアクティビティデータを取得中... ({start_time} - {end_time})")
-    
     activity_data = {
         "steps": 0,
         "distance_meters": 0.0,
@@ -58,69 +71,86 @@ def fetch_activity_data_from_health_connect(client, start_time, end_time):
         }
     }
     
-    try:
-        # 歩数データを取得
-        steps_records = client.read_steps_data(start_time, end_time)
-        if steps_records:
-            activity_data["steps"] = sum(record.steps for record in steps_records)
-            logger.info(f"歩数データ取得完了: {activity_data['steps']}歩")
-        
-        # 距離データを取得（モックモードでは歩数から計算）
-        if activity_data["steps"] > 0:
-            # 平均的な歩幅を0.7mとして距離を推定
-            activity_data["distance_meters"] = round(activity_data["steps"] * 0.7, 1)
-            logger.info(f"距離データ算出完了: {activity_data['distance_meters']}m")
-        
-        # カロリーデータを取得（モックモードでは歩数から推定）
-        if activity_data["steps"] > 0:
-            # 1000歩あたり約40kcalとして推定
-            activity_data["active_calories"] = round(activity_data["steps"] * 0.04, 1)
-            activity_data["total_calories"] = round(activity_data["active_calories"] * 5, 1)  # 基礎代謝込み
-            logger.info(f"カロリーデータ算出完了: アクティブ{activity_data['active_calories']}kcal, 総計{activity_data['total_calories']}kcal")
-        
-        # 心拍数データを取得（モックモードでは固定値）
-        import random
-        if activity_data["steps"] > 5000:  # 活動的だった場合
-            activity_data["heart_rate"] = {
-                "average": random.randint(70, 85),
-                "max": random.randint(120, 160),
-                "min": random.randint(60, 70)
-            }
-        else:
-            activity_data["heart_rate"] = {
-                "average": random.randint(65, 75),
-                "max": random.randint(90, 120),
-                "min": random.randint(55, 65)
-            }
+    if records:
+        activity_data["steps"] = sum(record.steps for record in records)
+        logger.info(f"歩数データ取得完了: {activity_data['steps']}歩")
+    
+    # 距離データを取得（モックモードでは歩数から計算）
+    if activity_data["steps"] > 0:
+        # 平均的な歩幅を0.7mとして距離を推定
+        activity_data["distance_meters"] = round(activity_data["steps"] * 0.7, 1)
+        logger.info(f"距離データ算出完了: {activity_data['distance_meters']}m")
+    
+    # カロリーデータを取得（モックモードでは歩数から推定）
+    if activity_data["steps"] > 0:
+        # 1000歩あたり約40kcalとして推定
+        activity_data["active_calories"] = round(activity_data["steps"] * 0.04, 1)
+        activity_data["total_calories"] = round(activity_data["active_calories"] * 5, 1)  # 基礎代謝込み
+        logger.info(f"カロリーデータ算出完了: アクティブ{activity_data['active_calories']}kcal, 総計{activity_data['total_calories']}kcal")
+    
+    if heart_rate:
+        activity_data["heart_rate"] = heart_rate
+    
+    return activity_data
+
+
+def fetch_activity_data_from_health_connect(client, start_time, end_time):
+    """
+    Health Connectからアクティビティデータを取得するのだ
+    
+    Args:
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
         
-        logger.info(f"心拍数データ算出完了: 平均{activity_data['heart_rate']['average']}bpm")
+    Returns:
+        アクティビティデータの辞書
+    """
+    logger.info(f"Health Connectからアクティビティデータを取得中... ({start_time} - {end_time})")
+    
+    with span("fetch", data_type="activity") as fetch_span:
+        try:
+            records = client.read_steps_data(start_time, end_time)
+        except Exception as e:
+            logger.error(f"Health Connectからのデータ取得中にエラーが発生したのだ: {e}")
+            increment("fetch_errors", data_type="activity")
+            records = []
+        fetch_span.records = len(records)
+    
+    return summarize_activity_records(records, fetch_heart_rate(client, start_time, end_time))
+
+
+def fetch_heart_rate(client, start_time, end_time):
+    """
+    心拍数をストリームで読みながら集計するのだ（失敗時はNone）
+    
+    Args:
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
         
+    Returns:
+        心拍数の集計結果の辞書
+    """
+    try:
+        return fetch_heart_rate_summary(client, start_time, end_time)
     except Exception as e:
-        logger.error(f"Health Connectからのデータ取得中にエラーが発生したのだ: {e}")
-        
-    return activity_data
+        logger.error(f"心拍数データの取得中にエラーが発生したのだ: {e}")
+        return None
 
 
-def save_activity_data(date_str, activity_data):
+def build_activity_record(date_str, activity_data):
     """
-    アクティビティデータをJSONファイルに保存するのだ
+    保存するアクティビティデータ（Health Connect形式）を組み立てるのだ
     
     Args:
         date_str: 日付文字列
         activity_data: アクティビティデータ
         
     Returns:
-        保存したファイルパス
+        保存する辞書
     """
-    # activityディレクトリが存在しない場合は作成
-    activity_dir = Path('activity')
-    activity_dir.mkdir(exist_ok=True)
-    
-    # ファイルパス
-    file_path = activity_dir / f"{date_str}.json"
-    
-    # 保存するデータ（Health Connect形式）
-    data_to_save = {
+    return {
         "date": date_str,
         "steps": activity_data['steps'],
         "distance_meters": activity_data['distance_meters'],
@@ -130,11 +160,30 @@ def save_activity_data(date_str, activity_data):
         "created_at": datetime.now(timezone.utc).isoformat(),
         "data_source": "health_connect"
     }
+
+
+def save_activity_data(date_str, activity_data, base_dir='.', storage=None):
+    """
+    アクティビティデータを保存するのだ
+    
+    Args:
+        date_str: 日付文字列
+        activity_data: アクティビティデータ
+        base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        
+    Returns:
+        保存したファイルパス
+    """
+    storage = storage or JsonDailyStorage(base_dir)
+    
+    # 保存するデータ（Health Connect形式）
+    data_to_save = build_activity_record(date_str, activity_data)
     
-    # JSONファイルに保存
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        with span("save", data_type="activity") as save_span:
+            file_path = storage.save_day('activity', date_str, data_to_save)
+            save_span.records = 1
         
         logger.info(f"アクティビティデータを保存したのだ: {file_path}")
         logger.info(f"データ内容: {data_to_save}")
@@ -156,15 +205,7 @@ def validate_health_connect_permissions(client):
     Returns:
         権限が正常かどうか
     """
-    required_permissions = [
-        "READ_STEPS",
-        "READ_DISTANCE", 
-        "READ_TOTAL_CALORIES_BURNED",
-        "READ_ACTIVE_CALORIES_BURNED",
-        "READ_HEART_RATE"
-    ]
-    
-    permissions = client.check_permissions(required_permissions)
+    permissions = client.check_permissions(REQUIRED_PERMISSIONS)
     
     missing_permissions = [perm for perm, granted in permissions.items() if not granted]
     
@@ -182,6 +223,8 @@ def main():
     
     try:
         # Health Connectクライアントを作成（現在はモックモード）
+        # クライアントのモジュールは重いので、起動時ではなくここで読み込む
+        from health_connect_client import create_health_connect_client
         client = create_health_connect_client(mock_mode=True)
         
         # 権限を確認
@@ -219,5 +262,7 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    # 環境変数 HEALTH_PROFILE_DIR があればプロファイルつきで実行する
+    success = maybe_profile("fetch_activity", main)
+    export_metrics(entry_point="fetch_activity")
     exit(0 if success else 1) 
@@ -5,11 +5,11 @@ Android Health Connectから栄養データを取得して保存するのだ！
 現在はモックアップ実装だが、将来的には実際のHealth Connect APIを使用するのだ。
 """
 import os
-import json
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from health_connect_client import create_health_connect_client, NutritionRecord
+from storage import JsonDailyStorage
+from metrics import export_metrics, increment, span
+from profiling import maybe_profile
 
 
 # ログ設定
@@ -17,35 +17,48 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# 必要なHealth Connect権限
+REQUIRED_PERMISSIONS = [
+    "READ_NUTRITION",
+    "READ_HYDRATION"
+]
+
+# 分析ロジックのバージョン（判定基準を変えたら上げると分析キャッシュが作り直される）
+# 判定基準は batch_analysis.classify_nutrition（全期間をまとめて分析する版）と揃えること
+# 2: PFCバランスの丸めを round_percent にしたので、境界ちょうどの日の判定が変わることがある
+ANALYZER_VERSION = 2
+
+
 def get_yesterday_date():
     """昨日の日付を取得するのだ"""
     yesterday = datetime.now(timezone.utc) - timedelta(days=1)
     return yesterday.strftime('%Y-%m-%d')
 
 
-def get_time_range():
-    """昨日の開始・終了時刻を取得するのだ"""
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+def get_time_range(target_date=None):
+    """
+    対象日の開始・終了時刻を取得するのだ
+
+    Args:
+        target_date: 対象日（省略時は昨日）
+    """
+    yesterday = target_date or datetime.now(timezone.utc) - timedelta(days=1)
     start_time = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
     end_time = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
     
     return start_time, end_time
 
 
-def fetch_nutrition_data_from_health_connect(client, start_time, end_time):
+def summarize_nutrition_records(records):
     """
-    Health Connectから栄養データを取得するのだ
+    取得した栄養レコードを1日分の栄養データに集計するのだ
     
     Args:
-        client: Health Connectクライアント
-        start_time: 開始日時
-        end_time: 終了日時
+        records: 栄養レコードのリスト
         
     Returns:
         栄養データの辞書
     """
-    logger.info(f"Health Connectから栄養データを取得中... ({start_time} - {end_time})")
-    
     nutrition_data = {
         "calories_consumed": 0.0,
         "protein_g": 0.0,
@@ -63,87 +76,66 @@ def fetch_nutrition_data_from_health_connect(client, start_time, end_time):
         }
     }
     
-    try:
-        # 現在はモックモードなので、Health Connectクライアントから直接は取得できない
-        # 将来的にはNutritionRecordを取得する実装に変更
-        
-        if client.mock_mode:
-            # モック栄養データを生成
-            import random
-            
-            # 基本的な栄養素データ
-            total_calories = random.randint(1800, 2500)
-            nutrition_data["calories_consumed"] = float(total_calories)
-            
-            # タンパク質（カロリーの15-25%）
-            protein_calories = total_calories * random.uniform(0.15, 0.25)
-            nutrition_data["protein_g"] = round(protein_calories / 4, 1)  # 1g = 4kcal
-            
-            # 炭水化物（カロリーの45-65%）
-            carbs_calories = total_calories * random.uniform(0.45, 0.65)
-            nutrition_data["carbs_g"] = round(carbs_calories / 4, 1)  # 1g = 4kcal
-            
-            # 脂質（カロリーの20-35%）
-            fat_calories = total_calories * random.uniform(0.20, 0.35)
-            nutrition_data["fat_g"] = round(fat_calories / 9, 1)  # 1g = 9kcal
-            
-            # その他の栄養素
-            nutrition_data["fiber_g"] = round(random.uniform(20, 35), 1)
-            nutrition_data["sugar_g"] = round(random.uniform(30, 80), 1)
-            nutrition_data["sodium_mg"] = round(random.uniform(1500, 3000), 1)
-            nutrition_data["water_ml"] = round(random.uniform(1500, 3000), 1)
-            
-            # 食事の内訳
-            breakfast_ratio = random.uniform(0.20, 0.30)
-            lunch_ratio = random.uniform(0.30, 0.40)
-            dinner_ratio = random.uniform(0.30, 0.40)
-            snacks_ratio = 1.0 - breakfast_ratio - lunch_ratio - dinner_ratio
-            
-            nutrition_data["meal_breakdown"]["breakfast"]["calories"] = int(total_calories * breakfast_ratio)
-            nutrition_data["meal_breakdown"]["lunch"]["calories"] = int(total_calories * lunch_ratio)
-            nutrition_data["meal_breakdown"]["dinner"]["calories"] = int(total_calories * dinner_ratio)
-            nutrition_data["meal_breakdown"]["snacks"]["calories"] = int(total_calories * snacks_ratio)
-            
-            # 食事時間を設定
-            nutrition_data["meal_breakdown"]["breakfast"]["time"] = "07:30:00"
-            nutrition_data["meal_breakdown"]["lunch"]["time"] = "12:00:00"
-            nutrition_data["meal_breakdown"]["dinner"]["time"] = "19:00:00"
-            nutrition_data["meal_breakdown"]["snacks"]["time"] = "15:00:00"
-            
-            logger.info(f"栄養データ取得完了: {nutrition_data['calories_consumed']}kcal")
-            logger.info(f"タンパク質: {nutrition_data['protein_g']}g, 炭水化物: {nutrition_data['carbs_g']}g, 脂質: {nutrition_data['fat_g']}g")
+    if records:
+        # 1日に複数回記録された場合は合計する
+        for field in ("calories_consumed", "protein_g", "carbs_g", "fat_g",
+                      "fiber_g", "sugar_g", "sodium_mg", "water_ml"):
+            nutrition_data[field] = round(sum(getattr(record, field) or 0.0 for record in records), 1)
         
-        else:
-            # 実際のHealth Connect APIを使用
-            # TODO: 実際の栄養データ取得を実装
-            logger.warning("実際のHealth Connect APIはまだ実装されていないのだ")
-            
-    except Exception as e:
-        logger.error(f"Health Connectからの栄養データ取得中にエラーが発生したのだ: {e}")
+        # 食事の内訳
+        for record in records:
+            for meal, meal_data in (record.meal_breakdown or {}).items():
+                meal_entry = nutrition_data["meal_breakdown"].setdefault(meal, {"calories": 0, "time": None})
+                meal_entry["calories"] += meal_data.get("calories", 0)
+                meal_entry["time"] = meal_data.get("time") or meal_entry["time"]
         
+        logger.info(f"栄養データ取得完了: {nutrition_data['calories_consumed']}kcal")
+        logger.info(f"タンパク質: {nutrition_data['protein_g']}g, 炭水化物: {nutrition_data['carbs_g']}g, 脂質: {nutrition_data['fat_g']}g")
+    
+    else:
+        logger.warning("栄養データが見つからなかったのだ")
+    
     return nutrition_data
 
 
-def save_nutrition_data(date_str, nutrition_data):
+def fetch_nutrition_data_from_health_connect(client, start_time, end_time):
     """
-    栄養データをJSONファイルに保存するのだ
+    Health Connectから栄養データを取得するのだ
     
     Args:
-        date_str: 日付文字列
-        nutrition_data: 栄養データ
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
         
     Returns:
-        保存したファイルパス
+        栄養データの辞書
     """
-    # nutritionディレクトリが存在しない場合は作成
-    nutrition_dir = Path('nutrition')
-    nutrition_dir.mkdir(exist_ok=True)
+    logger.info(f"Health Connectから栄養データを取得中... ({start_time} - {end_time})")
     
-    # ファイルパス
-    file_path = nutrition_dir / f"{date_str}.json"
+    with span("fetch", data_type="nutrition") as fetch_span:
+        try:
+            records = client.read_nutrition_data(start_time, end_time)
+        except Exception as e:
+            logger.error(f"Health Connectからの栄養データ取得中にエラーが発生したのだ: {e}")
+            increment("fetch_errors", data_type="nutrition")
+            records = []
+        fetch_span.records = len(records)
     
-    # 保存するデータ（Health Connect形式）
-    data_to_save = {
+    return summarize_nutrition_records(records)
+
+
+def build_nutrition_record(date_str, nutrition_data):
+    """
+    保存する栄養データ（Health Connect形式）を組み立てるのだ
+    
+    Args:
+        date_str: 日付文字列
+        nutrition_data: 栄養データ
+        
+    Returns:
+        保存する辞書
+    """
+    return {
         "date": date_str,
         "calories_consumed": nutrition_data['calories_consumed'],
         "protein_g": nutrition_data['protein_g'],
@@ -157,11 +149,30 @@ def save_nutrition_data(date_str, nutrition_data):
         "created_at": datetime.now(timezone.utc).isoformat(),
         "data_source": "health_connect"
     }
+
+
+def save_nutrition_data(date_str, nutrition_data, base_dir='.', storage=None):
+    """
+    栄養データを保存するのだ
+    
+    Args:
+        date_str: 日付文字列
+        nutrition_data: 栄養データ
+        base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        
+    Returns:
+        保存したファイルパス
+    """
+    storage = storage or JsonDailyStorage(base_dir)
+    
+    # 保存するデータ（Health Connect形式）
+    data_to_save = build_nutrition_record(date_str, nutrition_data)
     
-    # JSONファイルに保存
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        with span("save", data_type="nutrition") as save_span:
+            file_path = storage.save_day('nutrition', date_str, data_to_save)
+            save_span.records = 1
         
         logger.info(f"栄養データを保存したのだ: {file_path}")
         logger.info(f"データ内容: {data_to_save}")
@@ -183,12 +194,7 @@ def validate_health_connect_permissions(client):
     Returns:
         権限が正常かどうか
     """
-    required_permissions = [
-        "READ_NUTRITION",
-        "READ_HYDRATION"
-    ]
-    
-    permissions = client.check_permissions(required_permissions)
+    permissions = client.check_permissions(REQUIRED_PERMISSIONS)
     
     missing_permissions = [perm for perm, granted in permissions.items() if not granted]
     
@@ -200,6 +206,23 @@ def validate_health_connect_permissions(client):
     return True
 
 
+def round_percent(ratio):
+    """
+    割合をパーセントにして小数第1位に丸めるのだ（0.5 は切り上げ）
+
+    組み込みの round と np.round は 19.95 のような境界で結果が違うので、
+    analyze_nutrition_balance と batch_analysis.classify_nutrition の両方でこれを使う。
+    四則演算と // だけで計算するので、数値でも NumPy 配列でも同じ結果になるのだ。
+
+    Args:
+        ratio: 割合（数値または NumPy 配列）
+
+    Returns:
+        パーセント（小数第1位まで）
+    """
+    return (ratio * 100 * 10 + 0.5) // 1 / 10
+
+
 def analyze_nutrition_balance(nutrition_data):
     """
     栄養バランスを分析するのだ
@@ -239,9 +262,9 @@ def analyze_nutrition_balance(nutrition_data):
         fat_ratio = (nutrition_data['fat_g'] * 9) / total_calories
         carbs_ratio = (nutrition_data['carbs_g'] * 4) / total_calories
         
-        analysis["pfc_ratio"]["protein"] = round(protein_ratio * 100, 1)
-        analysis["pfc_ratio"]["fat"] = round(fat_ratio * 100, 1)
-        analysis["pfc_ratio"]["carbs"] = round(carbs_ratio * 100, 1)
+        analysis["pfc_ratio"]["protein"] = round_percent(protein_ratio)
+        analysis["pfc_ratio"]["fat"] = round_percent(fat_ratio)
+        analysis["pfc_ratio"]["carbs"] = round_percent(carbs_ratio)
         
         # 理想的なPFCバランス: P 15-20%, F 20-30%, C 50-65%
         if 15 <= analysis["pfc_ratio"]["protein"] <= 20 and \
@@ -278,6 +301,8 @@ def main():
     
     try:
         # Health Connectクライアントを作成（現在はモックモード）
+        # クライアントのモジュールは重いので、起動時ではなくここで読み込む
+        from health_connect_client import create_health_connect_client
         client = create_health_connect_client(mock_mode=True)
         
         # 権限を確認
@@ -319,5 +344,7 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    # 環境変数 HEALTH_PROFILE_DIR があればプロファイルつきで実行する
+    success = maybe_profile("fetch_nutrition", main)
+    export_metrics(entry_point="fetch_nutrition")
     exit(0 if success else 1) 
@@ -5,11 +5,11 @@ Android Health Connectから睡眠データを取得して保存するのだ！
 現在はモックアップ実装だが、将来的には実際のHealth Connect APIを使用するのだ。
 """
 import os
-import json
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from health_connect_client import create_health_connect_client, SleepRecord
+from storage import JsonDailyStorage
+from metrics import export_metrics, increment, span
+from profiling import maybe_profile
 
 
 # ログ設定
@@ -17,15 +17,31 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# 必要なHealth Connect権限
+REQUIRED_PERMISSIONS = [
+    "READ_SLEEP",
+    "READ_SLEEP_STAGES"
+]
+
+# 分析ロジックのバージョン（判定基準を変えたら上げると分析キャッシュが作り直される）
+# 判定基準は batch_analysis.classify_sleep（全期間をまとめて分析する版）と揃えること
+ANALYZER_VERSION = 1
+
+
 def get_yesterday_date():
     """昨日の日付を取得するのだ"""
     yesterday = datetime.now(timezone.utc) - timedelta(days=1)
     return yesterday.strftime('%Y-%m-%d')
 
 
-def get_time_range():
-    """昨日の開始・終了時刻を取得するのだ（睡眠は前日夜〜当日朝）"""
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+def get_time_range(target_date=None):
+    """
+    対象日の開始・終了時刻を取得するのだ（睡眠は前日夜〜当日朝）
+
+    Args:
+        target_date: 対象日（省略時は昨日）
+    """
+    yesterday = target_date or datetime.now(timezone.utc) - timedelta(days=1)
     # 睡眠データは前日18時〜当日12時の範囲で取得
     start_time = yesterday.replace(hour=18, minute=0, second=0, microsecond=0)
     end_time = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999) + timedelta(hours=12)
@@ -33,20 +49,16 @@ def get_time_range():
     return start_time, end_time
 
 
-def fetch_sleep_data_from_health_connect(client, start_time, end_time):
+def summarize_sleep_records(records):
     """
-    Health Connectから睡眠データを取得するのだ
+    取得した睡眠レコードを1日分の睡眠データに集計するのだ
     
     Args:
-        client: Health Connectクライアント
-        start_time: 開始日時
-        end_time: 終了日時
+        records: 睡眠レコードのリスト
         
     Returns:
         睡眠データの辞書
     """
-    logger.info(f"Health Connectから睡眠データを取得中... ({start_time} - {end_time})")
-    
     sleep_data = {
         "total_sleep_minutes": 0,
         "deep_sleep_minutes": None,
@@ -58,63 +70,74 @@ def fetch_sleep_data_from_health_connect(client, start_time, end_time):
         "sleep_quality_score": None
     }
     
-    try:
-        # 睡眠データを取得
-        sleep_records = client.read_sleep_data(start_time, end_time)
+    if records:
+        # 最新のレコードを使用（通常は1日1回）
+        latest_record = records[-1]
         
-        if sleep_records:
-            # 最新のレコードを使用（通常は1日1回）
-            latest_record = sleep_records[-1]
-            
-            sleep_data["total_sleep_minutes"] = latest_record.total_sleep_minutes
-            sleep_data["deep_sleep_minutes"] = latest_record.deep_sleep_minutes
-            sleep_data["light_sleep_minutes"] = latest_record.light_sleep_minutes
-            sleep_data["rem_sleep_minutes"] = latest_record.rem_sleep_minutes
-            sleep_data["sleep_efficiency"] = latest_record.sleep_efficiency
-            sleep_data["bedtime"] = latest_record.bedtime
-            sleep_data["wake_time"] = latest_record.wake_time
-            
-            # 睡眠の質スコアを計算（効率とREM睡眠の割合から）
-            if sleep_data["sleep_efficiency"] and sleep_data["rem_sleep_minutes"]:
-                rem_ratio = sleep_data["rem_sleep_minutes"] / sleep_data["total_sleep_minutes"]
-                sleep_data["sleep_quality_score"] = round(
-                    (sleep_data["sleep_efficiency"] * 0.7 + rem_ratio * 0.3) * 100, 1
-                )
-            
-            logger.info(f"睡眠データ取得完了: {sleep_data['total_sleep_minutes']}分")
-            logger.info(f"睡眠効率: {sleep_data['sleep_efficiency']}")
-            if sleep_data["sleep_quality_score"]:
-                logger.info(f"睡眠の質スコア: {sleep_data['sleep_quality_score']}")
+        sleep_data["total_sleep_minutes"] = latest_record.total_sleep_minutes
+        sleep_data["deep_sleep_minutes"] = latest_record.deep_sleep_minutes
+        sleep_data["light_sleep_minutes"] = latest_record.light_sleep_minutes
+        sleep_data["rem_sleep_minutes"] = latest_record.rem_sleep_minutes
+        sleep_data["sleep_efficiency"] = latest_record.sleep_efficiency
+        sleep_data["bedtime"] = latest_record.bedtime
+        sleep_data["wake_time"] = latest_record.wake_time
         
-        else:
-            logger.warning("睡眠データが見つからなかったのだ")
-            
-    except Exception as e:
-        logger.error(f"Health Connectからの睡眠データ取得中にエラーが発生したのだ: {e}")
+        # 睡眠の質スコアを計算（効率とREM睡眠の割合から）
+        if sleep_data["sleep_efficiency"] and sleep_data["rem_sleep_minutes"]:
+            rem_ratio = sleep_data["rem_sleep_minutes"] / sleep_data["total_sleep_minutes"]
+            sleep_data["sleep_quality_score"] = round(
+                (sleep_data["sleep_efficiency"] * 0.7 + rem_ratio * 0.3) * 100, 1
+            )
         
+        logger.info(f"睡眠データ取得完了: {sleep_data['total_sleep_minutes']}分")
+        logger.info(f"睡眠効率: {sleep_data['sleep_efficiency']}")
+        if sleep_data["sleep_quality_score"]:
+            logger.info(f"睡眠の質スコア: {sleep_data['sleep_quality_score']}")
+    
+    else:
+        logger.warning("睡眠データが見つからなかったのだ")
+    
     return sleep_data
 
 
-def save_sleep_data(date_str, sleep_data):
+def fetch_sleep_data_from_health_connect(client, start_time, end_time):
     """
-    睡眠データをJSONファイルに保存するのだ
+    Health Connectから睡眠データを取得するのだ
     
     Args:
-        date_str: 日付文字列
-        sleep_data: 睡眠データ
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
         
     Returns:
-        保存したファイルパス
+        睡眠データの辞書
     """
-    # sleepディレクトリが存在しない場合は作成
-    sleep_dir = Path('sleep')
-    sleep_dir.mkdir(exist_ok=True)
+    logger.info(f"Health Connectから睡眠データを取得中... ({start_time} - {end_time})")
     
-    # ファイルパス
-    file_path = sleep_dir / f"{date_str}.json"
+    with span("fetch", data_type="sleep") as fetch_span:
+        try:
+            records = client.read_sleep_data(start_time, end_time)
+        except Exception as e:
+            logger.error(f"Health Connectからの睡眠データ取得中にエラーが発生したのだ: {e}")
+            increment("fetch_errors", data_type="sleep")
+            records = []
+        fetch_span.records = len(records)
     
-    # 保存するデータ（Health Connect形式）
-    data_to_save = {
+    return summarize_sleep_records(records)
+
+
+def build_sleep_record(date_str, sleep_data):
+    """
+    保存する睡眠データ（Health Connect形式）を組み立てるのだ
+    
+    Args:
+        date_str: 日付文字列
+        sleep_data: 睡眠データ
+        
+    Returns:
+        保存する辞書
+    """
+    return {
         "date": date_str,
         "total_sleep_minutes": sleep_data['total_sleep_minutes'],
         "deep_sleep_minutes": sleep_data['deep_sleep_minutes'],
@@ -127,11 +150,30 @@ def save_sleep_data(date_str, sleep_data):
         "created_at": datetime.now(timezone.utc).isoformat(),
         "data_source": "health_connect"
     }
+
+
+def save_sleep_data(date_str, sleep_data, base_dir='.', storage=None):
+    """
+    睡眠データを保存するのだ
+    
+    Args:
+        date_str: 日付文字列
+        sleep_data: 睡眠データ
+        base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        
+    Returns:
+        保存したファイルパス
+    """
+    storage = storage or JsonDailyStorage(base_dir)
+    
+    # 保存するデータ（Health Connect形式）
+    data_to_save = build_sleep_record(date_str, sleep_data)
     
-    # JSONファイルに保存
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        with span("save", data_type="sleep") as save_span:
+            file_path = storage.save_day('sleep', date_str, data_to_save)
+            save_span.records = 1
         
         logger.info(f"睡眠データを保存したのだ: {file_path}")
         logger.info(f"データ内容: {data_to_save}")
@@ -153,12 +195,7 @@ def validate_health_connect_permissions(client):
     Returns:
         権限が正常かどうか
     """
-    required_permissions = [
-        "READ_SLEEP",
-        "READ_SLEEP_STAGES"
-    ]
-    
-    permissions = client.check_permissions(required_permissions)
+    permissions = client.check_permissions(REQUIRED_PERMISSIONS)
     
     missing_permissions = [perm for perm, granted in permissions.items() if not granted]
     
@@ -226,6 +263,8 @@ def main():
     
     try:
         # Health Connectクライアントを作成（現在はモックモード）
+        # クライアントのモジュールは重いので、起動時ではなくここで読み込む
+        from health_connect_client import create_health_connect_client
         client = create_health_connect_client(mock_mode=True)
         
         # 権限を確認
@@ -245,26 +284,6 @@ def main():
         
         if not sleep_data or sleep_data['total_sleep_minutes'] == 0:
             logger.warning("有効な睡眠データが取得できなかったのだ")
-            # モックモードの場合、ダミーデータを生成
-            if client.mock_mode:
-                import random
-                total_sleep = random.randint(360, 540)  # 6-9時間
-                sleep_data = {
-                    "total_sleep_minutes": total_sleep,
-                    "deep_sleep_minutes": int(total_sleep * 0.2),
-                    "light_sleep_minutes": int(total_sleep * 0.6),
-                    "rem_sleep_minutes": int(total_sleep * 0.2),
-                    "sleep_efficiency": round(random.uniform(0.75, 0.95), 2),
-                    "bedtime": "23:30:00",
-                    "wake_time": "07:30:00",
-                    "sleep_quality_score": None
-                }
-                # 睡眠の質スコアを計算
-                rem_ratio = sleep_data["rem_sleep_minutes"] / sleep_data["total_sleep_minutes"]
-                sleep_data["sleep_quality_score"] = round(
-                    (sleep_data["sleep_efficiency"] * 0.7 + rem_ratio * 0.3) * 100, 1
-                )
-                logger.info("モック睡眠データを生成したのだ")
         
         # 睡眠パターンを分析
         analysis = analyze_sleep_patterns(sleep_data)
@@ -286,5 +305,7 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    # 環境変数 HEALTH_PROFILE_DIR があればプロファイルつきで実行する
+    success = maybe_profile("fetch_sleep", main)
+    export_metrics(entry_point="fetch_sleep")
     exit(0 if success else 1) 
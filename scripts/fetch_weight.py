@@ -5,11 +5,12 @@ Android Health Connectから体重データを取得して保存するのだ！
 現在はモックアップ実装だが、将来的には実際のHealth Connect APIを使用するのだ。
 """
 import os
-import json
 import logging
 from datetime import datetime, timedelta, timezone
-from pathlib import Path
-from health_connect_client import create_health_connect_client, WeightRecord
+from storage import JsonDailyStorage
+from metrics import export_metrics, increment, span
+from profiling import maybe_profile
+from weight_trend import update_weight_trends
 
 
 # ログ設定
@@ -17,35 +18,44 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# 必要なHealth Connect権限
+REQUIRED_PERMISSIONS = [
+    "READ_WEIGHT",
+    "READ_BODY_FAT",
+    "READ_HEIGHT"
+]
+
+
 def get_yesterday_date():
     """昨日の日付を取得するのだ"""
     yesterday = datetime.now(timezone.utc) - timedelta(days=1)
     return yesterday.strftime('%Y-%m-%d')
 
 
-def get_time_range():
-    """昨日の開始・終了時刻を取得するのだ"""
-    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+def get_time_range(target_date=None):
+    """
+    対象日の開始・終了時刻を取得するのだ
+
+    Args:
+        target_date: 対象日（省略時は昨日）
+    """
+    yesterday = target_date or datetime.now(timezone.utc) - timedelta(days=1)
     start_time = yesterday.replace(hour=0, minute=0, second=0, microsecond=0)
     end_time = yesterday.replace(hour=23, minute=59, second=59, microsecond=999999)
     
     return start_time, end_time
 
 
-def fetch_weight_data_from_health_connect(client, start_time, end_time):
+def summarize_weight_records(records):
     """
-    Health Connectから体重データを取得するのだ
+    取得した体重レコードを1日分の体重データに集計するのだ
     
     Args:
-        client: Health Connectクライアント
-        start_time: 開始日時
-        end_time: 終了日時
+        records: 体重レコードのリスト
         
     Returns:
         体重データの辞書
     """
-    logger.info(f"Health Connectから体重データを取得中... ({start_time} - {end_time})")
-    
     weight_data = {
         "weight_kg": 0.0,
         "body_fat_percentage": None,
@@ -53,71 +63,150 @@ def fetch_weight_data_from_health_connect(client, start_time, end_time):
         "bmi": None
     }
     
-    try:
-        # 体重データを取得
-        weight_records = client.read_weight_data(start_time, end_time)
-        
-        if weight_records:
-            # 最新のレコードを使用（複数回測定された場合）
-            latest_record = weight_records[-1]
-            
-            weight_data["weight_kg"] = latest_record.weight_kg
-            weight_data["body_fat_percentage"] = latest_record.body_fat_percentage
-            weight_data["muscle_mass_kg"] = latest_record.muscle_mass_kg
-            
-            # BMIを計算（身長は仮定値: 170cm）
-            if weight_data["weight_kg"] > 0:
-                height_m = 1.70  # 実際のアプリでは設定値を使用
-                weight_data["bmi"] = round(weight_data["weight_kg"] / (height_m ** 2), 1)
-            
-            logger.info(f"体重データ取得完了: {weight_data['weight_kg']}kg")
-            if weight_data["body_fat_percentage"]:
-                logger.info(f"体脂肪率: {weight_data['body_fat_percentage']}%")
-            if weight_data["bmi"]:
-                logger.info(f"BMI: {weight_data['bmi']}")
+    if records:
+        # 最新のレコードを使用（複数回測定された場合）
+        latest_record = records[-1]
         
-        else:
-            logger.warning("体重データが見つからなかったのだ")
-            
-    except Exception as e:
-        logger.error(f"Health Connectからの体重データ取得中にエラーが発生したのだ: {e}")
+        weight_data["weight_kg"] = latest_record.weight_kg
+        weight_data["body_fat_percentage"] = latest_record.body_fat_percentage
+        weight_data["muscle_mass_kg"] = latest_record.muscle_mass_kg
         
+        logger.info(f"体重データ取得完了: {weight_data['weight_kg']}kg")
+        if weight_data["body_fat_percentage"]:
+            logger.info(f"体脂肪率: {weight_data['body_fat_percentage']}%")
+    
+    else:
+        logger.warning("体重データが見つからなかったのだ")
+    
     return weight_data
 
 
-def save_weight_data(date_str, weight_data):
+def fetch_weight_data_from_health_connect(client, start_time, end_time):
     """
-    体重データをJSONファイルに保存するのだ
+    Health Connectから体重データを取得するのだ
+    
+    Args:
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
+        
+    Returns:
+        体重データの辞書
+    """
+    logger.info(f"Health Connectから体重データを取得中... ({start_time} - {end_time})")
+    
+    with span("fetch", data_type="weight") as fetch_span:
+        try:
+            records = client.read_weight_data(start_time, end_time)
+        except Exception as e:
+            logger.error(f"Health Connectからの体重データ取得中にエラーが発生したのだ: {e}")
+            increment("fetch_errors", data_type="weight")
+            records = []
+        fetch_span.records = len(records)
+    
+    return summarize_weight_records(records)
+
+
+def add_bmi(weight_data, height_m):
+    """
+    身長からBMIを計算して追加するのだ
     
     Args:
-        date_str: 日付文字列
         weight_data: 体重データ
+        height_m: 身長（m）
         
     Returns:
-        保存したファイルパス
+        BMIを追加した体重データ
     """
-    # weightディレクトリが存在しない場合は作成
-    weight_dir = Path('weight')
-    weight_dir.mkdir(exist_ok=True)
+    if not weight_data['weight_kg']:
+        return weight_data
     
-    # ファイルパス
-    file_path = weight_dir / f"{date_str}.json"
+    weight_data = dict(weight_data)
+    weight_data["bmi"] = round(weight_data["weight_kg"] / (height_m ** 2), 1)
+    logger.info(f"BMI: {weight_data['bmi']}")
+    return weight_data
+
+
+def add_weight_trends(days, storage):
+    """
+    期間の体重データにBMIと体重トレンドを追加するのだ（collect の finalize）
     
-    # 保存するデータ（Health Connect形式）
-    data_to_save = {
+    プロフィールは期間ごとに1回だけ読み込み、トレンドは期間の日をまとめて更新する。
+    最終日より前の期間なら、期間より後に保存済みの日のトレンドも保存し直される。
+    
+    Args:
+        days: 日付文字列 → 体重データ（これから保存する期間の全ての日）
+        storage: 保存先のストレージ（プロフィールとトレンドの状態は storage.base_dir に置く）
+        
+    Returns:
+        日付文字列 → BMIとトレンドを追加した体重データ
+    """
+    if not any(weight_data['weight_kg'] for weight_data in days.values()):
+        return days
+    
+    from user_profile import load_user_profile
+    height_m = load_user_profile(storage.base_dir).height_m
+    days = {date_str: add_bmi(weight_data, height_m) for date_str, weight_data in days.items()}
+    
+    try:
+        trends = update_weight_trends(
+            storage, {date_str: weight_data['weight_kg'] for date_str, weight_data in days.items()}
+        )
+    except Exception as e:
+        logger.error(f"体重トレンドの更新中にエラーが発生したのだ: {e}")
+        return days
+    
+    for date_str, trend in trends.items():
+        days[date_str]["trend"] = trend
+        logger.info(f"体重トレンド ({date_str}): {trend}")
+    return days
+
+
+def build_weight_record(date_str, weight_data):
+    """
+    保存する体重データ（Health Connect形式）を組み立てるのだ
+    
+    Args:
+        date_str: 日付文字列
+        weight_data: 体重データ
+        
+    Returns:
+        保存する辞書
+    """
+    return {
         "date": date_str,
         "weight_kg": weight_data['weight_kg'],
         "body_fat_percentage": weight_data['body_fat_percentage'],
         "muscle_mass_kg": weight_data['muscle_mass_kg'],
         "bmi": weight_data['bmi'],
+        "trend": weight_data.get('trend'),
         "created_at": datetime.now(timezone.utc).isoformat(),
         "data_source": "health_connect"
     }
+
+
+def save_weight_data(date_str, weight_data, base_dir='.', storage=None):
+    """
+    体重データを保存するのだ
+    
+    Args:
+        date_str: 日付文字列
+        weight_data: 体重データ
+        base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+        storage: 保存先のストレージ（省略時は base_dir 配下に1日1ファイルのJSON）
+        
+    Returns:
+        保存したファイルパス
+    """
+    storage = storage or JsonDailyStorage(base_dir)
+    
+    # 保存するデータ（Health Connect形式）
+    data_to_save = build_weight_record(date_str, weight_data)
     
-    # JSONファイルに保存
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        with span("save", data_type="weight") as save_span:
+            file_path = storage.save_day('weight', date_str, data_to_save)
+            save_span.records = 1
         
         logger.info(f"体重データを保存したのだ: {file_path}")
         logger.info(f"データ内容: {data_to_save}")
@@ -139,13 +228,7 @@ def validate_health_connect_permissions(client):
     Returns:
         権限が正常かどうか
     """
-    required_permissions = [
-        "READ_WEIGHT",
-        "READ_BODY_FAT",
-        "READ_HEIGHT"
-    ]
-    
-    permissions = client.check_permissions(required_permissions)
+    permissions = client.check_permissions(REQUIRED_PERMISSIONS)
     
     missing_permissions = [perm for perm, granted in permissions.items() if not granted]
     
@@ -185,6 +268,8 @@ def main():
     
     try:
         # Health Connectクライアントを作成（現在はモックモード）
+        # クライアントのモジュールは重いので、起動時ではなくここで読み込む
+        from health_connect_client import create_health_connect_client
         client = create_health_connect_client(mock_mode=True)
         
         # 権限を確認
@@ -204,22 +289,11 @@ def main():
         
         if not weight_data or weight_data['weight_kg'] == 0.0:
             logger.warning("有効な体重データが取得できなかったのだ")
-            # モックモードの場合、ダミーデータを生成
-            if client.mock_mode:
-                import random
-                weight_data = {
-                    "weight_kg": round(random.uniform(60.0, 80.0), 1),
-                    "body_fat_percentage": round(random.uniform(10.0, 25.0), 1),
-                    "muscle_mass_kg": round(random.uniform(45.0, 60.0), 1),
-                    "bmi": None
-                }
-                # BMIを計算
-                height_m = 1.70
-                weight_data["bmi"] = round(weight_data["weight_kg"] / (height_m ** 2), 1)
-                logger.info("モックデータを生成したのだ")
-        
-        # ファイルに保存
-        saved_file = save_weight_data(date_str, weight_data)
+        
+        # BMIとトレンドを追加してファイルに保存
+        storage = JsonDailyStorage()
+        weight_data = add_weight_trends({date_str: weight_data}, storage)[date_str]
+        saved_file = save_weight_data(date_str, weight_data, storage=storage)
         
         if saved_file:
             logger.info("=== 体重データ取得完了 ===")
@@ -234,5 +308,7 @@ def main():
 
 
 if __name__ == "__main__":
-    success = main()
+    # 環境変数 HEALTH_PROFILE_DIR があればプロファイルつきで実行する
+    success = maybe_profile("fetch_weight", main)
+    export_metrics(entry_point="fetch_weight")
     exit(0 if success else 1) 
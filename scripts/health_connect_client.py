@@ -6,12 +6,28 @@ Android Health Connect Client Library
 現在はモックアップ実装だが、将来的にはAndroid Health Connect APIとの実際の通信を行うのだ。
 """
 
-import json
 import logging
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
-from pathlib import Path
+from functools import lru_cache
+from itertools import chain, islice
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Any, Tuple
+from dataclasses import dataclass, fields
+
+from lazy_imports import lazy_import
+from metrics import span
+
+if TYPE_CHECKING:
+    # スレッドプールは最初の read_many まで作らないので、concurrent.futures も起動時には読み込まない
+    from concurrent.futures import Future, ThreadPoolExecutor
+
+# read_many（async版）でしか使わないので、使うときまで読み込まない
+# （read_many はイベントループの中で動くので、触れるときには読み込み済みなのだ）
+asyncio = lazy_import("asyncio")
 
 
 # ログ設定
@@ -19,22 +35,45 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@lru_cache(maxsize=None)
+def _field_names(record_class) -> Tuple[str, ...]:
+    """レコードクラスのフィールド名（クラスごとに1回だけ調べる）"""
+    return tuple(f.name for f in fields(record_class))
+
+
+@dataclass(kw_only=True, slots=True, repr=False, eq=False)
 class HealthRecord:
-    """Health Connectの基本レコード構造"""
+    """
+    Health Connectの基本レコード構造（サブクラスの必須フィールドと衝突しないようキーワード専用）
+    
+    大量に生成されるので、インスタンスごとの __dict__ を持たない slots つきのクラスにしている。
+    dataclass が作るのは __init__ だけにして、__repr__ と __eq__ はここで1回だけ定義する
+    （クラスごとにソースを生成してコンパイルする分、どのスクリプトも起動が遅くなるので）。
+    """
     record_type: str
     timestamp: datetime
     data_source: str = "health_connect"
     metadata: Optional[Dict[str, Any]] = None
 
+    def __repr__(self) -> str:
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name in _field_names(type(self)))
+        return f"{type(self).__name__}({values})"
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        names = _field_names(type(self))
+        # dataclass と同じくタプルで比べる（同じ NaN のオブジェクトは等しいとみなされる）
+        return tuple(getattr(self, name) for name in names) == tuple(getattr(other, name) for name in names)
+
     def to_dict(self) -> Dict[str, Any]:
-        """辞書形式に変換"""
-        result = asdict(self)
+        """辞書形式に変換（asdict と違い、ネストした値はコピーせずそのまま入れる）"""
+        result = {name: getattr(self, name) for name in _field_names(type(self))}
         result['timestamp'] = self.timestamp.isoformat()
         return result
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class StepsRecord(HealthRecord):
     """歩数データレコード"""
     steps: int
@@ -43,7 +82,7 @@ class StepsRecord(HealthRecord):
         self.record_type = "steps"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class DistanceRecord(HealthRecord):
     """距離データレコード"""
     distance_meters: float
@@ -52,7 +91,7 @@ class DistanceRecord(HealthRecord):
         self.record_type = "distance"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class CaloriesRecord(HealthRecord):
     """カロリーデータレコード"""
     total_calories: float
@@ -62,17 +101,17 @@ class CaloriesRecord(HealthRecord):
         self.record_type = "calories"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class HeartRateRecord(HealthRecord):
     """心拍数データレコード"""
     heart_rate_bpm: int
-    measurement_type: str = "resting"  # resting, active, maximum
+    measurement_type: str = "resting"  # resting, active, maximum, sample（連続計測の1サンプル）
     
     def __post_init__(self):
         self.record_type = "heart_rate"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class WeightRecord(HealthRecord):
     """体重データレコード"""
     weight_kg: float
@@ -83,7 +122,7 @@ class WeightRecord(HealthRecord):
         self.record_type = "weight"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class SleepRecord(HealthRecord):
     """睡眠データレコード"""
     total_sleep_minutes: int
@@ -98,7 +137,7 @@ class SleepRecord(HealthRecord):
         self.record_type = "sleep"
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class NutritionRecord(HealthRecord):
     """栄養データレコード"""
     calories_consumed: float
@@ -106,29 +145,295 @@ class NutritionRecord(HealthRecord):
     carbs_g: Optional[float] = None
     fat_g: Optional[float] = None
     fiber_g: Optional[float] = None
+    sugar_g: Optional[float] = None
+    sodium_mg: Optional[float] = None
+    water_ml: Optional[float] = None
+    meal_breakdown: Optional[Dict[str, Any]] = None
     
     def __post_init__(self):
         self.record_type = "nutrition"
 
 
+# record_type → レコードクラス
+RECORD_CLASSES = {
+    "steps": StepsRecord,
+    "distance": DistanceRecord,
+    "calories": CaloriesRecord,
+    "heart_rate": HeartRateRecord,
+    "weight": WeightRecord,
+    "sleep": SleepRecord,
+    "nutrition": NutritionRecord,
+}
+
+
+def record_from_dict(data: Dict[str, Any]) -> HealthRecord:
+    """
+    to_dict() で変換した辞書からレコードを復元
+    
+    Args:
+        data: レコードの辞書
+        
+    Returns:
+        record_type に対応するHealthRecordのサブクラスのインスタンス
+    """
+    kwargs = dict(data)
+    kwargs['timestamp'] = datetime.fromisoformat(kwargs['timestamp'])
+    return RECORD_CLASSES[kwargs['record_type']](**kwargs)
+
+
+# record_type → RecordBatch の列名 → 型コード
+# （'q': int64, 'd': float64 で欠損はNaN, None: 文字列などを入れる通常のリスト）
+BATCH_COLUMNS = {
+    "steps": {"steps": "q"},
+    "distance": {"distance_meters": "d"},
+    "calories": {"total_calories": "d", "active_calories": "d"},
+    "heart_rate": {"heart_rate_bpm": "q", "measurement_type": None},
+    "weight": {"weight_kg": "d", "body_fat_percentage": "d", "muscle_mass_kg": "d"},
+}
+
+
+class RecordBatch:
+    """
+    同じ record_type のレコードを列ごとの配列にまとめたもの（struct-of-arrays）
+    
+    タイムスタンプはUNIXエポック（ミリ秒）の int64 配列、値は型つき配列で持つので、
+    分単位の歩数や心拍数を何か月分も保持してもレコード1件あたり十数バイトで済む。
+    metadata は保持しない（data_source はバッチ全体で1つ）。
+    """
+    
+    def __init__(self, record_type: str, data_source: str = "health_connect", tzinfo=None):
+        """
+        Args:
+            record_type: レコードタイプ（BATCH_COLUMNS のキー）
+            data_source: データソース
+            tzinfo: タイムスタンプのタイムゾーン（Noneならナイーブなローカル時刻）
+        """
+        if record_type not in BATCH_COLUMNS:
+            raise ValueError(f"バッチに対応していないレコードタイプなのだ: {record_type}")
+        self.record_type = record_type
+        self.data_source = data_source
+        self.tzinfo = tzinfo
+        self.timestamps = array('q')
+        self.columns: Dict[str, Any] = {
+            name: array(typecode) if typecode else []
+            for name, typecode in BATCH_COLUMNS[record_type].items()
+        }
+    
+    @classmethod
+    def from_records(cls, record_type: str, records: Iterable[HealthRecord]) -> "RecordBatch":
+        """
+        レコードのリストからバッチを作成
+        
+        Args:
+            record_type: レコードタイプ
+            records: 同じ record_type のレコード
+            
+        Returns:
+            RecordBatchインスタンス
+        """
+        batch = None
+        for record in records:
+            if batch is None:
+                batch = cls(record_type, record.data_source, record.timestamp.tzinfo)
+            batch.append(record.timestamp, **{name: getattr(record, name) for name in batch.columns})
+        return batch or cls(record_type)
+    
+    @classmethod
+    def from_arrays(cls, record_type: str, timestamps, columns: Dict[str, Any],
+                    data_source: str = "health_connect", tzinfo=None) -> "RecordBatch":
+        """
+        列ごとの配列からバッチを作成（NumPy配列などをそのままコピーする）
+        
+        Args:
+            record_type: レコードタイプ
+            timestamps: UNIXエポックのミリ秒の int64 配列（バッファプロトコルに対応したもの）
+            columns: 列名 → 配列（型コードが 'q' の列は int64、'd' の列は float64、None の列はリスト）
+            data_source: データソース
+            tzinfo: タイムスタンプのタイムゾーン
+            
+        Returns:
+            RecordBatchインスタンス
+        """
+        batch = cls(record_type, data_source, tzinfo)
+        batch.timestamps.frombytes(memoryview(timestamps).cast('B'))
+        for name, column in batch.columns.items():
+            values = columns[name]
+            if isinstance(column, list):
+                column.extend(values)
+            else:
+                column.frombytes(memoryview(values).cast('B'))
+        return batch
+    
+    def append(self, timestamp: datetime, **values):
+        """
+        1件追加
+        
+        Args:
+            timestamp: タイムスタンプ
+            **values: 列名 → 値（省略した列は欠損）
+        """
+        self.timestamps.append(int(timestamp.timestamp() * 1000))
+        for name, column in self.columns.items():
+            value = values.get(name)
+            if isinstance(column, list):
+                column.append(value)
+            elif column.typecode == 'd':
+                column.append(math.nan if value is None else value)
+            else:
+                column.append(value or 0)
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def timestamp_at(self, i: int) -> datetime:
+        """i件目のタイムスタンプをdatetimeで取得"""
+        return datetime.fromtimestamp(self.timestamps[i] / 1000, tz=self.tzinfo)
+    
+    def _value(self, name: str, i: int) -> Any:
+        value = self.columns[name][i]
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+    
+    def __iter__(self) -> Iterator[HealthRecord]:
+        """1件ずつレコードに戻しながら返す（必要になった分だけ生成する）"""
+        record_class = RECORD_CLASSES[self.record_type]
+        for i in range(len(self)):
+            yield record_class(
+                record_type=self.record_type,
+                timestamp=self.timestamp_at(i),
+                data_source=self.data_source,
+                **{name: self._value(name, i) for name in self.columns}
+            )
+    
+    def to_records(self) -> List[HealthRecord]:
+        """全件をレコードのリストに戻す"""
+        return list(self)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        列ごとのリストの辞書に変換（JSONにそのまま書ける形）
+        
+        Returns:
+            {"record_type": ..., "data_source": ..., "timestamps": [...], "columns": {...}}
+        """
+        return {
+            "record_type": self.record_type,
+            "data_source": self.data_source,
+            "timestamps": self.timestamps.tolist(),
+            "columns": {
+                name: [self._value(name, i) for i in range(len(self))] if not isinstance(column, list)
+                else list(column)
+                for name, column in self.columns.items()
+            }
+        }
+    
+    @property
+    def nbytes(self) -> int:
+        """型つき配列が使っているバイト数（リストの列は含まない）"""
+        arrays = [self.timestamps] + [column for column in self.columns.values() if not isinstance(column, list)]
+        return sum(len(values) * values.itemsize for values in arrays)
+
+
+# read_records_page で1回に返す件数の既定値（Health Connect の既定のページサイズと同じ）
+DEFAULT_PAGE_SIZE = 1000
+
+
+@dataclass
+class ReadRecordsPage:
+    """read_records_page の1ページ分の結果"""
+    records: List[HealthRecord]
+    # 続きを取得するためのトークン（最後のページならNone）
+    next_page_token: Optional[str] = None
+
+
+class CursorExpiredError(ValueError):
+    """
+    ページトークンが指すカーソルが破棄済み（長く使われなかった、または開きすぎた）ときの例外
+
+    最初のページ（page_token=None）から読み直せばよいのだ。
+    """
+
+
 class HealthConnectClient:
     """Health Connect クライアント"""
     
-    def __init__(self, mock_mode: bool = True):
+    # データタイプ名 → 読み取りメソッド名
+    RECORD_READERS = {
+        "steps": "read_steps_data",
+        "weight": "read_weight_data",
+        "sleep": "read_sleep_data",
+        "heart_rate": "read_heart_rate_data",
+        "nutrition": "read_nutrition_data",
+    }
+    
+    # 同時に保持するページングのカーソル数（超えたら最も長く使われていないものから破棄する）
+    MAX_OPEN_CURSORS = 32
+    # この秒数より長く使われていないカーソルは破棄する
+    CURSOR_IDLE_SECONDS = 300.0
+    # 破棄したトークンを覚えておく数（期限切れと無効なトークンを区別するため）
+    MAX_EXPIRED_TOKENS = 1024
+    
+    def __init__(self, mock_mode: bool = True, max_concurrency: int = 4,
+                 mock_seed: Optional[int] = None, mock_engine=None,
+                 device_address: Optional[str] = None, device=None, mock_user_index: int = 0):
         """
         Health Connectクライアントを初期化
         
         Args:
             mock_mode: モックモードで動作するかどうか
+            max_concurrency: read_many で同時に実行する読み取りの最大数
+            mock_seed: モックデータのシード（Noneなら環境変数 HEALTH_MOCK_SEED、なければ毎回変わる）
+            mock_engine: モックデータを生成する mock_data.MockDataEngine（間隔などを変えたいとき）
+            device_address: 実モードで接続するコンパニオンアプリの "host:port"
+                            （Noneなら環境変数 HEALTH_CONNECT_ADDRESS、なければ 127.0.0.1:8787）
+            device: 実モードで使う device_protocol.DeviceConnection（接続を共有したいとき）
+            mock_user_index: モックデータのユーザー番号（同じシードでもユーザーごとに違うデータになる）
         """
         self.mock_mode = mock_mode
+        self.mock_seed = mock_seed
+        self.mock_user_index = mock_user_index
+        self._mock_engine = mock_engine
+        self._mock_engine_lock = threading.Lock()
+        self.device_address = device_address
+        self._device = device
+        self._device_lock = threading.Lock()
+        self.max_concurrency = max_concurrency
+        self._executor: Optional["ThreadPoolExecutor"] = None
+        # トークン → (先読みした1件, カーソル, 最後に使った時刻)
+        # 使うたびに新しいトークンで末尾に入るので、先頭ほど長く使われていない
+        self._cursors: "OrderedDict[str, Tuple[HealthRecord, Iterator[HealthRecord], float]]" = OrderedDict()
+        self._expired_tokens: "OrderedDict[str, None]" = OrderedDict()
+        self._cursor_lock = threading.Lock()
         self.logger = logging.getLogger(self.__class__.__name__)
         
         if mock_mode:
             self.logger.info("Health Connect クライアントをモックモードで初期化したのだ")
         else:
+            # 端末への接続は最初の読み取りで張る
             self.logger.info("Health Connect クライアントを実モードで初期化したのだ")
-            # 実際のHealth Connect SDKの初期化処理をここに実装
+    
+    @property
+    def mock_engine(self):
+        """モックデータを生成する mock_data.MockDataEngine（初回に作成）"""
+        # read_many_sync ではワーカースレッドから同時に最初の読み取りが来るので、
+        # ロックの中で1つだけ作って全員で同じシードのエンジンを使うのだ。
+        # mock_data（NumPy を使う）は mock_data 側からこのモジュールを読み込むので、ここで普通に import する
+        with self._mock_engine_lock:
+            if self._mock_engine is None:
+                import mock_data
+                self._mock_engine = mock_data.MockDataEngine(seed=self.mock_seed, user_index=self.mock_user_index)
+        return self._mock_engine
+    
+    @property
+    def device(self):
+        """実モードで端末と通信する device_protocol.DeviceConnection（初回に作成、接続は使い回す）"""
+        # mock_engine と同じく、同時に来た最初の読み取りでも接続は1本だけ張る
+        with self._device_lock:
+            if self._device is None:
+                import device_protocol
+                self._device = device_protocol.DeviceConnection.from_address(self.device_address)
+        return self._device
     
     def check_permissions(self, permission_types: List[str]) -> Dict[str, bool]:
         """
@@ -144,9 +449,168 @@ class HealthConnectClient:
             # モックモードでは全ての権限を許可として返す
             return {perm: True for perm in permission_types}
         else:
-            # 実際の権限確認処理
-            # TODO: 実際のHealth Connect APIを使った権限確認を実装
-            pass
+            return self.device.check_permissions(permission_types)
+    
+    def read_records_page(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        page_token: Optional[str] = None
+    ) -> ReadRecordsPage:
+        """
+        指定期間のレコードを1ページ分だけ取得
+        
+        Health Connect の ReadRecordsRequest と同じく、レスポンスの next_page_token を
+        次の呼び出しに渡すと続きが返る。next_page_token がNoneなら最後のページ。
+        クライアント内にカーソル（モックデータ、または端末から届くストリーム）を保持し、
+        トークンはそのカーソルを指す（同じトークンは1回だけ使える）。
+        CURSOR_IDLE_SECONDS より長く使われなかったカーソルや、MAX_OPEN_CURSORS を超えたときに
+        最も長く使われていないカーソルは破棄され、そのトークンを渡すと CursorExpiredError になる。
+        
+        Args:
+            record_type: データタイプ名（RECORD_READERS のキー）
+            start_date: 開始日時
+            end_date: 終了日時
+            page_size: 1ページの最大件数
+            page_token: 前のページの next_page_token（最初のページはNone）
+            
+        Returns:
+            ReadRecordsPage
+
+        Raises:
+            CursorExpiredError: page_token のカーソルが破棄済みのとき
+        """
+        if record_type not in self.RECORD_READERS:
+            raise ValueError(f"未対応のデータタイプなのだ: {record_type}")
+        
+        # 1ページが Health Connect への1往復にあたる
+        with span("health_connect.read_page", record_type=record_type) as page_span:
+            page = self._read_records_page(record_type, start_date, end_date, page_size, page_token)
+            page_span.records = len(page.records)
+        return page
+    
+    def _read_records_page(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        page_size: int,
+        page_token: Optional[str]
+    ) -> ReadRecordsPage:
+        """read_records_page の本体（計測なし）"""
+        if page_token is None:
+            if self.mock_mode:
+                cursor = self.mock_engine.iter_records(record_type, start_date, end_date)
+            else:
+                # 端末からはチャンクが順に届くので、そのストリームをカーソルにする
+                cursor = self.device.iter_records(record_type, start_date, end_date)
+            head = []
+        else:
+            self._expire_cursors()
+            with self._cursor_lock:
+                entry = self._cursors.pop(page_token, None)
+                expired = entry is None and page_token in self._expired_tokens
+            if expired:
+                raise CursorExpiredError(
+                    f"ページトークンのカーソルは期限切れで破棄されたのだ（最初のページから読み直してほしいのだ）: {page_token}"
+                )
+            if entry is None:
+                raise ValueError(f"無効なページトークンなのだ: {page_token}")
+            lookahead, cursor, _ = entry
+            head = [lookahead]
+        
+        records = list(islice(chain(head, cursor), page_size))
+        
+        # 1件先読みして、続きがあるときだけトークンを発行する
+        lookahead = next(cursor, None)
+        if lookahead is None:
+            return ReadRecordsPage(records=records)
+        
+        # ページの読み取りは read_many_sync のワーカースレッドからも来るので、lazy_import にはしない
+        import uuid
+        next_page_token = uuid.uuid4().hex
+        with self._cursor_lock:
+            self._cursors[next_page_token] = (lookahead, cursor, time.monotonic())
+        self._expire_cursors()
+        return ReadRecordsPage(records=records, next_page_token=next_page_token)
+
+    def _expire_cursors(self):
+        """長く使われていないカーソルと、MAX_OPEN_CURSORS を超えた分のカーソルを破棄する"""
+        deadline = time.monotonic() - self.CURSOR_IDLE_SECONDS
+        expired = []
+        with self._cursor_lock:
+            while self._cursors:
+                token, (_, cursor, last_used) = next(iter(self._cursors.items()))
+                if last_used > deadline and len(self._cursors) <= self.MAX_OPEN_CURSORS:
+                    break
+                del self._cursors[token]
+                self._expired_tokens[token] = None
+                expired.append(cursor)
+            while len(self._expired_tokens) > self.MAX_EXPIRED_TOKENS:
+                self._expired_tokens.popitem(last=False)
+        if expired:
+            self.logger.warning(f"使われていないページングのカーソルを{len(expired)}個破棄したのだ")
+        # 端末のストリームは閉じると CANCEL が送られる（ロックの外で閉じる）
+        for cursor in expired:
+            close = getattr(cursor, "close", None)
+            if close is not None:
+                close()
+    
+    def iter_records(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        page_size: int = DEFAULT_PAGE_SIZE
+    ) -> Iterator[HealthRecord]:
+        """
+        ページを順に取得しながらレコードを1件ずつ返す
+        
+        メモリに載るのは常に1ページ分だけなので、長期間や高頻度のデータでも使える。
+        
+        Args:
+            record_type: データタイプ名（RECORD_READERS のキー）
+            start_date: 開始日時
+            end_date: 終了日時
+            page_size: 1ページの最大件数
+            
+        Yields:
+            レコード
+        """
+        page_token = None
+        while True:
+            page = self.read_records_page(record_type, start_date, end_date, page_size, page_token)
+            yield from page.records
+            page_token = page.next_page_token
+            if page_token is None:
+                return
+    
+    def iter_steps_data(self, start_date: datetime, end_date: datetime,
+                        page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[StepsRecord]:
+        """歩数データを1件ずつ返す（ページ単位で取得）"""
+        return self.iter_records("steps", start_date, end_date, page_size)
+    
+    def iter_weight_data(self, start_date: datetime, end_date: datetime,
+                         page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[WeightRecord]:
+        """体重データを1件ずつ返す（ページ単位で取得）"""
+        return self.iter_records("weight", start_date, end_date, page_size)
+    
+    def iter_sleep_data(self, start_date: datetime, end_date: datetime,
+                        page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[SleepRecord]:
+        """睡眠データを1件ずつ返す（ページ単位で取得）"""
+        return self.iter_records("sleep", start_date, end_date, page_size)
+    
+    def iter_heart_rate_data(self, start_date: datetime, end_date: datetime,
+                             page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[HeartRateRecord]:
+        """心拍数のサンプルを1件ずつ返す（ページ単位で取得）"""
+        return self.iter_records("heart_rate", start_date, end_date, page_size)
+    
+    def iter_nutrition_data(self, start_date: datetime, end_date: datetime,
+                            page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[NutritionRecord]:
+        """栄養データを1件ずつ返す（ページ単位で取得）"""
+        return self.iter_records("nutrition", start_date, end_date, page_size)
     
     def read_steps_data(self, start_date: datetime, end_date: datetime) -> List[StepsRecord]:
         """
@@ -159,83 +623,211 @@ class HealthConnectClient:
         Returns:
             歩数データのリスト
         """
-        if self.mock_mode:
-            # モックデータを生成
-            records = []
-            current_date = start_date
-            while current_date <= end_date:
-                # ランダムな歩数データを生成（実際には実データを使用）
-                import random
-                steps = random.randint(3000, 15000)
-                
-                record = StepsRecord(
-                    steps=steps,
-                    timestamp=current_date,
-                    record_type="steps"
-                )
-                records.append(record)
-                current_date += timedelta(days=1)
-            
-            return records
-        else:
-            # 実際のHealth Connect APIを使用
-            # TODO: 実際のAPIコールを実装
-            pass
+        return list(self.iter_steps_data(start_date, end_date))
     
     def read_weight_data(self, start_date: datetime, end_date: datetime) -> List[WeightRecord]:
         """体重データを取得"""
-        if self.mock_mode:
-            records = []
-            current_date = start_date
-            while current_date <= end_date:
-                import random
-                weight = round(random.uniform(60.0, 80.0), 1)
-                body_fat = round(random.uniform(10.0, 25.0), 1)
-                
-                record = WeightRecord(
-                    weight_kg=weight,
-                    body_fat_percentage=body_fat,
-                    timestamp=current_date,
-                    record_type="weight"
-                )
-                records.append(record)
-                current_date += timedelta(days=1)
-            
-            return records
-        else:
-            # TODO: 実際のAPIコールを実装
-            pass
+        return list(self.iter_weight_data(start_date, end_date))
     
     def read_sleep_data(self, start_date: datetime, end_date: datetime) -> List[SleepRecord]:
         """睡眠データを取得"""
-        if self.mock_mode:
-            records = []
-            current_date = start_date
-            while current_date <= end_date:
-                import random
-                total_sleep = random.randint(360, 540)  # 6-9時間
-                deep_sleep = int(total_sleep * 0.2)
-                light_sleep = int(total_sleep * 0.6)
-                rem_sleep = int(total_sleep * 0.2)
-                
-                record = SleepRecord(
-                    total_sleep_minutes=total_sleep,
-                    deep_sleep_minutes=deep_sleep,
-                    light_sleep_minutes=light_sleep,
-                    rem_sleep_minutes=rem_sleep,
-                    sleep_efficiency=round(random.uniform(0.75, 0.95), 2),
-                    bedtime="23:30:00",
-                    wake_time="07:30:00",
-                    timestamp=current_date,
-                    record_type="sleep"
-                )
-                records.append(record)
-                current_date += timedelta(days=1)
+        return list(self.iter_sleep_data(start_date, end_date))
+    
+    def read_heart_rate_data(self, start_date: datetime, end_date: datetime) -> List[HeartRateRecord]:
+        """
+        心拍数データを取得
+        
+        1日に数万件になるので、集計するだけなら iter_heart_rate_data を使うこと。
+        """
+        return list(self.iter_heart_rate_data(start_date, end_date))
+    
+    def read_nutrition_data(self, start_date: datetime, end_date: datetime) -> List[NutritionRecord]:
+        """栄養データを取得"""
+        return list(self.iter_nutrition_data(start_date, end_date))
+    
+    def read_changes(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        since: Optional[datetime] = None
+    ) -> List[HealthRecord]:
+        """
+        前回の同期（ウォーターマーク）より新しいレコードだけを取得
+        
+        実際のHealth Connectでは変更トークン（getChanges）を使う想定。
+        モックモードではレコードのタイムスタンプをウォーターマークと比較する。
+        
+        Args:
+            record_type: データタイプ名（RECORD_READERS のキー）
+            start_date: 開始日時
+            end_date: 終了日時
+            since: ウォーターマーク（これより新しいレコードのみ返す、Noneなら全件）
             
-            return records
-        else:
-            # TODO: 実際のAPIコールを実装
-            pass
+        Returns:
+            レコードのリスト
+        """
+        return list(self.iter_changes(record_type, start_date, end_date, since))
+    
+    def iter_changes(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        since: Optional[datetime] = None
+    ) -> Iterator[HealthRecord]:
+        """read_changes と同じレコードを1件ずつ返す（全件をメモリに載せない）"""
+        if since is not None:
+            if since >= end_date:
+                return
+            # ウォーターマーク以前の期間は読まない
+            start_date = max(start_date, since)
+        
+        for record in self.iter_records(record_type, start_date, end_date):
+            if since is None or record.timestamp > since:
+                yield record
+    
+    def read_batch(
+        self,
+        record_type: str,
+        start_date: datetime,
+        end_date: datetime,
+        since: Optional[datetime] = None
+    ) -> RecordBatch:
+        """
+        指定期間のレコードを RecordBatch で取得
+        
+        モックモードではモックデータの配列から、実モードでは端末から届く列指向のチャンクから
+        直接作る（レコードを1件ずつ作らない）。
+        
+        Args:
+            record_type: データタイプ名（RECORD_READERS かつ BATCH_COLUMNS のキー）
+            start_date: 開始日時
+            end_date: 終了日時
+            since: ウォーターマーク（これより新しいレコードのみ返す、Noneなら全件）
+            
+        Returns:
+            RecordBatchインスタンス
+        """
+        if record_type in BATCH_COLUMNS:
+            with span("health_connect.read_batch", record_type=record_type) as batch_span:
+                if self.mock_mode:
+                    batch = self.mock_engine.batch(record_type, start_date, end_date, since)
+                else:
+                    batch = self.device.read_batch(record_type, start_date, end_date, since)
+                batch_span.records = len(batch)
+            return batch
+        return RecordBatch.from_records(record_type, self.iter_changes(record_type, start_date, end_date, since))
+    
+    def _get_executor(self) -> "ThreadPoolExecutor":
+        """読み取り用のスレッドプールを取得（初回のみ作成）"""
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="health-connect"
+            )
+        return self._executor
+    
+    def _submit_reads(
+        self,
+        record_types: List[str],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+        ranges: Optional[Dict[str, tuple]],
+        since: Optional[Dict[str, datetime]]
+    ) -> Dict[str, "Future"]:
+        """各データタイプの読み取りをスレッドプールに投入する"""
+        unknown_types = [record_type for record_type in record_types if record_type not in self.RECORD_READERS]
+        if unknown_types:
+            raise ValueError(f"未対応のデータタイプなのだ: {unknown_types}")
+        
+        ranges = ranges or {}
+        since = since or {}
+        
+        if not self.mock_mode:
+            # 実モードでは全てのタイプを1回のリクエストにまとめ、端末から交互に届く応答を待つ
+            return self.device.read_many({
+                record_type: ranges.get(record_type, (start_date, end_date)) + (since.get(record_type),)
+                for record_type in record_types
+            })
+        
+        executor = self._get_executor()
+        futures = {}
+        for record_type in record_types:
+            type_start, type_end = ranges.get(record_type, (start_date, end_date))
+            futures[record_type] = executor.submit(
+                self.read_changes, record_type, type_start, type_end, since.get(record_type)
+            )
+        return futures
+    
+    async def read_many(
+        self,
+        record_types: List[str],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        ranges: Optional[Dict[str, tuple]] = None,
+        return_exceptions: bool = False,
+        since: Optional[Dict[str, datetime]] = None
+    ) -> Dict[str, List[HealthRecord]]:
+        """
+        複数のデータタイプを並行して取得
+        
+        モックモードでは各 read_*_data をスレッドプール上で同時に実行するので、
+        全体の所要時間は一番遅いデータタイプの取得時間に近くなる。
+        同時実行数は max_concurrency で制限される。
+        実モードでは全てのタイプを1回のリクエストで端末に頼み、1往復でまとめて受け取る。
+        
+        Args:
+            record_types: 取得するデータタイプ名のリスト（RECORD_READERS のキー）
+            start_date: 開始日時
+            end_date: 終了日時
+            ranges: データタイプ名 → (開始日時, 終了日時)（指定したタイプは start_date/end_date より優先）
+            return_exceptions: Trueの場合、失敗したタイプは例外オブジェクトを値として返す
+            since: データタイプ名 → ウォーターマーク（指定したタイプはそれより新しいレコードのみ取得）
+            
+        Returns:
+            データタイプ名 → レコードのリスト の辞書
+        """
+        futures = self._submit_reads(record_types, start_date, end_date, ranges, since)
+        results = await asyncio.gather(
+            *(asyncio.wrap_future(future) for future in futures.values()),
+            return_exceptions=return_exceptions
+        )
+        return dict(zip(futures, results))
+    
+    def read_many_sync(
+        self,
+        record_types: List[str],
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        ranges: Optional[Dict[str, tuple]] = None,
+        return_exceptions: bool = False,
+        since: Optional[Dict[str, datetime]] = None
+    ) -> Dict[str, List[HealthRecord]]:
+        """
+        read_many の同期版（イベントループ外から呼び出す用）
+        
+        スレッドプールの結果を直接待つので、asyncio を読み込まずに済む。
+        """
+        futures = self._submit_reads(record_types, start_date, end_date, ranges, since)
+        results = {}
+        for record_type, future in futures.items():
+            try:
+                results[record_type] = future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[record_type] = e
+        return results
+    
+    def close(self):
+        """スレッドプールと端末への接続を解放"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self._device is not None:
+            self._device.close()
     
     def insert_weight_record(self, weight_kg: float, body_fat_percentage: Optional[float] = None) -> bool:
         """
@@ -252,8 +844,12 @@ class HealthConnectClient:
             self.logger.info(f"体重データを挿入したのだ: {weight_kg}kg, 体脂肪率: {body_fat_percentage}%")
             return True
         else:
-            # TODO: 実際のAPIコールを実装
-            pass
+            return self.device.insert_record(WeightRecord(
+                record_type="weight",
+                timestamp=datetime.now().astimezone(),
+                weight_kg=weight_kg,
+                body_fat_percentage=body_fat_percentage
+            ))
     
     def get_available_data_types(self) -> List[str]:
         """利用可能なデータ型のリストを取得"""
@@ -269,17 +865,25 @@ class HealthConnectClient:
         ]
 
 
-def create_health_connect_client(mock_mode: bool = True) -> HealthConnectClient:
+def create_health_connect_client(mock_mode: bool = True, max_concurrency: int = 4,
+                                 mock_seed: Optional[int] = None,
+                                 device_address: Optional[str] = None,
+                                 mock_user_index: int = 0) -> HealthConnectClient:
     """
     Health Connectクライアントを作成
     
     Args:
         mock_mode: モックモードで動作するかどうか
+        max_concurrency: read_many で同時に実行する読み取りの最大数
+        mock_seed: モックデータのシード（同じシードなら同じデータになる）
+        device_address: 実モードで接続するコンパニオンアプリの "host:port"
+        mock_user_index: モックデータのユーザー番号（同じシードでもユーザーごとに違うデータになる）
         
     Returns:
         HealthConnectClientインスタンス
     """
-    return HealthConnectClient(mock_mode=mock_mode)
+    return HealthConnectClient(mock_mode=mock_mode, max_concurrency=max_concurrency, mock_seed=mock_seed,
+                               device_address=device_address, mock_user_index=mock_user_index)
 
 
 if __name__ == "__main__":
@@ -301,4 +905,10 @@ if __name__ == "__main__":
     print(f"体重データ: {len(weight_data)}件")
     
     sleep_data = client.read_sleep_data(start_date, end_date)
-    print(f"睡眠データ: {len(sleep_data)}件") 
+    print(f"睡眠データ: {len(sleep_data)}件")
+    
+    # 並行取得テスト
+    all_data = client.read_many_sync(["steps", "weight", "sleep", "heart_rate", "nutrition"], start_date, end_date)
+    print(f"並行取得: { {record_type: len(records) for record_type, records in all_data.items()} }")
+    client.close()
+
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+心拍数のサンプルを逐次集計するのだ！
+
+秒単位の心拍数は1日に数万件になるので、リストに溜めずに1件ずつ受け取りながら
+平均・最大・最小・安静時心拍数・心拍ゾーンごとの滞在時間を計算するのだ。
+使うメモリはサンプル数によらず一定なのだ。
+"""
+import logging
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from metrics import span
+
+
+logger = logging.getLogger(__name__)
+
+
+# 最大心拍数の既定値（年齢がわからない場合）
+DEFAULT_MAX_HEART_RATE = 190
+
+# ゾーン名 → 最大心拍数に対する下限の割合（低い順）
+HEART_RATE_ZONES = (
+    ("rest", 0.0),
+    ("zone1", 0.5),
+    ("zone2", 0.6),
+    ("zone3", 0.7),
+    ("zone4", 0.8),
+    ("zone5", 0.9),
+)
+
+# 安静時心拍数は、この分数の移動平均の最小値とする
+RESTING_WINDOW_MINUTES = 5
+
+# これより間隔が空いたサンプル同士の間は計測していなかったとみなす（秒）
+MAX_SAMPLE_GAP_SECONDS = 60
+
+
+class HeartRateAccumulator:
+    """
+    心拍数サンプルの逐次集計
+
+    サンプルは時刻順に add() すること。各サンプルの滞在時間は次のサンプルまでの間隔
+    （MAX_SAMPLE_GAP_SECONDS まで）として心拍ゾーンに加算する。
+    """
+
+    def __init__(self, max_heart_rate: int = DEFAULT_MAX_HEART_RATE):
+        """
+        Args:
+            max_heart_rate: 心拍ゾーンの基準にする最大心拍数
+        """
+        self.max_heart_rate = max_heart_rate
+        self._zone_names = [name for name, _ in HEART_RATE_ZONES]
+        self._zone_bounds = [ratio * max_heart_rate for _, ratio in HEART_RATE_ZONES]
+
+        self.count = 0
+        self.total = 0
+        self.minimum: Optional[int] = None
+        self.maximum: Optional[int] = None
+        self.zone_seconds = [0.0] * len(HEART_RATE_ZONES)
+
+        self._previous_time: Optional[datetime] = None
+        self._previous_zone = 0
+        self._last_gap = 0.0
+
+        # 分ごとの平均と、直近 RESTING_WINDOW_MINUTES 分の移動平均の最小値
+        self._minute: Optional[datetime] = None
+        self._minute_total = 0
+        self._minute_count = 0
+        self._minute_means: deque = deque(maxlen=RESTING_WINDOW_MINUTES)
+        self._lowest_window: Optional[float] = None
+        self._lowest_minute: Optional[float] = None
+
+    def _zone_index(self, bpm: float) -> int:
+        return max(bisect_right(self._zone_bounds, bpm) - 1, 0)
+
+    def _close_minute(self):
+        """集計中の1分を確定して移動平均を更新"""
+        if not self._minute_count:
+            return
+        mean = self._minute_total / self._minute_count
+        self._minute_means.append(mean)
+        if self._lowest_minute is None or mean < self._lowest_minute:
+            self._lowest_minute = mean
+        if len(self._minute_means) == RESTING_WINDOW_MINUTES:
+            window = sum(self._minute_means) / RESTING_WINDOW_MINUTES
+            if self._lowest_window is None or window < self._lowest_window:
+                self._lowest_window = window
+        self._minute_total = 0
+        self._minute_count = 0
+
+    def add(self, timestamp: datetime, bpm: int):
+        """
+        サンプルを1件追加
+
+        Args:
+            timestamp: 計測時刻
+            bpm: 心拍数
+        """
+        self.count += 1
+        self.total += bpm
+        if self.minimum is None or bpm < self.minimum:
+            self.minimum = bpm
+        if self.maximum is None or bpm > self.maximum:
+            self.maximum = bpm
+
+        if self._previous_time is not None:
+            gap = (timestamp - self._previous_time).total_seconds()
+            if 0 < gap <= MAX_SAMPLE_GAP_SECONDS:
+                self.zone_seconds[self._previous_zone] += gap
+                self._last_gap = gap
+            elif gap > MAX_SAMPLE_GAP_SECONDS:
+                # 計測の途切れをまたぐ分は移動平均に含めない
+                self._close_minute()
+                self._minute_means.clear()
+        self._previous_time = timestamp
+        self._previous_zone = self._zone_index(bpm)
+
+        minute = timestamp.replace(second=0, microsecond=0)
+        if minute != self._minute:
+            self._close_minute()
+            self._minute = minute
+        self._minute_total += bpm
+        self._minute_count += 1
+
+    def add_records(self, records: Iterable) -> "HeartRateAccumulator":
+        """
+        HeartRateRecord をまとめて追加（ジェネレーターを渡せば1件ずつ処理される）
+
+        Args:
+            records: HeartRateRecord のイテラブル
+
+        Returns:
+            self
+        """
+        for record in records:
+            self.add(record.timestamp, record.heart_rate_bpm)
+        return self
+
+    def resting(self) -> Optional[float]:
+        """安静時心拍数（移動平均の最小値、データが短い場合は1分平均の最小値）。集計の最後に呼ぶこと"""
+        self._close_minute()
+        lowest = self._lowest_window if self._lowest_window is not None else self._lowest_minute
+        return round(lowest, 1) if lowest is not None else None
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        集計結果を activity データの heart_rate の形で返す
+
+        Returns:
+            {"average", "max", "min", "resting", "samples", "zone_minutes"} の辞書
+        """
+        zone_seconds = list(self.zone_seconds)
+        if self.count:
+            # 最後のサンプルは直前の間隔と同じだけ続いたとみなす
+            zone_seconds[self._previous_zone] += self._last_gap
+
+        return {
+            "average": round(self.total / self.count) if self.count else 0,
+            "max": self.maximum or 0,
+            "min": self.minimum or 0,
+            "resting": self.resting(),
+            "samples": self.count,
+            "zone_minutes": {
+                name: round(seconds / 60, 1) for name, seconds in zip(self._zone_names, zone_seconds)
+            }
+        }
+
+
+def summarize_heart_rate(records: Iterable, max_heart_rate: int = DEFAULT_MAX_HEART_RATE) -> Dict[str, Any]:
+    """
+    心拍数サンプルを1日分の集計結果にまとめるのだ
+
+    Args:
+        records: HeartRateRecord のイテラブル
+        max_heart_rate: 心拍ゾーンの基準にする最大心拍数
+
+    Returns:
+        HeartRateAccumulator.summary() の辞書
+    """
+    return HeartRateAccumulator(max_heart_rate).add_records(records).summary()
+
+
+def fetch_heart_rate_summary(client, start_time: datetime, end_time: datetime,
+                             max_heart_rate: int = DEFAULT_MAX_HEART_RATE) -> Dict[str, Any]:
+    """
+    Health Connectから心拍数を1件ずつ読みながら集計するのだ
+
+    Args:
+        client: Health Connectクライアント
+        start_time: 開始日時
+        end_time: 終了日時
+        max_heart_rate: 心拍ゾーンの基準にする最大心拍数
+
+    Returns:
+        HeartRateAccumulator.summary() の辞書
+    """
+    with span("fetch", data_type="heart_rate") as fetch_span:
+        summary = summarize_heart_rate(client.iter_heart_rate_data(start_time, end_time), max_heart_rate)
+        fetch_span.records = summary["samples"]
+    logger.info(f"心拍数データ集計完了: {summary['samples']}件, 平均{summary['average']}bpm, "
+                f"安静時{summary['resting']}bpm")
+    return summary
@@ -0,0 +1,180 @@
+"""
+HTTP通信の共通トランスポート
+
+認証処理やデータ取得処理で共有する requests のセッションを提供する。
+- Keep-Aliveによるコネクションの再利用（プールサイズ上限つき）
+- 429 / 5xx に対する指数バックオフ + ジッターつきの自動リトライ
+- 全リクエストへのデフォルトタイムアウト
+- 往復回数・リトライ回数・所要時間の記録（metrics）
+"""
+import os
+import threading
+from typing import Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import increment
+
+
+# デフォルト設定
+DEFAULT_TIMEOUT = (5.0, 30.0)  # (接続タイムアウト, 読み取りタイムアウト) 秒
+DEFAULT_POOL_CONNECTIONS = 10  # ホストごとのコネクションプール数
+DEFAULT_POOL_MAXSIZE = 10  # 1プールあたりの最大コネクション数
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_FACTOR = 0.5  # 0.5, 1, 2, 4, ... 秒
+DEFAULT_BACKOFF_JITTER = 0.5  # バックオフに加えるランダムな揺らぎ（秒）
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """タイムアウト未指定のリクエストにデフォルトのタイムアウトを付けるアダプター"""
+
+    def __init__(self, *args, timeout: Timeout = DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def create_retry(max_retries: int = DEFAULT_MAX_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> Retry:
+    """
+    リトライ設定を作成
+
+    トークンエンドポイントへのPOSTも再送して問題ないので、全メソッドをリトライ対象にする。
+
+    Args:
+        max_retries: 最大リトライ回数
+        backoff_factor: 指数バックオフの係数
+
+    Returns:
+        Retryインスタンス
+    """
+    retry_kwargs = dict(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=None,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    try:
+        return Retry(backoff_jitter=DEFAULT_BACKOFF_JITTER, **retry_kwargs)
+    except TypeError:
+        # urllib3 1.x にはジッターのオプションがない
+        return Retry(**retry_kwargs)
+
+
+def create_adapter(pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+                   pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+                   max_retries: int = DEFAULT_MAX_RETRIES,
+                   backoff_factor: float = DEFAULT_BACKOFF_FACTOR,
+                   timeout: Timeout = DEFAULT_TIMEOUT) -> TimeoutHTTPAdapter:
+    """
+    コネクションプールとリトライ設定つきのアダプターを作成
+
+    Args:
+        pool_connections: ホストごとのコネクションプール数
+        pool_maxsize: 1プールあたりの最大コネクション数
+        max_retries: 最大リトライ回数
+        backoff_factor: 指数バックオフの係数
+        timeout: デフォルトのタイムアウト
+
+    Returns:
+        TimeoutHTTPAdapterインスタンス
+    """
+    return TimeoutHTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=create_retry(max_retries, backoff_factor),
+        timeout=timeout
+    )
+
+
+def create_session(adapter: Optional[HTTPAdapter] = None) -> requests.Session:
+    """
+    アダプターをマウントしたセッションを作成
+
+    Args:
+        adapter: 使用するアダプター（省略時はプロセス共有のアダプター）
+
+    Returns:
+        requests.Session
+    """
+    adapter = adapter or get_adapter()
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.hooks['response'].append(record_response)
+    return session
+
+
+def record_response(response: requests.Response, *args, **kwargs):
+    """
+    レスポンスごとに往復回数・リトライ回数・所要時間を記録するフック
+
+    リトライはアダプター（urllib3）の中で行われるので、最終的なレスポンスに残った履歴から数える。
+    """
+    host = urlsplit(response.url).hostname or ""
+    increment("http_requests", host=host, status=response.status_code)
+    increment("http_seconds", response.elapsed.total_seconds(), host=host)
+    retries = getattr(response.raw, "retries", None)
+    if retries is not None and retries.history:
+        increment("http_retries", len(retries.history), host=host)
+
+
+_lock = threading.Lock()
+_adapter: Optional[TimeoutHTTPAdapter] = None
+_session: Optional[requests.Session] = None
+_owner_pid: Optional[int] = None
+
+
+def _reset_if_forked():
+    """fork後の子プロセスでは親のソケットを使わないよう作り直す"""
+    global _adapter, _session, _owner_pid
+    if _owner_pid != os.getpid():
+        _adapter = None
+        _session = None
+        _owner_pid = os.getpid()
+
+
+def get_adapter() -> TimeoutHTTPAdapter:
+    """
+    プロセス共有のアダプターを取得
+
+    ヘッダーの異なるセッション同士でも、このアダプター経由でコネクションプールを共有できる。
+
+    Returns:
+        TimeoutHTTPAdapterインスタンス
+    """
+    global _adapter
+    with _lock:
+        _reset_if_forked()
+        if _adapter is None:
+            _adapter = create_adapter()
+        return _adapter
+
+
+def get_session() -> requests.Session:
+    """
+    プロセス共有のセッションを取得
+
+    認証ヘッダーなど呼び出しごとに異なる値はセッションに設定せず、リクエストごとに渡すこと。
+
+    Returns:
+        requests.Session
+    """
+    global _session
+    adapter = get_adapter()
+    with _lock:
+        if _session is None:
+            _session = create_session(adapter)
+        return _session
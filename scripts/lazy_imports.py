@@ -0,0 +1,70 @@
+"""
+重いモジュールを実際に使うときまで読み込まないようにするのだ
+
+cron などで毎日起動するスクリプトは、使わない機能のモジュール（asyncio, sqlite3,
+numpy など）を読み込むだけで起動が遅くなるので、属性に初めて触れたときに読み込むのだ。
+
+    asyncio = lazy_import("asyncio")   # ここではまだ読み込まれない
+    asyncio.run(...)                   # ここで初めて読み込まれる
+
+注意: lazy_import は、最初に属性に触れるのがワーカースレッドになりうるモジュールには使ってはいけないのだ。
+importlib.util.LazyLoader はスレッドセーフではなく（Python 3.11）、複数のスレッドが同時に
+初めて触れると、読み込み中のモジュールを見たスレッドが AttributeError で失敗する。
+read_many_sync や multi_user のスレッドプール、端末との通信スレッドから使うモジュールは、
+使う関数の中で普通に import するのだ（import 文はモジュールごとのロックで守られている）。
+
+    def atomic_write_bytes(...):
+        import tempfile                # どのスレッドから呼ばれても安全
+"""
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def is_available(name: str) -> bool:
+    """
+    モジュールがインストールされているかを、読み込まずに調べるのだ
+
+    Args:
+        name: モジュール名
+
+    Returns:
+        インストールされているかどうか
+    """
+    if name in sys.modules:
+        return True
+    try:
+        return importlib.util.find_spec(name) is not None
+    except ImportError:
+        # 親パッケージがない場合
+        return False
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    属性に初めて触れたときに読み込まれるモジュールを返すのだ
+
+    スレッドセーフではないので、最初に触れるのがメインスレッドだと決まっているモジュールにだけ使うこと。
+
+    Args:
+        name: モジュール名
+
+    Returns:
+        モジュール（読み込み済みならそのもの）
+
+    Raises:
+        ImportError: モジュールがインストールされていない場合
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"モジュールが見つからないのだ: {name}", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,322 @@
+"""
+処理の段階ごとの時間と件数を記録するのだ
+
+取得・分析・保存などの段階をスパン（with ブロック）で囲むと、所要時間・件数・書き込んだ
+バイト数が段階ごとに集計され、実行の最後に Prometheus の textfile 形式か JSON Lines で
+書き出せるのだ。プロファイラを付けなくても本番の実行でどこに時間がかかっているかがわかる。
+
+    with span("fetch", data_type="sleep") as s:
+        records = client.read_sleep_data(start, end)
+        s.records = len(records)
+
+    increment("http_requests", host="oauth2.googleapis.com", status="200")
+    export_metrics("metrics/collect.prom")   # 省略時は環境変数 HEALTH_METRICS_FILE
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 書き出し先を指定する環境変数（.prom なら Prometheus の textfile、それ以外は JSON Lines）
+METRICS_FILE_ENV = "HEALTH_METRICS_FILE"
+
+# Prometheus のメトリクス名の接頭辞
+METRIC_PREFIX = "fitness_tracker"
+
+PROMETHEUS_EXTENSION = ".prom"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+logger = logging.getLogger(__name__)
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    """ラベルの辞書を、集計のキーに使える並べ替えたタプルにする"""
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    """Prometheus のラベル表記 {name="value",...} にする"""
+    if not key:
+        return ""
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in key
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+# スレッドごとの実行中のスパン（add_bytes で書き込み量を加える先）
+_local = threading.local()
+
+
+def _active_spans() -> List["Span"]:
+    spans = getattr(_local, "spans", None)
+    if spans is None:
+        spans = _local.spans = []
+    return spans
+
+
+class Span:
+    """
+    1つの段階の計測（with ブロックの中で records / bytes を設定する）
+
+    ブロックを抜けるときに所要時間とあわせてレジストリに記録される。
+    例外で抜けた場合はエラーとして数える（例外はそのまま伝わる）。
+    """
+
+    __slots__ = ("registry", "stage", "labels", "records", "bytes", "started", "duration")
+
+    def __init__(self, registry: "MetricsRegistry", stage: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.stage = stage
+        self.labels = labels
+        self.records = 0
+        self.bytes = 0
+        self.started = 0.0
+        self.duration = 0.0
+
+    def __enter__(self) -> "Span":
+        _active_spans().append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self.started
+        _active_spans().remove(self)
+        self.registry.record_span(self, failed=exc_type is not None)
+        return False
+
+
+class MetricsRegistry:
+    """段階ごとの集計とカウンターを保持する（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (段階, ラベル) → [回数, 合計秒数, 最大秒数, 件数, バイト数, エラー数]
+        self._stages: Dict[Tuple[str, LabelKey], List[float]] = {}
+        # (カウンター名, ラベル) → 値
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+
+    def span(self, stage: str, **labels) -> Span:
+        """
+        段階を計測するスパンを作成
+
+        Args:
+            stage: 段階の名前（fetch, save, health_connect.read_page など）
+            **labels: データタイプなどのラベル
+
+        Returns:
+            with で使う Span
+        """
+        return Span(self, stage, labels)
+
+    def record_span(self, span: Span, failed: bool = False):
+        """終わったスパンを集計に加える"""
+        key = (span.stage, _label_key(span.labels))
+        with self._lock:
+            stats = self._stages.get(key)
+            if stats is None:
+                stats = self._stages[key] = [0, 0.0, 0.0, 0, 0, 0]
+            stats[0] += 1
+            stats[1] += span.duration
+            stats[2] = max(stats[2], span.duration)
+            stats[3] += span.records
+            stats[4] += span.bytes
+            stats[5] += 1 if failed else 0
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """
+        カウンターを増やす
+
+        Args:
+            name: カウンター名（http_requests など、_total は付けない）
+            value: 増やす量
+            **labels: ラベル
+        """
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        """全ての集計を消す"""
+        with self._lock:
+            self._stages.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        現在の集計をJSONにそのまま書ける形で取得
+
+        Returns:
+            {"stages": [...], "counters": [...]}（merge() にそのまま渡せる）
+        """
+        with self._lock:
+            stages = [
+                {
+                    "stage": stage, "labels": dict(labels), "count": stats[0],
+                    "seconds_total": round(stats[1], 6), "seconds_max": round(stats[2], 6),
+                    "records": stats[3], "bytes": stats[4], "errors": stats[5],
+                }
+                for (stage, labels), stats in self._stages.items()
+            ]
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in self._counters.items()
+            ]
+        return {"stages": stages, "counters": counters}
+
+    def merge(self, snapshot: Dict[str, List[Dict[str, Any]]]):
+        """
+        別のプロセスなどで取った snapshot() を足し合わせる
+
+        Args:
+            snapshot: snapshot() の戻り値
+        """
+        with self._lock:
+            for entry in snapshot.get("stages", []):
+                key = (entry["stage"], _label_key(entry["labels"]))
+                stats = self._stages.setdefault(key, [0, 0.0, 0.0, 0, 0, 0])
+                stats[0] += entry["count"]
+                stats[1] += entry["seconds_total"]
+                stats[2] = max(stats[2], entry["seconds_max"])
+                stats[3] += entry["records"]
+                stats[4] += entry["bytes"]
+                stats[5] += entry["errors"]
+            for entry in snapshot.get("counters", []):
+                key = (entry["name"], _label_key(entry["labels"]))
+                self._counters[key] = self._counters.get(key, 0) + entry["value"]
+
+    def to_prometheus(self) -> str:
+        """
+        Prometheus のテキスト形式（node_exporter の textfile コレクター用）に変換
+
+        Returns:
+            メトリクスのテキスト
+        """
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        labelled = [(_format_labels((("stage", stage),) + labels), stats) for (stage, labels), stats in stages]
+
+        name = f"{METRIC_PREFIX}_stage_duration_seconds"
+        lines.append(f"# HELP {name} 段階の所要時間")
+        lines.append(f"# TYPE {name} summary")
+        for label_text, stats in labelled:
+            lines.append(f"{name}_sum{label_text} {stats[1]:g}")
+            lines.append(f"{name}_count{label_text} {stats[0]:g}")
+
+        stage_metrics = (
+            ("stage_duration_seconds_max", "段階の最大所要時間", "gauge", 2),
+            ("stage_records_total", "段階で処理したレコード数", "counter", 3),
+            ("stage_bytes_total", "段階で書き込んだバイト数", "counter", 4),
+            ("stage_errors_total", "例外で終わった段階の回数", "counter", 5),
+        )
+        for suffix, help_text, metric_type, index in stage_metrics:
+            name = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for label_text, stats in labelled:
+                lines.append(f"{name}{label_text} {stats[index]:g}")
+
+        previous = None
+        for (counter, labels), value in counters:
+            name = f"{METRIC_PREFIX}_{counter}_total"
+            if name != previous:
+                lines.append(f"# TYPE {name} counter")
+                previous = name
+            lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, **run_labels) -> str:
+        """
+        集計をファイルに書き出す
+
+        拡張子が .prom なら Prometheus の textfile として上書き（書きかけを読まれないよう
+        一時ファイルからリネーム）、それ以外は JSON Lines として1回の実行を1行で追記する。
+
+        Args:
+            path: 書き出し先
+            **run_labels: JSON Lines の行に含める実行の情報（エントリーポイント名など）
+
+        Returns:
+            書き出したパス
+        """
+        # storage は metrics を読み込むので、循環しないようここで読み込む
+        from codec import JSON_CODEC
+        from storage import atomic_write_text
+
+        path = str(path)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if path.endswith(PROMETHEUS_EXTENSION):
+            atomic_write_text(Path(path), self.to_prometheus())
+        else:
+            line = {"timestamp": time.time(), **run_labels, **self.snapshot()}
+            with open(path, 'ab') as f:
+                f.write(JSON_CODEC.encode(line) + b"\n")
+        return path
+
+
+# プロセス共有のレジストリ
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """プロセス共有のレジストリを取得"""
+    return _registry
+
+
+def span(stage: str, **labels) -> Span:
+    """プロセス共有のレジストリで段階を計測する（MetricsRegistry.span を参照）"""
+    return _registry.span(stage, **labels)
+
+
+def increment(name: str, value: float = 1, **labels):
+    """プロセス共有のレジストリのカウンターを増やす（MetricsRegistry.increment を参照）"""
+    _registry.increment(name, value, **labels)
+
+
+def add_bytes(size: int):
+    """
+    書き込んだバイト数を記録する（このスレッドで実行中の全てのスパンにも加える）
+
+    Args:
+        size: 書き込んだバイト数
+    """
+    for active in _active_spans():
+        active.bytes += size
+    _registry.increment("bytes_written", size)
+
+
+def export_metrics(path: Optional[str] = None, **run_labels) -> Optional[str]:
+    """
+    プロセス共有のレジストリを書き出すのだ
+
+    書き出しに失敗しても収集の結果には影響させないよう、例外はログに出すだけにする。
+
+    Args:
+        path: 書き出し先（省略時は環境変数 HEALTH_METRICS_FILE、どちらもなければ何もしない）
+        **run_labels: JSON Lines の行に含める実行の情報
+
+    Returns:
+        書き出したパス（書き出さなかった場合はNone）
+    """
+    path = path or os.getenv(METRICS_FILE_ENV)
+    if not path:
+        return None
+    try:
+        _registry.write(path, **run_labels)
+    except Exception as e:
+        logger.error(f"メトリクスの書き出しに失敗したのだ: {e}")
+        return None
+    logger.info(f"メトリクスを書き出したのだ: {path}")
+    return path
@@ -0,0 +1,458 @@
+"""
+モックモード用の合成データを NumPy でまとめて生成するのだ
+
+1件ずつ乱数を引いて timedelta で進める代わりに、日ごとの値は配列でまとめて作り、
+歩数や心拍数の細かいサンプルも1日分ずつ配列で作るので、負荷試験用に
+何百万件ものレコードを1秒ほどで用意できる。
+
+- シードを指定すれば、同じ日時の値は期間の区切り方に関係なく毎回同じになる
+  （乱数はシード・ユーザー番号・系列・日付だけから決まるのだ）
+- 値どうしに関係を持たせてある
+  - 体重はゆっくり上下し、直近1週間の活動量が多いと少し下がる
+  - 歩数は曜日で変わり（土曜は多く日曜は少ない）、運動した日は増える
+  - 活動量の多い日の夜は睡眠が長く深くなり、食事量も増える
+  - 心拍数は睡眠中に下がり、歩いている時間帯と夕方の運動中に上がる
+- 歩数・心拍数のサンプルの間隔を指定できる（1日を割り切れる秒数）
+
+    engine = MockDataEngine(seed=42, steps_interval_seconds=60)
+    timestamps, columns = engine.columns("heart_rate", start, end)   # NumPy配列
+    batch = engine.batch("heart_rate", start, end)                    # RecordBatch
+    for record in engine.iter_records("sleep", start, end):           # HealthRecord
+        ...
+
+日付の区切りは開始日時のタイムゾーン（ナイーブならローカル時刻）の0時で、
+期間中の夏時間の切り替えは考えないのだ。
+"""
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from health_connect_client import BATCH_COLUMNS, RECORD_CLASSES, HealthRecord, RecordBatch
+
+
+logger = logging.getLogger(__name__)
+
+
+# シードを指定する環境変数（fetch_* のように引数のないスクリプト用）
+MOCK_SEED_ENV = "HEALTH_MOCK_SEED"
+
+DAY_SECONDS = 24 * 60 * 60
+DAY_MS = DAY_SECONDS * 1000
+HOUR_MS = 60 * 60 * 1000
+
+# 歩数は1日1件（Health Connect の1日ごとの集計と同じ）、心拍数は5秒ごと
+DEFAULT_STEPS_INTERVAL_SECONDS = DAY_SECONDS
+DEFAULT_HEART_RATE_INTERVAL_SECONDS = 5
+
+RECORD_TYPES = ("steps", "weight", "sleep", "heart_rate", "nutrition")
+
+# 曜日（月曜=0）ごとの歩数の倍率と、運動する確率のしきい値（標準正規分布の値、火木土は運動しやすい）
+WEEKLY_STEP_FACTORS = np.array([1.0, 1.05, 0.98, 1.05, 1.1, 1.2, 0.75])
+WEEKLY_EXERCISE_THRESHOLDS = np.array([-1.0, 0.5, -1.0, 0.5, -1.0, 0.5, -1.5])
+
+# 日ごとの乱数をまとめて引く単位（この日数ごとに乱数生成器を作る）
+DAILY_BLOCK_DAYS = 64
+# 日ごとの乱数の系列数（列の意味は _daily_noise の利用箇所を参照）
+DAILY_CHANNELS = 24
+# 1週間の活動量の平均を取るために前に余分に作る日数
+DAILY_LOOKBACK_DAYS = 7
+
+# 乱数生成器の系列番号（シード・ユーザー番号と組み合わせる）
+_STREAM_PROFILE = 0
+_STREAM_DAILY = 1
+_STREAM_STEPS = 2
+_STREAM_HEART_RATE = 3
+
+
+def _hours_text(hours: np.ndarray) -> list:
+    """0時からの時間数を "HH:MM:SS" の文字列にする（24時を超えたら翌日の時刻）"""
+    seconds = (np.round(hours * 3600).astype(np.int64)) % DAY_SECONDS
+    return [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds.tolist()]
+
+
+class MockDataEngine:
+    """
+    1人分の合成データを生成するエンジン
+
+    スレッドセーフ（乱数生成器は日ごとに作るので状態を持たない）。
+    """
+
+    def __init__(self, seed: Optional[int] = None, user_index: int = 0,
+                 steps_interval_seconds: int = DEFAULT_STEPS_INTERVAL_SECONDS,
+                 heart_rate_interval_seconds: int = DEFAULT_HEART_RATE_INTERVAL_SECONDS):
+        """
+        Args:
+            seed: 乱数のシード（Noneなら環境変数 HEALTH_MOCK_SEED、それもなければ毎回変わる）
+            user_index: ユーザー番号（ユーザーごとに体格や生活リズムが変わる）
+            steps_interval_seconds: 歩数レコードの間隔（秒、1日を割り切れる値）
+            heart_rate_interval_seconds: 心拍数サンプルの間隔（秒、1日を割り切れる値）
+        """
+        for name, interval in (("steps_interval_seconds", steps_interval_seconds),
+                               ("heart_rate_interval_seconds", heart_rate_interval_seconds)):
+            if interval <= 0 or DAY_SECONDS % interval:
+                raise ValueError(f"{name} は1日（86400秒）を割り切れる正の値にするのだ: {interval}")
+
+        if seed is None and os.getenv(MOCK_SEED_ENV):
+            seed = int(os.getenv(MOCK_SEED_ENV))
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+            # 再現したいときに指定できるようにシードを残す
+            logger.info(f"モックデータのシード: {seed}（{MOCK_SEED_ENV} に指定すると同じデータになるのだ）")
+
+        self.seed = seed
+        self.user_index = user_index
+        self.steps_interval_seconds = steps_interval_seconds
+        self.heart_rate_interval_seconds = heart_rate_interval_seconds
+
+        # ユーザーの体格・生活リズム
+        rng = self._rng(_STREAM_PROFILE)
+        self.base_weight_kg = rng.uniform(55.0, 90.0)
+        self.base_body_fat = rng.uniform(12.0, 28.0)
+        self.mean_steps = rng.uniform(5000.0, 11000.0)
+        self.resting_heart_rate = rng.uniform(54.0, 68.0)
+        self.sleep_need_minutes = rng.uniform(400.0, 480.0)
+        self.bedtime_hour = rng.uniform(22.5, 23.9)
+        self.base_calories = rng.uniform(1700.0, 2200.0)
+        # 体重の長い周期と短い周期のゆらぎ（振幅kg, 周期日数, 位相）
+        self.weight_waves = [
+            (rng.uniform(0.8, 2.0), rng.uniform(120.0, 240.0), rng.uniform(0, 2 * np.pi)),
+            (rng.uniform(0.2, 0.5), rng.uniform(25.0, 45.0), rng.uniform(0, 2 * np.pi)),
+        ]
+
+    def _rng(self, stream: int, *keys: int) -> np.random.Generator:
+        """シード・ユーザー番号・系列・キー（日付など）で決まる乱数生成器"""
+        return np.random.default_rng([self.seed, self.user_index, stream, *keys])
+
+    # ---- 日ごとの値 ----
+
+    def _daily_noise(self, first_day: int, last_day: int) -> np.ndarray:
+        """first_day〜last_day の日ごとの標準正規乱数（日数 x DAILY_CHANNELS）"""
+        blocks = []
+        for block in range(first_day // DAILY_BLOCK_DAYS, last_day // DAILY_BLOCK_DAYS + 1):
+            blocks.append(self._rng(_STREAM_DAILY, block).standard_normal((DAILY_BLOCK_DAYS, DAILY_CHANNELS)))
+        offset = first_day - first_day // DAILY_BLOCK_DAYS * DAILY_BLOCK_DAYS
+        return np.concatenate(blocks)[offset:offset + last_day - first_day + 1]
+
+    def daily(self, first_day: int, last_day: int) -> Dict[str, np.ndarray]:
+        """
+        日ごとの値をまとめて計算
+
+        Args:
+            first_day: 最初の日（1970-01-01 からの日数）
+            last_day: 最後の日（含む）
+
+        Returns:
+            値の名前 → 日ごとの配列（時刻は0時からの時間数）
+        """
+        days = np.arange(first_day - DAILY_LOOKBACK_DAYS, last_day + 1)
+        z = self._daily_noise(days[0], days[-1])
+        weekday = (days + 3) % 7  # 1970-01-01 は木曜
+        weekend_night = (weekday == 4) | (weekday == 5)
+
+        # 活動: 曜日の倍率と運動の有無で歩数が決まる
+        exercise = z[:, 1] < WEEKLY_EXERCISE_THRESHOLDS[weekday]
+        exercise_minutes = np.where(exercise, np.clip(45 + 10 * z[:, 18], 20, 75), 0.0)
+        exercise_start = 18.0 + np.clip(0.4 * z[:, 17], -1.0, 1.5)
+        steps = self.mean_steps * WEEKLY_STEP_FACTORS[weekday] * np.exp(0.25 * z[:, 0] - 0.03)
+        steps += exercise_minutes * 100
+        activity = np.clip(steps / self.mean_steps - 1, -1.0, 1.5)
+        activity_week = np.convolve(activity, np.full(DAILY_LOOKBACK_DAYS, 1 / DAILY_LOOKBACK_DAYS))[:len(days)]
+
+        # 体重: ゆっくりした周期的な変化に、1週間の活動量の影響と日々のばらつきを足す
+        weight = self.base_weight_kg - 0.8 * activity_week + 0.25 * z[:, 2]
+        for amplitude, period, phase in self.weight_waves:
+            weight += amplitude * np.sin(2 * np.pi * days / period + phase)
+        body_fat = self.base_body_fat + 0.3 * (weight - self.base_weight_kg) + 0.4 * z[:, 3]
+        muscle_mass = weight * (1 - body_fat / 100) * 0.55 + 0.2 * z[:, 20]
+
+        # その日の夜の睡眠: 活動量が多いと長く深く、金土の夜は遅く短い
+        bedtime = self.bedtime_hour + 0.6 * weekend_night + 0.35 * z[:, 6]
+        total_sleep = np.clip(self.sleep_need_minutes + 20 * activity - 25 * weekend_night + 35 * z[:, 4], 240, 660)
+        efficiency = np.clip(0.86 + 0.03 * activity + 0.03 * z[:, 5], 0.6, 0.98)
+        deep_ratio = np.clip(0.18 + 0.03 * activity + 0.02 * z[:, 7], 0.08, 0.30)
+        rem_ratio = np.clip(0.21 + 0.02 * z[:, 8], 0.12, 0.30)
+        wake = bedtime + total_sleep / efficiency / 60
+
+        # 食事: 活動量に応じて増える
+        calories = np.clip(self.base_calories + 0.035 * steps + 120 * z[:, 9], 1200, 4000)
+        protein_ratio = np.clip(0.20 + 0.02 * z[:, 10], 0.12, 0.30)
+        carbs_ratio = np.clip(0.52 + 0.04 * z[:, 11], 0.40, 0.65)
+        fat_ratio = np.clip(1 - protein_ratio - carbs_ratio, 0.15, 0.40)
+        breakfast_ratio = np.clip(0.25 + 0.025 * z[:, 12], 0.15, 0.35)
+        lunch_ratio = np.clip(0.35 + 0.025 * z[:, 21], 0.25, 0.45)
+        dinner_ratio = np.clip(0.33 + 0.025 * z[:, 22], 0.25, 0.45)
+
+        values = {
+            "day": days,
+            "weekday": weekday,
+            "steps": np.round(steps).astype(np.int64),
+            "exercise_start": exercise_start,
+            "exercise_minutes": exercise_minutes,
+            "weight_kg": np.round(weight, 1),
+            "body_fat_percentage": np.round(body_fat, 1),
+            "muscle_mass_kg": np.round(muscle_mass, 1),
+            "weigh_in": np.clip(7.0 + 0.25 * z[:, 19], 5.0, 10.0),
+            "bedtime": bedtime,
+            "wake": wake,
+            "total_sleep_minutes": np.round(total_sleep).astype(np.int64),
+            "deep_sleep_minutes": (total_sleep * deep_ratio).astype(np.int64),
+            "rem_sleep_minutes": (total_sleep * rem_ratio).astype(np.int64),
+            "sleep_efficiency": np.round(efficiency, 2),
+            "calories_consumed": np.round(calories),
+            "protein_g": np.round(calories * protein_ratio / 4, 1),
+            "carbs_g": np.round(calories * carbs_ratio / 4, 1),
+            "fat_g": np.round(calories * fat_ratio / 9, 1),
+            "fiber_g": np.round(np.clip(27 + 4 * z[:, 13], 10, 45), 1),
+            "sugar_g": np.round(np.clip(55 + 12 * z[:, 14], 15, 120), 1),
+            "sodium_mg": np.round(np.clip(2300 + 350 * z[:, 15], 1000, 4000), 1),
+            "water_ml": np.round(np.clip(1800 + 0.05 * steps + 300 * z[:, 16], 800, 4000), 1),
+            "breakfast_ratio": breakfast_ratio,
+            "lunch_ratio": lunch_ratio,
+            "dinner_ratio": dinner_ratio,
+        }
+        values["light_sleep_minutes"] = (
+            values["total_sleep_minutes"] - values["deep_sleep_minutes"] - values["rem_sleep_minutes"]
+        )
+        return {name: value[DAILY_LOOKBACK_DAYS:] for name, value in values.items()}
+
+    # ---- 1日の中のサンプル ----
+
+    def _intensity(self, daily: Dict[str, np.ndarray], i: int, hours: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        i日目の時刻ごとの活動の強さと、起きているかどうか
+
+        Args:
+            daily: daily() の戻り値（i-1日目の起床時刻も使う）
+            i: daily の中の日の位置（1以上）
+            hours: 0時からの時間数の配列
+
+        Returns:
+            (活動の強さ, 起きているか) の配列
+        """
+        awake = (hours >= daily["wake"][i - 1] - 24) & (hours < daily["bedtime"][i])
+        intensity = np.ones_like(hours)
+        if daily["weekday"][i] < 5:
+            # 平日は朝夕の通勤で歩く
+            intensity += 4 * np.exp(-0.5 * ((hours - 8.0) / 0.4) ** 2)
+            intensity += 4 * np.exp(-0.5 * ((hours - 18.0) / 0.4) ** 2)
+        intensity += 2 * np.exp(-0.5 * ((hours - 12.5) / 0.5) ** 2)
+        start = daily["exercise_start"][i]
+        exercising = (hours >= start) & (hours < start + daily["exercise_minutes"][i] / 60)
+        intensity[exercising] = 25
+        intensity[~awake] = 0
+        return intensity, awake
+
+    def _steps_samples(self, daily: Dict[str, np.ndarray], i: int, interval: int) -> np.ndarray:
+        """i日目の歩数を interval 秒ごとに分ける（合計は日ごとの歩数と一致する）"""
+        hours = (np.arange(DAY_SECONDS // interval) + 0.5) * interval / 3600
+        intensity, _ = self._intensity(daily, i, hours)
+        rng = self._rng(_STREAM_STEPS, int(daily["day"][i]), interval)
+        weights = intensity * rng.gamma(2.0, 0.5, len(hours))
+        total = weights.sum()
+        if total == 0:
+            return np.zeros(len(hours), dtype=np.int64)
+        return rng.multinomial(daily["steps"][i], weights / total).astype(np.int64)
+
+    def _heart_rate_samples(self, daily: Dict[str, np.ndarray], i: int, interval: int) -> np.ndarray:
+        """i日目の心拍数を interval 秒ごとに生成"""
+        hours = (np.arange(DAY_SECONDS // interval) + 0.5) * interval / 3600
+        intensity, awake = self._intensity(daily, i, hours)
+        target = np.where(awake, self.resting_heart_rate + 12 + 3.5 * np.minimum(intensity, 6),
+                          self.resting_heart_rate - 4)
+        target[intensity >= 25] = 150 - 0.5 * (self.resting_heart_rate - 60)
+
+        # 数分かけて目標値に近づき、ゆっくりゆらぐ（指数の窓で平滑化）
+        rng = self._rng(_STREAM_HEART_RATE, int(daily["day"][i]), interval)
+        time_constant = max(1.0, 120 / interval)
+        kernel = np.exp(-np.arange(int(4 * time_constant) + 1) / time_constant)
+        kernel /= kernel.sum()
+        pad = len(kernel) - 1
+        smoothed = np.convolve(np.pad(target, (pad, 0), mode="edge"), kernel, mode="valid")
+        drift = np.convolve(rng.standard_normal(len(hours) + pad), kernel, mode="valid")
+        drift *= 3 / np.sqrt((kernel ** 2).sum())
+        bpm = smoothed + drift + rng.normal(0, 1.0, len(hours))
+        return np.clip(np.round(bpm), 35, 200).astype(np.int64)
+
+    # ---- 期間の指定 ----
+
+    @staticmethod
+    def _offset_ms(start_date: datetime) -> int:
+        """UTCからのずれ（ミリ秒、ナイーブならローカル時刻のずれ）"""
+        offset = start_date.utcoffset() if start_date.tzinfo else start_date.astimezone().utcoffset()
+        return int(offset.total_seconds() * 1000)
+
+    def _chunks(self, record_type: str, start_date: datetime, end_date: datetime,
+                chunk_days: int) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        期間を chunk_days 日ずつに分けて (タイムスタンプ, 列) を返す
+
+        タイムスタンプはUNIXエポックのミリ秒で、start_date〜end_date（両端を含む）のものだけ。
+        """
+        if record_type not in RECORD_TYPES:
+            raise ValueError(f"モックデータのないデータタイプなのだ: {record_type}")
+
+        offset = self._offset_ms(start_date)
+        start_ms = int(start_date.timestamp() * 1000)
+        end_ms = int(end_date.timestamp() * 1000)
+        if end_ms < start_ms:
+            return
+        # 睡眠は前日の夜の分が期間に入ることがあるので1日前から作る
+        first_day = (start_ms + offset) // DAY_MS - 1
+        last_day = (end_ms + offset) // DAY_MS
+
+        for chunk_first in range(first_day, last_day + 1, chunk_days):
+            chunk_last = min(chunk_first + chunk_days - 1, last_day)
+            daily = self.daily(chunk_first - 1, chunk_last)
+            timestamps, columns = self._generate(record_type, daily)
+            timestamps -= offset
+            mask = (timestamps >= start_ms) & (timestamps <= end_ms)
+            if mask.all():
+                yield timestamps, columns
+            elif mask.any():
+                yield timestamps[mask], {name: column[mask] for name, column in columns.items()}
+
+    def _generate(self, record_type: str, daily: Dict[str, np.ndarray]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """daily の2日目以降の分のレコードを作る（タイムスタンプは壁時計のミリ秒）"""
+        day_ms = daily["day"][1:] * DAY_MS
+        if record_type == "weight":
+            timestamps = day_ms + (daily["weigh_in"][1:] * HOUR_MS).astype(np.int64)
+            names = ("weight_kg", "body_fat_percentage", "muscle_mass_kg")
+        elif record_type == "sleep":
+            # 就寝時刻のレコード（collect は12時間ずらして前日の睡眠として扱う）
+            timestamps = day_ms + (daily["bedtime"][1:] * HOUR_MS).astype(np.int64)
+            names = ("total_sleep_minutes", "deep_sleep_minutes", "light_sleep_minutes",
+                     "rem_sleep_minutes", "sleep_efficiency", "bedtime", "wake")
+        elif record_type == "nutrition":
+            # 1日分の食事の記録として夜に1件
+            timestamps = day_ms + 21 * HOUR_MS
+            names = ("calories_consumed", "protein_g", "carbs_g", "fat_g", "fiber_g", "sugar_g",
+                     "sodium_mg", "water_ml", "breakfast_ratio", "lunch_ratio", "dinner_ratio")
+        elif record_type == "steps" and self.steps_interval_seconds == DAY_SECONDS:
+            timestamps = day_ms
+            names = ("steps",)
+        else:
+            if record_type == "steps":
+                interval, sampler, name = self.steps_interval_seconds, self._steps_samples, "steps"
+            else:
+                interval, sampler, name = self.heart_rate_interval_seconds, self._heart_rate_samples, "heart_rate_bpm"
+            grid = np.arange(0, DAY_MS, interval * 1000, dtype=np.int64)
+            timestamps = (day_ms[:, None] + grid).ravel()
+            values = np.concatenate([sampler(daily, i, interval) for i in range(1, len(daily["day"]))])
+            return timestamps, {name: values}
+
+        return timestamps, {name: daily[name][1:] for name in names}
+
+    def _chunk_days(self, record_type: str) -> int:
+        """1回に生成する日数（細かいサンプルは1日ずつ、日ごとの値は1年分ずつ）"""
+        if record_type == "heart_rate" or (record_type == "steps" and self.steps_interval_seconds < DAY_SECONDS):
+            return 1
+        return 366
+
+    def columns(self, record_type: str, start_date: datetime,
+                end_date: datetime) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """
+        指定期間のデータを配列で生成
+
+        Args:
+            record_type: データタイプ名（steps, weight, sleep, heart_rate, nutrition）
+            start_date: 開始日時
+            end_date: 終了日時（含む）
+
+        Returns:
+            (UNIXエポックのミリ秒の int64 配列, 列名 → 配列)
+            （sleep の bedtime / wake は0時からの時間数、nutrition の *_ratio は食事ごとの割合）
+        """
+        chunks = list(self._chunks(record_type, start_date, end_date, self._chunk_days(record_type) * 31))
+        if not chunks:
+            return np.empty(0, dtype=np.int64), {}
+        if len(chunks) == 1:
+            return chunks[0]
+        return (np.concatenate([timestamps for timestamps, _ in chunks]),
+                {name: np.concatenate([columns[name] for _, columns in chunks]) for name in chunks[0][1]})
+
+    def iter_columns(self, record_type: str, start_date: datetime,
+                     end_date: datetime) -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+        """
+        columns() と同じ配列を、日ごと（日ごとの値は1年分ごと）に分けて返す
+
+        長い期間の細かいサンプルを、全件をメモリに載せずに順に送りたいとき用。
+        """
+        return self._chunks(record_type, start_date, end_date, self._chunk_days(record_type))
+
+    def batch(self, record_type: str, start_date: datetime, end_date: datetime,
+              since: Optional[datetime] = None, data_source: str = "health_connect") -> RecordBatch:
+        """
+        指定期間のデータを RecordBatch で生成（レコードを1件ずつ作らない）
+
+        Args:
+            record_type: データタイプ名（BATCH_COLUMNS のキー）
+            start_date: 開始日時
+            end_date: 終了日時（含む）
+            since: ウォーターマーク（これより新しいレコードのみ）
+            data_source: データソース
+
+        Returns:
+            RecordBatchインスタンス
+        """
+        if record_type not in BATCH_COLUMNS:
+            raise ValueError(f"バッチに対応していないレコードタイプなのだ: {record_type}")
+        timestamps, columns = self.columns(record_type, start_date, end_date)
+        if since is not None and len(timestamps):
+            mask = timestamps > int(since.timestamp() * 1000)
+            timestamps = timestamps[mask]
+            columns = {name: column[mask] for name, column in columns.items()}
+        if record_type == "heart_rate":
+            columns["measurement_type"] = ["sample"] * len(timestamps)
+        return RecordBatch.from_arrays(record_type, timestamps, columns, data_source, start_date.tzinfo)
+
+    def iter_records(self, record_type: str, start_date: datetime, end_date: datetime) -> Iterator[HealthRecord]:
+        """
+        指定期間のデータをレコードとして1件ずつ返す
+
+        配列は日ごと（日ごとの値は1年分ごと）に作るので、長い期間でも全件をメモリに載せない。
+
+        Args:
+            record_type: データタイプ名
+            start_date: 開始日時
+            end_date: 終了日時（含む）
+
+        Yields:
+            HealthRecord のサブクラスのインスタンス
+        """
+        record_class = RECORD_CLASSES[record_type]
+        tzinfo = start_date.tzinfo
+        for timestamps, columns in self._chunks(record_type, start_date, end_date, self._chunk_days(record_type)):
+            if record_type == "sleep":
+                columns = dict(columns, bedtime=_hours_text(columns["bedtime"]), wake_time=_hours_text(columns["wake"]))
+                del columns["wake"]
+            elif record_type == "nutrition":
+                columns = dict(columns)
+                ratios = [columns.pop(f"{meal}_ratio").tolist() for meal in ("breakfast", "lunch", "dinner")]
+            values = {name: column if isinstance(column, list) else column.tolist() for name, column in columns.items()}
+            if record_type == "heart_rate":
+                values["measurement_type"] = ["sample"] * len(timestamps)
+
+            names = list(values)
+            for i, (timestamp, row) in enumerate(zip(timestamps.tolist(), zip(*values.values()))):
+                fields = dict(zip(names, row))
+                if record_type == "nutrition":
+                    fields["meal_breakdown"] = _meal_breakdown(fields["calories_consumed"], *(r[i] for r in ratios))
+                yield record_class(
+                    record_type=record_type,
+                    timestamp=datetime.fromtimestamp(timestamp / 1000, tz=tzinfo),
+                    **fields
+                )
+
+
+def _meal_breakdown(calories: float, breakfast: float, lunch: float, dinner: float) -> Dict[str, Dict]:
+    """1日のカロリーを食事ごとに分ける（残りは間食）"""
+    snacks = max(0.0, 1.0 - breakfast - lunch - dinner)
+    return {
+        "breakfast": {"calories": int(calories * breakfast), "time": "07:30:00"},
+        "lunch": {"calories": int(calories * lunch), "time": "12:00:00"},
+        "dinner": {"calories": int(calories * dinner), "time": "19:00:00"},
+        "snacks": {"calories": int(calories * snacks), "time": "15:00:00"},
+    }
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+複数ユーザーのデータをプロセスプールで並列に収集するのだ！
+
+ユーザーマニフェスト（JSON）に書かれたユーザーごとに collect.py と同じパイプラインを実行し、
+出力はユーザーごとのディレクトリ（例: users/<user_id>/activity/YYYY-MM-DD.json）に分けて保存するのだ。
+最後にユーザーごとの所要時間と成否をまとめて報告するのだ。
+
+ユーザーごとのデータの取得元は、実モードでは device_address の端末、モックモードでは
+user_id から決まるユーザー番号のモックデータなのだ（HEALTH_MOCK_SEED を固定しても全員同じにはならない）。
+refresh_token_env を書いたユーザーは、その環境変数のリフレッシュトークンで GoogleFitAuth を作るのだ
+（共通の GOOGLE_REFRESH_TOKEN を他のユーザーと共有しない）。
+
+マニフェストの例:
+    {
+      "users": [
+        {"user_id": "alice", "refresh_token_env": "ALICE_REFRESH_TOKEN"},
+        {"user_id": "bob", "types": ["activity", "weight"], "output_dir": "/data/bob"},
+        {"user_id": "carol", "mock_mode": false, "device_address": "127.0.0.1:8788"}
+      ]
+    }
+"""
+import logging
+import os
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from codec import dumps_text, load_file
+from collect import PLUGINS, collect, backfill, parse_date, resolve_date_range
+from metrics import METRICS_FILE_ENV, export_metrics, get_registry
+from profiling import add_profile_arguments, maybe_profile
+from storage import STORAGE_BACKENDS, get_storage
+from sync_state import SyncState
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+class UserConfig:
+    """
+    マニフェストに書かれた1ユーザー分の設定
+
+    起動を軽くするため dataclass にはしない（collect.CollectorPlugin と同じ理由）
+    """
+
+    def __init__(self, user_id: str, output_dir: Optional[str] = None, types: Optional[List[str]] = None,
+                 mock_mode: bool = True, device_address: Optional[str] = None,
+                 refresh_token_env: Optional[str] = None):
+        self.user_id = user_id
+        self.output_dir = output_dir
+        self.types = types
+        self.mock_mode = mock_mode
+        # 実モードで接続するこのユーザーの端末の "host:port"（adb forward したポートなど）
+        self.device_address = device_address
+        # このユーザーのリフレッシュトークンが入っている環境変数の名前
+        self.refresh_token_env = refresh_token_env
+
+    def __repr__(self) -> str:
+        return f"UserConfig({', '.join(f'{name}={value!r}' for name, value in vars(self).items())})"
+
+    def get_auth(self):
+        """
+        このユーザー用のGoogleFitAuthを作成するのだ
+
+        Returns:
+            GoogleFitAuthインスタンス
+        """
+        from auth import GoogleFitAuth
+
+        refresh_token = os.getenv(self.refresh_token_env) if self.refresh_token_env else None
+        if self.refresh_token_env and not refresh_token:
+            # 共通の GOOGLE_REFRESH_TOKEN に黙って切り替えると、他のユーザーとして認証してしまう
+            raise ValueError(f"[{self.user_id}] 環境変数 {self.refresh_token_env} が設定されていないのだ")
+        return GoogleFitAuth(refresh_token=refresh_token)
+
+    @property
+    def mock_user_index(self) -> int:
+        """モックデータのユーザー番号（マニフェストの順番が変わっても同じ番号になるよう user_id から決める）"""
+        return zlib.crc32(self.user_id.encode('utf-8'))
+
+
+class UserResult:
+    """1ユーザー分の収集結果（ワーカープロセスから pickle で返す）"""
+
+    def __init__(self, user_id: str, success: bool, elapsed_seconds: float,
+                 results: Optional[Dict[str, bool]] = None, error: Optional[str] = None,
+                 metrics: Optional[Dict] = None):
+        self.user_id = user_id
+        self.success = success
+        self.elapsed_seconds = elapsed_seconds
+        self.results = results or {}
+        self.error = error
+        # ワーカープロセスで計測した段階ごとの時間と件数（metrics.MetricsRegistry.snapshot()）
+        self.metrics = metrics
+
+    def __repr__(self) -> str:
+        return f"UserResult({', '.join(f'{name}={value!r}' for name, value in vars(self).items())})"
+
+    def to_dict(self) -> Dict:
+        """レポート用の辞書に変換"""
+        return dict(vars(self))
+
+
+def validate_user_id(user_id):
+    """
+    user_id が出力先ルートの直下の1つのディレクトリ名になるかを確かめるのだ
+
+    "../x" や絶対パスだと Path(output_root) / user_id がルートの外を指してしまう。
+
+    Args:
+        user_id: マニフェストのユーザーID
+
+    Raises:
+        ValueError: ディレクトリ名として使えないとき
+    """
+    if (not isinstance(user_id, str) or user_id in ("", ".", "..")
+            or "/" in user_id or "\\" in user_id or Path(user_id).name != user_id):
+        raise ValueError(f"ユーザーIDはディレクトリ名として使える名前にしてほしいのだ: {user_id!r}")
+
+
+def load_user_manifest(manifest_path, output_root='users'):
+    """
+    ユーザーマニフェストを読み込むのだ
+
+    Args:
+        manifest_path: マニフェストJSONのパス
+        output_root: output_dir が指定されていないユーザーの出力先ルート
+
+    Returns:
+        UserConfigのリスト
+    """
+    manifest = load_file(manifest_path)
+
+    entries = manifest['users'] if isinstance(manifest, dict) else manifest
+
+    users = []
+    seen_user_ids = set()
+    for entry in entries:
+        user = UserConfig(**entry)
+        validate_user_id(user.user_id)
+        if user.user_id in seen_user_ids:
+            raise ValueError(f"ユーザーIDが重複しているのだ: {user.user_id}")
+        seen_user_ids.add(user.user_id)
+
+        unknown_types = [name for name in (user.types or []) if name not in PLUGINS]
+        if unknown_types:
+            raise ValueError(f"[{user.user_id}] 未対応のデータタイプなのだ: {unknown_types}")
+
+        user.output_dir = user.output_dir or str(Path(output_root) / user.user_id)
+        users.append(user)
+
+    return users
+
+
+def collect_for_user(user, start_date=None, end_date=None, storage_kind="json", incremental=False, profile=None):
+    """
+    1ユーザー分のデータを収集するのだ（ワーカープロセス内で実行される）
+
+    Args:
+        user: ユーザー設定
+        start_date: バックフィル開始日（省略時は昨日のみ）
+        end_date: バックフィル終了日
+        storage_kind: 保存形式（STORAGE_BACKENDS のキー）
+        incremental: 前回の同期から変更のあった日だけ保存するかどうか
+        profile: profiling.maybe_profile に渡す設定（ワーカーごとにプロファイルを書き出す）
+
+    Returns:
+        UserResult
+    """
+    return maybe_profile(f"multi_user-{user.user_id}", _collect_for_user, user, start_date, end_date,
+                         storage_kind, incremental, **(profile or {}))
+
+
+def _collect_for_user(user, start_date, end_date, storage_kind, incremental):
+    """collect_for_user の本体"""
+    started = time.perf_counter()
+    client = None
+    storage = None
+    # ワーカープロセスは使い回されるので、前のユーザーの計測を持ち越さない
+    registry = get_registry()
+    registry.reset()
+
+    try:
+        from health_connect_client import create_health_connect_client
+        if user.refresh_token_env:
+            # 認証情報が揃っていないユーザーは、データを集める前に失敗させる
+            user.get_auth()
+        client = create_health_connect_client(mock_mode=user.mock_mode, device_address=user.device_address,
+                                              mock_user_index=user.mock_user_index)
+        storage = get_storage(storage_kind, user.output_dir, user.user_id)
+        sync_state = SyncState(user.output_dir) if incremental else None
+
+        if start_date:
+            results = backfill(client, user.types, start_date, end_date, storage=storage, sync_state=sync_state)
+        else:
+            results = collect(client, user.types, storage=storage, sync_state=sync_state)
+
+        return UserResult(
+            user_id=user.user_id,
+            success=all(results.values()),
+            elapsed_seconds=round(time.perf_counter() - started, 3),
+            results=results,
+            metrics=registry.snapshot()
+        )
+
+    except Exception as e:
+        return UserResult(
+            user_id=user.user_id,
+            success=False,
+            elapsed_seconds=round(time.perf_counter() - started, 3),
+            error=f"{type(e).__name__}: {e}",
+            metrics=registry.snapshot()
+        )
+
+    finally:
+        if client is not None:
+            client.close()
+        if storage is not None:
+            storage.close()
+
+
+def run_multi_user(users, start_date=None, end_date=None, workers=None, storage_kind="json", incremental=False,
+                   profile=None):
+    """
+    複数ユーザーの収集をプロセスプールで並列実行するのだ
+
+    Args:
+        users: UserConfigのリスト
+        start_date: バックフィル開始日（省略時は昨日のみ）
+        end_date: バックフィル終了日
+        workers: 並列数（省略時はCPU数）
+        storage_kind: 保存形式（STORAGE_BACKENDS のキー）
+        incremental: 前回の同期から変更のあった日だけ保存するかどうか
+        profile: profiling.maybe_profile に渡す設定（各ワーカーでユーザーごとに計測する）
+
+    Returns:
+        UserResultのリスト（マニフェストの順）
+    """
+    workers = workers or os.cpu_count() or 1
+    logger.info(f"{len(users)}ユーザーの収集を並列数{workers}で開始するのだ")
+
+    results_by_user = {}
+    # プロセスプールの読み込みは重い（約10ms）ので、実際に並列実行するときまで遅らせる
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(collect_for_user, user, start_date, end_date, storage_kind, incremental, profile): user
+            for user in users
+        }
+        for future in as_completed(futures):
+            user = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # ワーカープロセス自体が落ちた場合
+                result = UserResult(user_id=user.user_id, success=False, elapsed_seconds=0.0,
+                                    error=f"{type(e).__name__}: {e}")
+
+            if result.success:
+                logger.info(f"[{result.user_id}] 収集完了なのだ ({result.elapsed_seconds}秒)")
+            else:
+                logger.error(f"[{result.user_id}] 収集に失敗したのだ ({result.elapsed_seconds}秒): "
+                             f"{result.error or result.results}")
+            if result.metrics:
+                get_registry().merge(result.metrics)
+            results_by_user[user.user_id] = result
+
+    return [results_by_user[user.user_id] for user in users]
+
+
+def write_report(report_path, user_results, total_seconds):
+    """
+    ユーザーごとの結果レポートをJSONで保存するのだ
+
+    Args:
+        report_path: 保存先のパス
+        user_results: UserResultのリスト
+        total_seconds: 全体の所要時間
+    """
+    report = {
+        "total_seconds": round(total_seconds, 3),
+        "succeeded": sum(1 for result in user_results if result.success),
+        "failed": sum(1 for result in user_results if not result.success),
+        "users": [result.to_dict() for result in user_results]
+    }
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(dumps_text(report))
+
+    logger.info(f"結果レポートを保存したのだ: {report_path}")
+
+
+def parse_args(argv=None):
+    """コマンドライン引数を解析するのだ"""
+    # argparse はコマンドラインから起動したときだけ使うので、ここで読み込む
+    import argparse
+
+    parser = argparse.ArgumentParser(description="複数ユーザーのHealth Connectデータを並列に取得するのだ")
+    parser.add_argument("--manifest", required=True, help="ユーザーマニフェスト（JSON）のパス")
+    parser.add_argument("--workers", type=int, help="並列プロセス数（省略時はCPU数）")
+    parser.add_argument("--output-root", default="users", help="ユーザーごとの出力ディレクトリのルート")
+    parser.add_argument("--start", type=parse_date, help="バックフィル開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", type=parse_date, help="バックフィル終了日（YYYY-MM-DD、省略時は昨日）")
+    parser.add_argument("--report", help="結果レポート（JSON）の保存先")
+    parser.add_argument("--storage", choices=sorted(STORAGE_BACKENDS), default="json", help="保存形式")
+    parser.add_argument("--incremental", action="store_true", help="前回の同期から変更のあった日だけ保存する")
+    parser.add_argument("--metrics-file",
+                        help=f"全ユーザー分の段階ごとの時間と件数の書き出し先（省略時は環境変数 {METRICS_FILE_ENV}）")
+    add_profile_arguments(parser)
+    args = parser.parse_args(argv)
+
+    resolve_date_range(parser, args)
+
+    return args
+
+
+def main(argv=None):
+    """メイン処理なのだ"""
+    args = parse_args(argv)
+    logger.info("=== 複数ユーザー データ一括取得開始 ===")
+
+    try:
+        users = load_user_manifest(args.manifest, args.output_root)
+    except Exception as e:
+        logger.error(f"ユーザーマニフェストの読み込みに失敗したのだ: {e}")
+        return False
+
+    started = time.perf_counter()
+    # 実際の収集はワーカープロセスで行われるので、プロファイルはユーザーごとにワーカー側で取る
+    profile = {
+        "enabled": args.profile, "output_dir": args.profile_dir,
+        "sample_percent": args.profile_sample, "memory": args.profile_memory,
+    }
+    user_results = run_multi_user(users, args.start, args.end, args.workers, args.storage, args.incremental,
+                                  profile)
+    total_seconds = time.perf_counter() - started
+
+    for result in user_results:
+        status = "成功" if result.success else "失敗"
+        logger.info(f"  {result.user_id}: {status} ({result.elapsed_seconds}秒)")
+
+    failed = [result.user_id for result in user_results if not result.success]
+    logger.info(f"全体の所要時間: {total_seconds:.3f}秒, 成功: {len(user_results) - len(failed)}, 失敗: {len(failed)}")
+
+    if args.report:
+        write_report(args.report, user_results, total_seconds)
+    export_metrics(args.metrics_file, entry_point="multi_user", users=len(user_results))
+
+    if failed:
+        logger.error(f"収集に失敗したユーザーがいるのだ: {failed}")
+        return False
+
+    logger.info("=== 複数ユーザー データ一括取得完了 ===")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
@@ -0,0 +1,171 @@
+"""
+収集の実行を cProfile と tracemalloc で計測するのだ
+
+毎日の実行が遅くなったときに原因を調べられるよう、main() をまるごとプロファイルして
+1回の実行ごとに次のファイルを書き出すのだ。
+- <名前>-<日時>-<pid>.pstats   … cProfile の生データ（snakeviz や pstats で開ける）
+- <名前>-<日時>-<pid>.cpu.txt  … 累積時間の多い関数の一覧
+- <名前>-<日時>-<pid>.mem.txt  … 実行中に増えたメモリの多い行と、ピークのメモリ量
+
+本番では --profile-sample で一部の実行だけを計測すれば、ふだんの実行を遅くしないで済むのだ。
+
+    python collect.py --profile --profile-dir profiles --profile-sample 5
+    HEALTH_PROFILE_DIR=profiles python fetch_sleep.py
+"""
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from lazy_imports import lazy_import
+
+# プロファイルしない実行では読み込まない
+cProfile = lazy_import("cProfile")
+pstats = lazy_import("pstats")
+tracemalloc = lazy_import("tracemalloc")
+
+
+logger = logging.getLogger(__name__)
+
+
+# コマンドライン引数のない fetch_* 用の設定（環境変数）
+PROFILE_DIR_ENV = "HEALTH_PROFILE_DIR"
+PROFILE_SAMPLE_ENV = "HEALTH_PROFILE_SAMPLE"
+
+DEFAULT_PROFILE_DIR = "profiles"
+# レポートに載せる関数・行の数
+DEFAULT_TOP = 30
+# tracemalloc で保持する呼び出し元の深さ
+TRACEMALLOC_FRAMES = 10
+
+
+def should_profile(sample_percent: float) -> bool:
+    """
+    今回の実行を計測するかを決めるのだ
+
+    Args:
+        sample_percent: 計測する実行の割合（%、100なら毎回）
+
+    Returns:
+        計測するかどうか
+    """
+    if sample_percent >= 100:
+        return True
+    # 毎回計測する普段の実行では random を読み込まない
+    import random
+    return random.random() * 100 < sample_percent
+
+
+def add_profile_arguments(parser):
+    """
+    --profile 関連のオプションを追加するのだ
+
+    Args:
+        parser: argparse.ArgumentParser
+    """
+    parser.add_argument("--profile", action="store_true", help="cProfile と tracemalloc で実行を計測する")
+    parser.add_argument("--profile-dir", default=DEFAULT_PROFILE_DIR, help="計測結果の保存先")
+    parser.add_argument("--profile-sample", type=float, default=100.0,
+                        help="計測する実行の割合（%%、本番では小さくする）")
+    parser.add_argument("--profile-no-memory", dest="profile_memory", action="store_false",
+                        help="tracemalloc を使わない（CPUだけを計測して実行を遅くしにくくする）")
+
+
+def _write_cpu_report(profiler, path: Path, top: int):
+    with open(path, 'w', encoding='utf-8') as f:
+        stats = pstats.Stats(profiler, stream=f)
+        stats.sort_stats("cumulative").print_stats(top)
+        stats.sort_stats("tottime").print_stats(top)
+
+
+def _write_memory_report(start, end, peak: int, path: Path, top: int):
+    lines = [f"ピーク: {peak / 1024 / 1024:.1f} MiB", "", f"実行中に増えたメモリ（上位{top}行）:"]
+    lines += [str(diff) for diff in end.compare_to(start, "lineno")[:top]]
+    lines += ["", f"実行の最後に残っているメモリ（呼び出し元ごと、上位{top}件）:"]
+    for stat in end.statistics("traceback")[:top]:
+        lines.append(f"{stat.size / 1024:.1f} KiB, {stat.count}ブロック")
+        lines += [f"    {line}" for line in stat.traceback.format()]
+    path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+
+
+def run_profiled(name: str, func: Callable[..., Any], *args, output_dir=DEFAULT_PROFILE_DIR,
+                 memory: bool = True, top: int = DEFAULT_TOP, **kwargs) -> Any:
+    """
+    関数を cProfile（と tracemalloc）の下で実行してレポートを書き出すのだ
+
+    関数が例外を出してもレポートは書き出してから例外を伝える。
+
+    Args:
+        name: レポートのファイル名の先頭（エントリーポイント名）
+        func: 実行する関数
+        *args: func の引数
+        output_dir: レポートの保存先
+        memory: tracemalloc でメモリも計測するか
+        top: レポートに載せる関数・行の数
+        **kwargs: func のキーワード引数
+
+    Returns:
+        func の戻り値
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stem = output_dir / f"{name}-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+    if memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        start_snapshot = tracemalloc.take_snapshot()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        if memory:
+            end_snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        try:
+            profiler.dump_stats(f"{stem}.pstats")
+            _write_cpu_report(profiler, Path(f"{stem}.cpu.txt"), top)
+            if memory:
+                _write_memory_report(start_snapshot, end_snapshot, peak, Path(f"{stem}.mem.txt"), top)
+            logger.info(f"プロファイルを保存したのだ: {stem}.*")
+        except Exception as e:
+            # 計測結果が書けなくても実行の結果には影響させない
+            logger.error(f"プロファイルの保存に失敗したのだ: {e}")
+
+
+def maybe_profile(name: str, func: Callable[..., Any], *args, enabled: bool = False,
+                  output_dir: Optional[str] = None, sample_percent: Optional[float] = None,
+                  memory: bool = True, **kwargs) -> Any:
+    """
+    設定に応じて、関数をプロファイルつきか、そのまま実行するのだ
+
+    enabled が False でも環境変数 HEALTH_PROFILE_DIR があれば計測する
+    （割合は HEALTH_PROFILE_SAMPLE、省略時は毎回）。
+
+    Args:
+        name: レポートのファイル名の先頭（エントリーポイント名）
+        func: 実行する関数
+        *args: func の引数
+        enabled: --profile が指定されたか
+        output_dir: レポートの保存先
+        sample_percent: 計測する実行の割合（%）
+        memory: tracemalloc でメモリも計測するか
+        **kwargs: func のキーワード引数
+
+    Returns:
+        func の戻り値
+    """
+    if not enabled:
+        output_dir = os.getenv(PROFILE_DIR_ENV)
+        if not output_dir:
+            return func(*args, **kwargs)
+    if sample_percent is None:
+        sample_percent = float(os.getenv(PROFILE_SAMPLE_ENV) or 100)
+
+    if not should_profile(sample_percent):
+        return func(*args, **kwargs)
+    return run_profiled(name, func, *args, output_dir=output_dir or DEFAULT_PROFILE_DIR, memory=memory, **kwargs)
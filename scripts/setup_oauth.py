@@ -7,6 +7,9 @@ import requests
 import json
 from urllib.parse import urlencode
 
+from auth import GoogleFitAuth
+from http_session import get_session
+
 
 def print_setup_instructions():
     """セットアップ手順を表示"""
@@ -83,22 +86,10 @@ def test_credentials():
         print("すべての値を入力してください")
         return
     
-    # アクセストークンを取得してテスト
-    url = "https://oauth2.googleapis.com/token"
-    
-    data = {
-        'grant_type': 'refresh_token',
-        'refresh_token': refresh_token,
-        'client_id': client_id,
-        'client_secret': client_secret
-    }
-    
+    # アクセストークンを取得してテスト（キャッシュではなく実際にトークンを更新して確認する）
     try:
-        response = requests.post(url, data=data)
-        response.raise_for_status()
-        
-        token_data = response.json()
-        access_token = token_data.get('access_token')
+        auth = GoogleFitAuth(client_id=client_id, client_secret=client_secret, refresh_token=refresh_token)
+        access_token = auth.get_access_token(force_refresh=True)
         
         if access_token:
             print("✅ アクセストークンの取得に成功しました！")
@@ -110,7 +101,7 @@ def test_credentials():
             }
             
             test_url = "https://www.googleapis.com/fitness/v1/users/me/dataSources"
-            test_response = requests.get(test_url, headers=headers)
+            test_response = get_session().get(test_url, headers=headers)
             
             if test_response.status_code == 200:
                 print("✅ Google Fit APIへのアクセスに成功しました！")
@@ -0,0 +1,906 @@
+#!/usr/bin/env python3
+"""
+日別データの保存先（ストレージバックエンド）なのだ！
+
+- JsonDailyStorage: 従来どおり `<type>/YYYY-MM-DD.json` に1日1ファイルで保存する（エクスポート形式としても使う）
+- ColumnarStorage: `<type>/YYYY.columns/` に1年分を列指向のブロック（数値の列は int64 / float64 の配列）で保存する
+- SQLiteStorage: 組み込みSQLite（health.db）に日別データと個々のレコードを保存する
+
+ファイルの中身の形式は codec で選べる（既定は JSON、msgpack / cbor にすると拡張子も変わる）。
+読み込むときは中身から形式を判定するので、形式を切り替えた後も前のファイルを読めるのだ。
+
+列指向ストレージは書き込んだ日の分だけのブロックを足していき、ブロックが増えたら1年分を
+1ブロックにまとめ直すので、何年分のデータでもデータタイプごとに年数分（+α）のファイルを
+開くだけで読み込めるのだ（5年分で数ミリ秒）。
+
+どのバックエンドも保存した内容のダイジェストを `.digests.json` に記録しておき、
+created_at のような毎回変わる項目以外が前回と同じ日は書き込みを省略するのだ。
+"""
+import logging
+import os
+import struct
+import sys
+from array import array
+from datetime import date, datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Set
+
+from codec import CODEC_EXTENSIONS, CODECS, DEFAULT_CODEC, JSON_CODEC, get_codec, load_file, loads
+from metrics import add_bytes, increment, span
+
+if TYPE_CHECKING:
+    # レコードを読み書きするのは SQLite だけなので、クライアントのモジュールは使うときに読み込む
+    from health_connect_client import HealthRecord
+
+# 起動を速くするため hashlib / sqlite3 / tempfile は初めて書き込むときまで読み込まない。
+# multi_user ではワーカースレッドから書き込むので、lazy_import ではなく使う関数の中で import する
+
+
+# ログ設定
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# ネストした値（heart_rate など）を列に展開するときの区切り文字
+COLUMN_SEPARATOR = '.'
+
+# 内容が変わったかどうかの判定から外す、保存のたびに変わる項目
+VOLATILE_FIELDS = frozenset({"created_at"})
+
+
+def flatten_record(record: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """
+    ネストした辞書を "heart_rate.average" のようなキーの平坦な辞書に変換するのだ
+
+    Args:
+        record: 変換する辞書
+        prefix: キーの接頭辞（再帰用）
+
+    Returns:
+        平坦化した辞書
+    """
+    flat = {}
+    for key, value in record.items():
+        column = f"{prefix}{key}"
+        if isinstance(value, dict) and value:
+            flat.update(flatten_record(value, f"{column}{COLUMN_SEPARATOR}"))
+        else:
+            flat[column] = value
+    return flat
+
+
+def unflatten_record(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    flatten_record で平坦化した辞書を元のネストした辞書に戻すのだ
+
+    Args:
+        flat: 平坦化した辞書
+
+    Returns:
+        ネストした辞書
+    """
+    record: Dict[str, Any] = {}
+    for column, value in flat.items():
+        *parents, key = column.split(COLUMN_SEPARATOR)
+        node = record
+        for parent in parents:
+            node = node.setdefault(parent, {})
+        node[key] = value
+    return record
+
+
+def atomic_write_bytes(file_path: Path, data: bytes):
+    """
+    一時ファイルに書いてからリネームして、書きかけのファイルが残らないようにするのだ
+
+    Args:
+        file_path: 書き込み先
+        data: 書き込む内容
+    """
+    import tempfile
+    fd, tmp_path = tempfile.mkstemp(dir=file_path.parent, prefix=f".{file_path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, file_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    add_bytes(len(data))
+
+
+def atomic_write_text(file_path: Path, text: str):
+    """
+    atomic_write_bytes の文字列版
+
+    Args:
+        file_path: 書き込み先
+        text: 書き込む内容
+    """
+    atomic_write_bytes(file_path, text.encode('utf-8'))
+
+
+def find_data_file(directory: Path, stem: str, preferred_extension: str) -> Optional[Path]:
+    """
+    どのコーデックで書かれたかわからないファイルを探すのだ
+
+    Args:
+        directory: 探すディレクトリ
+        stem: 拡張子を除いたファイル名
+        preferred_extension: 先に探す拡張子（今のコーデックの拡張子）
+
+    Returns:
+        見つかったパス、なければNone
+    """
+    for extension in (preferred_extension, *CODEC_EXTENSIONS):
+        path = directory / f"{stem}{extension}"
+        if path.exists():
+            return path
+    return None
+
+
+def remove_stale_files(file_path: Path):
+    """別のコーデックで書かれた同じ名前のファイルを消す（コーデックを切り替えたとき用）"""
+    for extension in CODEC_EXTENSIONS:
+        if extension != file_path.suffix:
+            file_path.with_suffix(extension).unlink(missing_ok=True)
+
+
+def content_digest(record: Dict[str, Any]) -> str:
+    """
+    保存するデータの内容からダイジェストを計算するのだ
+
+    キーの順番や VOLATILE_FIELDS の値が違うだけなら同じダイジェストになる。
+
+    Args:
+        record: 保存するデータ
+
+    Returns:
+        SHA-256の16進文字列
+    """
+    import hashlib
+    canonical = {key: value for key, value in record.items() if key not in VOLATILE_FIELDS}
+    return hashlib.sha256(JSON_CODEC.encode(canonical, sort_keys=True)).hexdigest()
+
+
+class DigestIndex:
+    """
+    保存済みデータのダイジェストを記録するファイル
+
+    {"version": 1, "digests": {"<backend>:<user_id>:<data_type>": {"YYYY-MM-DD": "<sha256>"}}}
+    """
+
+    FILENAME = ".digests.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: インデックスファイルのパス
+        """
+        self.path = Path(path)
+        self._digests: Dict[str, Dict[str, str]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        try:
+            index = load_file(self.path)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            # 壊れている場合は全部書き直せばよい
+            logger.warning(f"ダイジェストのインデックスを読み込めなかったのだ: {e}")
+            return {}
+        if index.get("version") != self.FORMAT_VERSION:
+            return {}
+        return index["digests"]
+
+    def get(self, key: str, date_str: str) -> Optional[str]:
+        """記録済みのダイジェストを取得（未記録ならNone）"""
+        return self._digests.get(key, {}).get(date_str)
+
+    def update(self, key: str, digests: Dict[str, str]):
+        """日付 → ダイジェスト をまとめて記録"""
+        self._digests.setdefault(key, {}).update(digests)
+
+    def save(self):
+        """インデックスを一時ファイル経由で書き込む"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": self.FORMAT_VERSION, "digests": self._digests}
+        atomic_write_bytes(self.path, JSON_CODEC.encode(payload))
+
+
+class StorageBackend:
+    """日別データの保存先の基底クラス"""
+
+    # get_storage() で指定する名前
+    name = ""
+
+    def __init__(self, base_dir='.', user_id: str = "default", codec: str = DEFAULT_CODEC):
+        """
+        Args:
+            base_dir: 保存先のベースディレクトリ
+            user_id: ユーザーID（1つの保存先に複数ユーザーをまとめるバックエンド用）
+            codec: 書き込むときのシリアライズ形式（codec.CODECS のキー）
+        """
+        self.base_dir = Path(base_dir)
+        self.user_id = user_id
+        self.codec = get_codec(codec)
+        self._digest_index: Optional[DigestIndex] = None
+        # データタイプ → 実際に書き込んだ日付（日次サマリーの差分更新などに使う）
+        self.changed_days: Dict[str, Set[str]] = {}
+
+    @property
+    def digest_index(self) -> DigestIndex:
+        """ダイジェストのインデックス（初めて使うときに読み込む）"""
+        if self._digest_index is None:
+            self._digest_index = DigestIndex(self.base_dir / DigestIndex.FILENAME)
+        return self._digest_index
+
+    def save_day(self, data_type: str, date_str: str, record: Dict[str, Any]) -> str:
+        """
+        1日分のデータを保存（同じ日付があれば上書き）
+
+        Args:
+            data_type: データタイプ名（activity, weight など）
+            date_str: 日付文字列（YYYY-MM-DD）
+            record: 保存するデータ
+
+        Returns:
+            保存先のパス
+        """
+        return self.save_days(data_type, {date_str: record})[0]
+
+    def save_days(self, data_type: str, records: Dict[str, Dict[str, Any]]) -> List[str]:
+        """
+        複数日分のデータをまとめて保存（同じ日付があれば上書き）
+
+        前回保存したときと内容が同じ日は書き込まないのだ。
+
+        Args:
+            data_type: データタイプ名
+            records: 日付文字列 → 保存するデータ
+
+        Returns:
+            保存先のパスのリスト（書き込みを省略した日も含む）
+        """
+        self.save_changed_days(data_type, records)
+        return [self._location(data_type, date_str) for date_str in records]
+
+    def save_changed_days(self, data_type: str, records: Dict[str, Dict[str, Any]]) -> Set[str]:
+        """
+        save_days と同じく保存して、実際に書き込んだ日を返すのだ
+
+        Args:
+            data_type: データタイプ名
+            records: 日付文字列 → 保存するデータ
+
+        Returns:
+            書き込んだ日付文字列の集合（内容が変わらず省略した日は含まない）
+        """
+        key = f"{self.name}:{self.user_id}:{data_type}"
+        digests = {date_str: content_digest(record) for date_str, record in records.items()}
+        changed = {
+            date_str: record for date_str, record in records.items()
+            if digests[date_str] != self.digest_index.get(key, date_str) or not self._exists(data_type, date_str)
+        }
+
+        skipped = len(records) - len(changed)
+        if skipped:
+            logger.debug(f"[{data_type}] 内容に変更がない{skipped}日分は書き込みを省略したのだ")
+            increment("storage_skipped_days", skipped, backend=self.name, data_type=data_type)
+
+        if changed:
+            with span("storage.write", backend=self.name, data_type=data_type) as write_span:
+                self._write_days(data_type, changed)
+                write_span.records = len(changed)
+            self.digest_index.update(key, {date_str: digests[date_str] for date_str in changed})
+            self.digest_index.save()
+            self.changed_days.setdefault(data_type, set()).update(changed)
+
+        return set(changed)
+
+    def _write_days(self, data_type: str, records: Dict[str, Dict[str, Any]]):
+        """
+        複数日分のデータを実際に書き込む（各バックエンドで実装）
+
+        Args:
+            data_type: データタイプ名
+            records: 日付文字列 → 保存するデータ
+        """
+        raise NotImplementedError
+
+    def _location(self, data_type: str, date_str: str) -> str:
+        """1日分のデータの保存先（各バックエンドで実装）"""
+        raise NotImplementedError
+
+    def _exists(self, data_type: str, date_str: str) -> bool:
+        """保存先が残っているか（ファイルを手で消された場合に書き直すため）"""
+        return True
+
+    def load_range(self, data_type: str, start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        期間内のデータを日付順に読み込み
+
+        Args:
+            data_type: データタイプ名
+            start_date: 開始日（YYYY-MM-DD、省略時は最初から）
+            end_date: 終了日（YYYY-MM-DD、省略時は最後まで）
+
+        Returns:
+            データのリスト
+        """
+        raise NotImplementedError
+
+    def load_day(self, data_type: str, date_str: str) -> Optional[Dict[str, Any]]:
+        """
+        1日分のデータを読み込み
+
+        Returns:
+            データ、存在しない場合はNone
+        """
+        records = self.load_range(data_type, date_str, date_str)
+        return records[0] if records else None
+
+    def load_columns(self, data_type: str, start_date: Optional[str] = None,
+                     end_date: Optional[str] = None) -> Dict[str, List[Any]]:
+        """
+        期間内のデータを列（平坦化したキー → 値のリスト）の形で読み込み
+
+        Returns:
+            列名 → 値のリスト
+        """
+        rows = [flatten_record(record) for record in self.load_range(data_type, start_date, end_date)]
+        columns = {column: [] for row in rows for column in row}
+        for row in rows:
+            for column, values in columns.items():
+                values.append(row.get(column))
+        return columns
+
+    def pop_changed_days(self) -> Dict[str, Set[str]]:
+        """
+        前回呼び出してから書き込んだ日付を取り出す
+
+        Returns:
+            データタイプ → 書き込んだ日付の集合
+        """
+        changed_days, self.changed_days = self.changed_days, {}
+        return changed_days
+
+    def close(self):
+        """保存先を閉じる（必要なバックエンドのみ）"""
+
+
+class JsonDailyStorage(StorageBackend):
+    """`<type>/YYYY-MM-DD.json` に1日1ファイルで保存する従来形式（JSONは人が読めるように整形して書く）"""
+
+    name = "json"
+
+    def _file_path(self, data_type: str, date_str: str) -> Path:
+        return self.base_dir / data_type / f"{date_str}{self.codec.extension}"
+
+    def _existing_path(self, data_type: str, date_str: str) -> Optional[Path]:
+        return find_data_file(self.base_dir / data_type, date_str, self.codec.extension)
+
+    def _location(self, data_type, date_str):
+        return str(self._file_path(data_type, date_str))
+
+    def _exists(self, data_type, date_str):
+        return self._file_path(data_type, date_str).exists()
+
+    def _write_days(self, data_type, records):
+        type_dir = self.base_dir / data_type
+        type_dir.mkdir(parents=True, exist_ok=True)
+
+        for date_str, record in records.items():
+            file_path = self._file_path(data_type, date_str)
+            atomic_write_bytes(file_path, self.codec.encode(record, pretty=True))
+            remove_stale_files(file_path)
+
+    def load_range(self, data_type, start_date=None, end_date=None):
+        type_dir = self.base_dir / data_type
+        if not type_dir.is_dir():
+            return []
+
+        # 日付 → ファイル（同じ日付が複数の形式で残っていたら今のコーデックのものを使う）
+        paths: Dict[str, Path] = {}
+        for file_path in type_dir.glob('????-??-??.*'):
+            date_str = file_path.stem
+            if file_path.suffix not in CODEC_EXTENSIONS:
+                continue
+            if (start_date and date_str < start_date) or (end_date and date_str > end_date):
+                continue
+            if date_str not in paths or file_path.suffix == self.codec.extension:
+                paths[date_str] = file_path
+        return [load_file(paths[date_str]) for date_str in sorted(paths)]
+
+    def load_day(self, data_type, date_str):
+        file_path = self._existing_path(data_type, date_str)
+        if file_path is None:
+            return None
+        return load_file(file_path)
+
+
+# 列ブロックのファイルの先頭: マジック, ヘッダー長 uint32（リトルエンディアン）
+COLUMN_BLOCK_MAGIC = b"HCCB"
+COLUMN_BLOCK_PREFIX = struct.Struct("<4sI")
+
+# int64 の列で値がない（None）ことを表す値。float64 の列では NaN で表す
+MISSING_INT = -2 ** 63
+
+
+def _column_typecode(values: List[Any]) -> str:
+    """列の値から保存する型を決める（q: int64, d: float64, o: ヘッダーにそのまま書く）"""
+    present = [value for value in values if value is not None]
+    if not present:
+        return "o"
+    # bool は int のサブクラスなので type で比べる
+    if all(type(value) is int for value in present) and all(MISSING_INT < value < 2 ** 63 for value in present):
+        return "q"
+    # NaN は値がないことを表すのに使うので、NaN を含む列はそのまま書く
+    if all(type(value) is float and value == value for value in present):
+        return "d"
+    return "o"
+
+
+def _to_little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def encode_column_block(columns: Dict[str, List[Any]], codec) -> bytes:
+    """
+    列（date 列を含む）を1つのブロックのバイト列にするのだ
+
+    ブロックは マジック + ヘッダー長 + ヘッダー + 配列 の順に並ぶ。
+    ヘッダーはコーデックで書いた {"version", "rows", "columns": [[列名, 型]...], "objects": {列名: 値のリスト}}、
+    配列は date 列（日付の序数）と型が q / d の列を columns の順に int64 / float64 で並べたもの。
+
+    Args:
+        columns: 列名 → 値のリスト（date 列は YYYY-MM-DD）
+        codec: ヘッダーを書くコーデック
+
+    Returns:
+        ブロックのバイト列
+    """
+    dates = columns["date"]
+    header = {"version": ColumnarStorage.FORMAT_VERSION, "rows": len(dates), "columns": [], "objects": {}}
+    arrays = [array('q', [date.fromisoformat(date_str).toordinal() for date_str in dates])]
+    for name, values in columns.items():
+        if name == "date":
+            continue
+        typecode = _column_typecode(values)
+        header["columns"].append([name, typecode])
+        if typecode == "q":
+            arrays.append(array('q', [MISSING_INT if value is None else value for value in values]))
+        elif typecode == "d":
+            arrays.append(array('d', [float('nan') if value is None else value for value in values]))
+        else:
+            header["objects"][name] = values
+
+    encoded_header = codec.encode(header)
+    return b"".join([COLUMN_BLOCK_PREFIX.pack(COLUMN_BLOCK_MAGIC, len(encoded_header)), encoded_header,
+                     *(_to_little_endian(column) for column in arrays)])
+
+
+def decode_column_block(data: bytes) -> Dict[str, List[Any]]:
+    """
+    encode_column_block で作ったブロックを列に戻すのだ
+
+    Args:
+        data: ブロックのバイト列
+
+    Returns:
+        列名 → 値のリスト（date 列が先頭）
+    """
+    magic, header_length = COLUMN_BLOCK_PREFIX.unpack_from(data)
+    if magic != COLUMN_BLOCK_MAGIC:
+        raise ValueError("列ブロックのファイルではないのだ")
+    offset = COLUMN_BLOCK_PREFIX.size
+    header = loads(data[offset:offset + header_length])
+    offset += header_length
+    rows = header["rows"]
+
+    def take(typecode: str) -> List[Any]:
+        nonlocal offset
+        column = array(typecode)
+        column.frombytes(data[offset:offset + rows * column.itemsize])
+        if len(column) != rows:
+            raise ValueError("列ブロックが途中で切れているのだ")
+        offset += rows * column.itemsize
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column.tolist()
+
+    columns = {"date": [date.fromordinal(ordinal).isoformat() for ordinal in take('q')]}
+    for name, typecode in header["columns"]:
+        if typecode == "q":
+            columns[name] = [None if value == MISSING_INT else value for value in take('q')]
+        elif typecode == "d":
+            columns[name] = [None if value != value else value for value in take('d')]
+        else:
+            columns[name] = header["objects"][name]
+    return columns
+
+
+def merge_columns(parts: List[Dict[str, List[Any]]]) -> Dict[str, List[Any]]:
+    """
+    複数の列の塊を日付順の1つにまとめるのだ（同じ日付は後の塊の行で丸ごと置き換える）
+
+    Args:
+        parts: 列名 → 値のリスト のリスト（古い順）
+
+    Returns:
+        列名 → 値のリスト
+    """
+    names = dict.fromkeys(["date"] + [name for columns in parts for name in columns])
+    dates = [date_str for columns in parts for date_str in columns["date"]]
+    if all(earlier < later for earlier, later in zip(dates, dates[1:])):
+        # 毎日の追加のように、後の塊が全て前の塊より後の日付ならつなげるだけでよい
+        return {
+            name: [value for columns in parts
+                   for value in columns.get(name) or [None] * len(columns["date"])]
+            for name in names
+        }
+
+    latest = {}
+    for part, columns in enumerate(parts):
+        for i, date_str in enumerate(columns["date"]):
+            latest[date_str] = (part, i)
+    order = [latest[date_str] for date_str in sorted(latest)]
+    merged = {}
+    for name in names:
+        sources = [columns.get(name) for columns in parts]
+        merged[name] = [None if sources[part] is None else sources[part][i] for part, i in order]
+    return merged
+
+
+class ColumnarStorage(StorageBackend):
+    """
+    `<type>/YYYY.columns/NNNNNN.block` に1年分を列指向のブロックで保存する形式
+
+    1回の書き込みで1ブロック（書き込んだ日だけを持つ）を足し、読み込むときは同じ日付なら
+    後のブロックの行を使う。上書きでも追加でも書き込んだ日の分しかエンコードしないので、
+    毎日の更新で1年分を書き直すことはないのだ。ブロックが COMPACT_BLOCKS 個に達したら
+    1年分を1ブロックにまとめ直す（読み込むファイルの数を増やさないため）。
+    ブロックの中身は encode_column_block を参照。
+
+    以前の形式（`<type>/YYYY.columns.json`、{"version": 1, "columns": {...}}）もそのまま読み込め、
+    その年に初めて書き込むときに新しい形式にまとめ直すのだ。
+    """
+
+    name = "columnar"
+    FORMAT_VERSION = 2
+    BLOCK_SUFFIX = ".block"
+    # 1年分のブロックがこの数に達したら、次の書き込みでまとめ直す
+    COMPACT_BLOCKS = 16
+
+    def _year_dir(self, data_type: str, year: str) -> Path:
+        return self.base_dir / data_type / f"{year}.columns"
+
+    def _blocks(self, data_type: str, year: str) -> List[Path]:
+        year_dir = self._year_dir(data_type, year)
+        if not year_dir.is_dir():
+            return []
+        return sorted(year_dir.glob(f"*{self.BLOCK_SUFFIX}"))
+
+    def _legacy_file(self, data_type: str, year: str) -> Optional[Path]:
+        """以前の形式（1年1ファイル）のファイル"""
+        return find_data_file(self.base_dir / data_type, f"{year}.columns", self.codec.extension)
+
+    def _load_year(self, data_type: str, year: str) -> Dict[str, List[Any]]:
+        parts = []
+        legacy = self._legacy_file(data_type, year)
+        if legacy is not None:
+            parts.append(load_file(legacy)["columns"])
+        for block in self._blocks(data_type, year):
+            parts.append(decode_column_block(block.read_bytes()))
+        if len(parts) == 1:
+            # 1つだけなら日付順で重複もない
+            return parts[0]
+        return merge_columns(parts)
+
+    def _write_block(self, data_type: str, year: str, columns: Dict[str, List[Any]], number: int):
+        year_dir = self._year_dir(data_type, year)
+        year_dir.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(year_dir / f"{number:06d}{self.BLOCK_SUFFIX}", encode_column_block(columns, self.codec))
+
+    def _location(self, data_type, date_str):
+        return str(self._year_dir(data_type, date_str[:4]))
+
+    def _exists(self, data_type, date_str):
+        return self._year_dir(data_type, date_str[:4]).is_dir()
+
+    def _write_days(self, data_type, records):
+        by_year: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for date_str, record in records.items():
+            by_year.setdefault(date_str[:4], {})[date_str] = record
+
+        for year, year_records in by_year.items():
+            rows = [flatten_record({**record, "date": date_str}) for date_str, record in sorted(year_records.items())]
+            names = dict.fromkeys(["date"] + [column for row in rows for column in row])
+            columns = {name: [row.get(name) for row in rows] for name in names}
+
+            blocks = self._blocks(data_type, year)
+            number = int(blocks[-1].stem) + 1 if blocks else 0
+            legacy = self._legacy_file(data_type, year)
+            if legacy is None and len(blocks) < self.COMPACT_BLOCKS:
+                self._write_block(data_type, year, columns, number)
+                continue
+
+            # 書き込む日も含めて1ブロックにまとめ直し、書けてから古いブロックを消す
+            # （途中で止まっても、番号の大きいまとめたブロックが優先されるので内容は変わらない）
+            self._write_block(data_type, year, merge_columns([self._load_year(data_type, year), columns]), number)
+            for block in blocks:
+                block.unlink()
+            if legacy is not None:
+                for extension in CODEC_EXTENSIONS:
+                    (self.base_dir / data_type / f"{year}.columns{extension}").unlink(missing_ok=True)
+                logger.info(f"[{data_type}] {year}年の列指向ファイルを新しい形式に変換したのだ")
+
+    def _years(self, data_type: str) -> List[str]:
+        type_dir = self.base_dir / data_type
+        if not type_dir.is_dir():
+            return []
+        return sorted({
+            path.name[:4] for path in type_dir.glob('????.columns*')
+            if path.suffix in CODEC_EXTENSIONS or path.is_dir()
+        })
+
+    def load_columns(self, data_type, start_date=None, end_date=None):
+        merged: Dict[str, List[Any]] = {}
+        total_rows = 0
+        for year in self._years(data_type):
+            if (start_date and year < start_date[:4]) or (end_date and year > end_date[:4]):
+                continue
+            columns = self._load_year(data_type, year)
+            keep = [
+                i for i, date_str in enumerate(columns["date"])
+                if not (start_date and date_str < start_date) and not (end_date and date_str > end_date)
+            ]
+            for column in columns:
+                if column not in merged:
+                    merged[column] = [None] * total_rows
+            for column, values in merged.items():
+                year_values = columns.get(column)
+                if year_values is None:
+                    values.extend([None] * len(keep))
+                elif len(keep) == len(year_values):
+                    values.extend(year_values)
+                else:
+                    values.extend(year_values[i] for i in keep)
+            total_rows += len(keep)
+        return merged
+
+    def load_range(self, data_type, start_date=None, end_date=None):
+        columns = self.load_columns(data_type, start_date, end_date)
+        names = list(columns)
+        return [unflatten_record(dict(zip(names, row))) for row in zip(*columns.values())]
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    組み込みSQLiteに保存する形式
+
+    - daily テーブル: 日別データ（ユーザー・データタイプ・日付が主キー）
+    - records テーブル: Health Connectから取得した個々のレコード
+      （ユーザー・レコードタイプ・タイムスタンプのインデックスつき）。day 列は daily テーブルと
+      同じ日付なので、睡眠の夜中のレコードは前日になる（sqlite3 から日別に突き合わせる用）
+
+    WALモードで開くので、書き込み中も別プロセスから読み込めるのだ。
+    """
+
+    name = "sqlite"
+    DB_FILENAME = "health.db"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS daily (
+            user_id TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            date TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (user_id, data_type, date)
+        ) WITHOUT ROWID;
+
+        CREATE TABLE IF NOT EXISTS records (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            record_type TEXT NOT NULL,
+            timestamp INTEGER NOT NULL,  -- UNIXエポック（ミリ秒）
+            day TEXT NOT NULL,
+            payload TEXT NOT NULL
+        );
+
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_records_user_type_timestamp
+            ON records (user_id, record_type, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_records_user_type_day
+            ON records (user_id, record_type, day);
+    """
+
+    def __init__(self, base_dir='.', user_id: str = "default", codec: str = DEFAULT_CODEC, db_path=None):
+        """
+        Args:
+            base_dir: 保存先のベースディレクトリ
+            user_id: ユーザーID
+            codec: payload 列のシリアライズ形式（JSON以外はBLOBで入る）
+            db_path: データベースファイルのパス（省略時は base_dir/health.db）
+        """
+        super().__init__(base_dir, user_id, codec)
+        self.db_path = Path(db_path) if db_path else self.base_dir / self.DB_FILENAME
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        import sqlite3
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _location(self, data_type, date_str):
+        return f"{self.db_path}#{data_type}/{date_str}"
+
+    def _exists(self, data_type, date_str):
+        # health.db だけ消されて .digests.json が残っていても書き直せるよう、行があるかを見る
+        row = self.conn.execute(
+            "SELECT 1 FROM daily WHERE user_id = ? AND data_type = ? AND date = ?",
+            (self.user_id, data_type, date_str)
+        ).fetchone()
+        return row is not None
+
+    def _write_days(self, data_type, records):
+        rows = [
+            (self.user_id, data_type, date_str, self._encode(record))
+            for date_str, record in records.items()
+        ]
+        # 1トランザクションでまとめて書き込む
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO daily (user_id, data_type, date, payload) VALUES (?, ?, ?, ?)",
+                rows
+            )
+
+    def load_range(self, data_type, start_date=None, end_date=None):
+        cursor = self.conn.execute(
+            "SELECT payload FROM daily WHERE user_id = ? AND data_type = ? AND date BETWEEN ? AND ? ORDER BY date",
+            (self.user_id, data_type, start_date or "0000-00-00", end_date or "9999-99-99")
+        )
+        return [loads(payload) for (payload,) in cursor]
+
+    def _encode(self, value) -> Any:
+        """payload 列に入れる値（JSONは従来どおり文字列、それ以外はバイト列）"""
+        data = self.codec.encode(value)
+        # 書き込むときにしか呼ばれないので、ここで書き込み量として数える
+        add_bytes(len(data))
+        return data.decode('utf-8') if self.codec is JSON_CODEC else data
+
+    @staticmethod
+    def _epoch_millis(timestamp: datetime) -> int:
+        return int(timestamp.timestamp() * 1000)
+
+    def insert_records(self, records: Iterable["HealthRecord"],
+                       day_key: Optional[Callable[["HealthRecord"], str]] = None) -> int:
+        """
+        Health Connectのレコードをまとめて保存（同じタイムスタンプのレコードは上書き）
+
+        Args:
+            records: 保存するレコード
+            day_key: レコードが属する日付文字列を返す関数（CollectorPlugin.day_key、
+                     省略時はタイムスタンプの日付。睡眠は12時間ずらして前日扱いにするので渡すこと）
+
+        Returns:
+            保存した件数
+        """
+        day_key = day_key or (lambda record: record.timestamp.strftime('%Y-%m-%d'))
+        with span("storage.insert_records", backend=self.name) as insert_span:
+            rows = [
+                (
+                    self.user_id,
+                    record.record_type,
+                    self._epoch_millis(record.timestamp),
+                    day_key(record),
+                    self._encode(record)
+                )
+                for record in records
+            ]
+            with self.conn:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO records (user_id, record_type, timestamp, day, payload) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+            insert_span.records = len(rows)
+        return len(rows)
+
+
+# 名前 → ストレージバックエンドのクラス
+STORAGE_BACKENDS = {
+    JsonDailyStorage.name: JsonDailyStorage,
+    ColumnarStorage.name: ColumnarStorage,
+    SQLiteStorage.name: SQLiteStorage,
+}
+
+
+def get_storage(kind: str = "json", base_dir='.', user_id: str = "default",
+                codec: str = DEFAULT_CODEC) -> StorageBackend:
+    """
+    名前からストレージバックエンドを作成するのだ
+
+    Args:
+        kind: バックエンド名（STORAGE_BACKENDS のキー）
+        base_dir: 保存先のベースディレクトリ
+        user_id: ユーザーID
+        codec: シリアライズ形式（codec.CODECS のキー）
+
+    Returns:
+        StorageBackendインスタンス
+    """
+    if kind not in STORAGE_BACKENDS:
+        raise ValueError(f"未対応のストレージなのだ: {kind}")
+    return STORAGE_BACKENDS[kind](base_dir, user_id, codec)
+
+
+def export_to_json(source: StorageBackend, data_types: Iterable[str], dest_dir,
+                   start_date: Optional[str] = None, end_date: Optional[str] = None) -> int:
+    """
+    任意のストレージの内容を1日1ファイルのJSON形式に書き出すのだ
+
+    Args:
+        source: 読み込み元のストレージ
+        data_types: 書き出すデータタイプ名
+        dest_dir: 書き出し先のベースディレクトリ
+        start_date: 開始日（省略時は最初から）
+        end_date: 終了日（省略時は最後まで）
+
+    Returns:
+        書き出したファイル数
+    """
+    dest = JsonDailyStorage(dest_dir)
+    exported = 0
+    for data_type in data_types:
+        records = source.load_range(data_type, start_date, end_date)
+        dest.save_days(data_type, {record["date"]: record for record in records})
+        exported += len(records)
+        logger.info(f"[{data_type}] {len(records)}日分をJSONに書き出したのだ")
+    return exported
+
+
+def main(argv=None):
+    """ストレージ間の変換を行うのだ"""
+    # fetch_* から読み込まれるときは使わないので、CLIとして起動したときだけ読み込む
+    import argparse
+
+    parser = argparse.ArgumentParser(description="保存済みデータを別のストレージ形式に変換するのだ")
+    parser.add_argument("--from", dest="source", choices=sorted(STORAGE_BACKENDS), required=True,
+                        help="読み込み元のストレージ形式")
+    parser.add_argument("--to", dest="dest", choices=sorted(STORAGE_BACKENDS), default="json",
+                        help="書き出し先のストレージ形式")
+    parser.add_argument("--base-dir", default=".", help="読み込み元のベースディレクトリ")
+    parser.add_argument("--out-dir", required=True, help="書き出し先のベースディレクトリ")
+    parser.add_argument("--codec", choices=sorted(CODECS), default=DEFAULT_CODEC,
+                        help="書き出し先のシリアライズ形式（json以外は --to columnar / sqlite のみ）")
+    parser.add_argument("--types", nargs="+", default=["activity", "weight", "sleep", "nutrition"],
+                        help="変換するデータタイプ")
+    parser.add_argument("--start", help="開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", help="終了日（YYYY-MM-DD）")
+    args = parser.parse_args(argv)
+
+    source = get_storage(args.source, args.base_dir)
+    if args.dest == "json":
+        export_to_json(source, args.types, args.out_dir, args.start, args.end)
+        return True
+
+    dest = get_storage(args.dest, args.out_dir, codec=args.codec)
+    for data_type in args.types:
+        records = source.load_range(data_type, args.start, args.end)
+        dest.save_days(data_type, {record["date"]: record for record in records})
+        logger.info(f"[{data_type}] {len(records)}日分を変換したのだ")
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    exit(0 if success else 1)
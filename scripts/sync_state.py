@@ -0,0 +1,87 @@
+"""
+データタイプごとの同期状態（ウォーターマーク）を管理するのだ
+
+前回の同期でどこまでのレコードを取り込んだかをデータタイプごとに記録しておき、
+次回はそれより新しいレコードだけを Health Connect から取得するのだ。
+"""
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+from codec import JSON_CODEC, load_file
+from storage import atomic_write_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+class SyncState:
+    """データタイプ → 最終同期済みタイムスタンプ を保存するファイル"""
+
+    FILENAME = ".sync_state.json"
+
+    def __init__(self, base_dir='.', path=None):
+        """
+        Args:
+            base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+            path: 状態ファイルのパス（省略時は base_dir/.sync_state.json）
+        """
+        self.path = Path(path) if path else Path(base_dir) / self.FILENAME
+        self._state: Dict[str, Dict[str, str]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, str]]:
+        try:
+            return load_file(self.path)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            # 壊れている場合は全件取り直す
+            logger.warning(f"同期状態を読み込めなかったので最初から同期するのだ: {e}")
+            return {}
+
+    def get_watermark(self, record_type: str) -> Optional[datetime]:
+        """
+        前回までに取り込んだ最新のタイムスタンプを取得
+
+        Args:
+            record_type: レコードタイプ（steps, weight など）
+
+        Returns:
+            ウォーターマーク、未同期の場合はNone
+        """
+        entry = self._state.get(record_type)
+        return datetime.fromisoformat(entry["last_synced"]) if entry else None
+
+    def get_watermarks(self) -> Dict[str, datetime]:
+        """全レコードタイプのウォーターマークを取得"""
+        return {record_type: self.get_watermark(record_type) for record_type in self._state}
+
+    def advance(self, record_type: str, timestamp: datetime):
+        """
+        ウォーターマークを進める（現在より古いタイムスタンプでは戻さない）
+
+        Args:
+            record_type: レコードタイプ
+            timestamp: 取り込んだ最新のタイムスタンプ
+        """
+        current = self.get_watermark(record_type)
+        if current is not None and timestamp <= current:
+            return
+
+        self._state[record_type] = {
+            "last_synced": timestamp.isoformat(),
+            "updated_at": datetime.now(timezone.utc).isoformat()
+        }
+
+    def reset(self, record_type: Optional[str] = None):
+        """ウォーターマークを消して次回は全件取得させる（省略時は全タイプ）"""
+        if record_type is None:
+            self._state.clear()
+        else:
+            self._state.pop(record_type, None)
+
+    def save(self):
+        """状態ファイルを一時ファイル経由で書き込む"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_bytes(self.path, JSON_CODEC.encode(self._state, pretty=True))
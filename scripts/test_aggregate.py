@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+aggregate の日・週・月ごとの集計が、Pythonでグループ分けして np.percentile で求めた値と同じかを確かめるテストなのだ
+
+使い方:
+    python -m pytest test_aggregate.py
+"""
+import random
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from aggregate import AGGREGATE_FIELDS, aggregate, period_starts
+from health_connect_client import RecordBatch, WeightRecord
+
+
+START = datetime(2025, 1, 27, tzinfo=timezone.utc)
+
+
+def _weights(count=3000, seed=7):
+    """ばらばらの時刻の体重レコード（体脂肪率は欠けている日がある）"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        timestamp = START + timedelta(minutes=rng.randrange(0, 60 * 24 * 70))
+        records.append(WeightRecord(
+            record_type="weight", timestamp=timestamp, weight_kg=round(rng.uniform(60, 80), 1),
+            body_fat_percentage=None if rng.random() < 0.3 else round(rng.uniform(15, 25), 1),
+            muscle_mass_kg=None,
+        ))
+    return sorted(records, key=lambda record: record.timestamp)
+
+
+def _period_start(day: date, period: str) -> date:
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _expected(records, period, day_offset=timedelta(0)):
+    groups = defaultdict(lambda: defaultdict(list))
+    for record in records:
+        key = _period_start((record.timestamp - day_offset).date(), period).isoformat()
+        for name in AGGREGATE_FIELDS["weight"]:
+            groups[key][name].append(getattr(record, name))
+
+    report = {}
+    for key, columns in groups.items():
+        report[key] = {}
+        for name, values in columns.items():
+            values = np.array([value for value in values if value is not None], dtype=np.float64)
+            if len(values):
+                stats = {"count": len(values), "sum": values.sum(), "mean": values.mean(), "min": values.min(),
+                         "max": values.max(), "p50": np.percentile(values, 50), "p90": np.percentile(values, 90)}
+                stats = {stat: value if stat == "count" else round(float(value), 3) for stat, value in stats.items()}
+            else:
+                # 値が1つもない列（筋肉量）は件数0・合計0で、それ以外は None
+                stats = {"count": 0, "sum": 0.0, **dict.fromkeys(("mean", "min", "max", "p50", "p90"))}
+            report[key][name] = stats
+    return report
+
+
+def _approx(report):
+    return {key: {name: {stat: pytest.approx(value, abs=2e-3) if isinstance(value, float) else value
+                         for stat, value in stats.items()}
+                  for name, stats in columns.items()}
+            for key, columns in report.items()}
+
+
+@pytest.mark.parametrize("period", ["day", "week", "month"])
+def test_groups_match_a_python_group_by(period):
+    records = _weights()
+    assert aggregate("weight", records, period) == _approx(_expected(records, period))
+
+
+def test_batches_unsorted_input_and_day_offset_give_the_same_groups():
+    records = _weights(500)
+    expected = aggregate("weight", records, "day")
+
+    assert aggregate("weight", RecordBatch.from_records("weight", records), "day") == expected
+    shuffled = list(records)
+    random.Random(1).shuffle(shuffled)
+    assert aggregate("weight", shuffled, "day") == expected
+
+    offset = timedelta(hours=12)
+    assert aggregate("weight", records, "day", day_offset=offset) == _approx(_expected(records, "day", offset))
+    assert aggregate("weight", [], "week") == {}
+
+
+def test_period_starts():
+    timestamps = np.array(["2025-03-05T10:00", "2025-03-09T23:59", "2025-03-10T00:00", "2024-02-29T12:00"],
+                          dtype="datetime64[ms]")
+    assert period_starts(timestamps, "week").astype(str).tolist() == [
+        "2025-03-03", "2025-03-03", "2025-03-10", "2024-02-26"]
+    assert period_starts(timestamps, "month").astype(str).tolist() == [
+        "2025-03-01", "2025-03-01", "2025-03-01", "2024-02-01"]
+    assert period_starts(timestamps, "day", timedelta(hours=12)).astype(str).tolist() == [
+        "2025-03-04", "2025-03-09", "2025-03-09", "2024-02-29"]
+    with pytest.raises(ValueError):
+        period_starts(timestamps, "year")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+analysis_cache.AnalysisCache のキャッシュヒット・作り直し・LRU・保存を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_analysis_cache.py
+"""
+from datetime import datetime, timedelta, timezone
+
+from analysis_cache import AnalysisCache, analyze_stored
+from codec import JSON_CODEC
+from collect import PLUGINS, collect_range
+from fetch_sleep import analyze_sleep_patterns
+from health_connect_client import create_health_connect_client
+from storage import JsonDailyStorage
+
+
+SLEEP = {"total_sleep_minutes": 380, "sleep_efficiency": 0.7, "rem_sleep_minutes": 40,
+         "deep_sleep_minutes": 90, "light_sleep_minutes": 250}
+
+
+class CountingAnalyzer:
+    """呼ばれた回数を数える分析関数"""
+
+    def __init__(self):
+        # キーに使う名前（関数と違ってインスタンスには __qualname__ がない）
+        self.__qualname__ = type(self).__qualname__
+        self.calls = 0
+
+    def __call__(self, data):
+        self.calls += 1
+        return analyze_sleep_patterns(data)
+
+
+def test_same_input_is_analyzed_once(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    analyzer = CountingAnalyzer()
+
+    first = cache.analyze(analyzer, SLEEP)
+    # 保存時に付け足される date / created_at などはキーに含めない
+    stored = dict(SLEEP, date="2025-03-01", created_at="2025-03-02T00:00:00+00:00", data_source="health_connect")
+    second = cache.analyze(analyzer, stored)
+
+    assert second == first == analyze_sleep_patterns(SLEEP)
+    assert (analyzer.calls, cache.hits, cache.misses) == (1, 1, 1)
+
+    # 返した結果を書き換えてもキャッシュは変わらない
+    second["recommendations"].append("書き換え")
+    assert cache.analyze(analyzer, SLEEP) == first
+
+
+def test_changed_input_or_version_is_analyzed_again(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    analyzer = CountingAnalyzer()
+    cache.analyze(analyzer, SLEEP)
+    cache.analyze(analyzer, dict(SLEEP, total_sleep_minutes=480))
+    cache.analyze(analyzer, SLEEP, version=2)
+    assert analyzer.calls == 3
+    assert cache.hits == 0
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    cache = AnalysisCache(tmp_path, max_entries=2)
+    analyzer = CountingAnalyzer()
+    days = [dict(SLEEP, total_sleep_minutes=minutes) for minutes in (300, 400, 500)]
+    cache.analyze(analyzer, days[0])
+    cache.analyze(analyzer, days[1])
+    cache.analyze(analyzer, days[0])
+    cache.analyze(analyzer, days[2])
+
+    assert len(cache) == 2
+    cache.analyze(analyzer, days[0])
+    assert analyzer.calls == 3
+    cache.analyze(analyzer, days[1])
+    assert analyzer.calls == 4
+
+
+def test_saved_cache_is_reused_and_other_versions_are_ignored(tmp_path):
+    cache = AnalysisCache(tmp_path)
+    cache.analyze(CountingAnalyzer(), SLEEP)
+    cache.save()
+    written = cache.path.stat().st_mtime_ns
+    # 変更がなければ書き込まない
+    cache.save()
+    assert cache.path.stat().st_mtime_ns == written
+
+    analyzer = CountingAnalyzer()
+    reloaded = AnalysisCache(tmp_path)
+    reloaded.analyze(analyzer, SLEEP)
+    assert (analyzer.calls, reloaded.hits) == (0, 1)
+
+    cache.path.write_bytes(JSON_CODEC.encode({"version": AnalysisCache.FORMAT_VERSION + 1, "entries": []}))
+    assert len(AnalysisCache(tmp_path)) == 0
+    cache.path.write_bytes(b"{broken")
+    assert len(AnalysisCache(tmp_path)) == 0
+
+
+def test_stored_days_hit_the_cache_filled_by_collect(tmp_path):
+    client = create_health_connect_client(mock_mode=True, mock_seed=42)
+    storage = JsonDailyStorage(tmp_path)
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    try:
+        collect_range(client, ["sleep", "nutrition"], start, start + timedelta(days=6), storage=storage)
+    finally:
+        client.close()
+
+    # 取得直後のデータで分析した結果が、保存済みのデータを分析し直すときにそのまま使われる
+    cache = AnalysisCache(tmp_path)
+    for name in ("sleep", "nutrition"):
+        results = analyze_stored(storage, PLUGINS[name], cache)
+        assert len(results) == 7
+        assert results == {record["date"]: PLUGINS[name].analyze(record) for record in storage.load_range(name)}
+    assert (cache.hits, cache.misses) == (14, 0)
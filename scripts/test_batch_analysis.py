@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+batch_analysis.classify_nutrition / classify_sleep が fetch_nutrition.analyze_nutrition_balance /
+fetch_sleep.analyze_sleep_patterns と同じ結果を返すかを確かめるテストなのだ
+
+使い方:
+    python -m pytest test_batch_analysis.py
+"""
+import numpy as np
+
+from batch_analysis import classify_nutrition, classify_sleep
+from fetch_nutrition import analyze_nutrition_balance, round_percent
+from fetch_sleep import analyze_sleep_patterns
+
+
+NUTRITION_COLUMNS = ("calories_consumed", "protein_g", "fat_g", "carbs_g", "fiber_g", "water_ml")
+SLEEP_COLUMNS = ("total_sleep_minutes", "sleep_efficiency", "rem_sleep_minutes")
+
+
+def _random_nutrition_days(rng: np.random.Generator, days: int):
+    """判定の境界付近に寄せた栄養データをランダムに作る"""
+    calories = rng.choice([0, 1799, 1800, 2000, 2500, 2501], size=days) + rng.integers(-2, 3, size=days)
+    calories = np.clip(calories, 0, None).astype(float)
+    return [
+        {
+            "date": f"day-{i}",
+            "calories_consumed": calories[i],
+            # 小数第1位までのグラム数（PFC の割合が境界ちょうどになる日が混ざるようにする）
+            "protein_g": round(float(rng.uniform(40, 130)), 1),
+            "fat_g": round(float(rng.uniform(30, 90)), 1),
+            "carbs_g": round(float(rng.uniform(180, 380)), 1),
+            "fiber_g": float(rng.integers(10, 30)),
+            "water_ml": float(rng.integers(1000, 2500)),
+        }
+        for i in range(days)
+    ]
+
+
+def _random_sleep_days(rng: np.random.Generator, days: int):
+    """6・7・9時間や効率 0.75・0.85、REM 15% の境界付近に寄せた睡眠データをランダムに作る（記録なしの日も混ぜる）"""
+    def maybe_none(value):
+        return None if rng.random() < 0.1 else value
+
+    result = []
+    for i in range(days):
+        total = int(rng.choice([0, 359, 360, 361, 419, 420, 421, 539, 540, 541, 600])) + int(rng.integers(-1, 2))
+        result.append({
+            "date": f"day-{i}",
+            "total_sleep_minutes": maybe_none(max(total, 0)),
+            "sleep_efficiency": maybe_none(float(rng.choice([0.0, 0.6, 0.7499, 0.75, 0.8, 0.8499, 0.85, 0.95]))),
+            # REM はちょうど 15% になる日が混ざるようにする
+            "rem_sleep_minutes": maybe_none(int(rng.choice([0, total * 15 // 100, total * 15 // 100 + 1,
+                                                            total // 4]))),
+        })
+    return result
+
+
+def _to_columns(days, names=NUTRITION_COLUMNS):
+    return {name: [day[name] for day in days] for name in ("date",) + names}
+
+
+def test_round_percent_matches_for_scalars_and_arrays():
+    ratios = np.random.default_rng(0).uniform(0, 1, size=10000)
+    ratios[:3] = [39.9 * 9 / 1800, 0.1995, 0.2]
+    batch = round_percent(ratios)
+    assert [round_percent(float(ratio)) for ratio in ratios] == batch.tolist()
+
+
+def test_classify_nutrition_matches_analyze_nutrition_balance():
+    days = _random_nutrition_days(np.random.default_rng(42), 5000)
+    # 組み込みの round と np.round で結果が分かれていた日（脂質 19.95%）
+    days.append({"date": "fat-boundary", "calories_consumed": 1800.0, "protein_g": 80.0, "fat_g": 39.9,
+                 "carbs_g": 250.0, "fiber_g": 25.0, "water_ml": 2000.0})
+
+    batch = classify_nutrition(_to_columns(days))
+
+    assert len(batch) == len(days)
+    for index, day in enumerate(days):
+        assert batch[index] == analyze_nutrition_balance(day), day["date"]
+
+
+def test_classify_sleep_matches_analyze_sleep_patterns():
+    days = _random_sleep_days(np.random.default_rng(42), 5000)
+    # REM がちょうど 15%（60 / 400）の日
+    days.append({"date": "rem-boundary", "total_sleep_minutes": 400, "sleep_efficiency": 0.85,
+                 "rem_sleep_minutes": 60})
+
+    batch = classify_sleep(_to_columns(days, SLEEP_COLUMNS))
+
+    assert len(batch) == len(days)
+    for index, day in enumerate(days):
+        assert batch[index] == analyze_sleep_patterns(day), day["date"]
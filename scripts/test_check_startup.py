@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+cron から起動するエントリーポイントの起動時間が予算内かを確かめるテストなのだ
+
+check_startup.py と同じ計測（python -S -X importtime で別プロセスとして起動する）を使う。
+
+使い方:
+    python -m pytest test_check_startup.py
+"""
+import pytest
+
+from check_startup import ENTRY_POINTS, IMPORT_BUDGET_MS, LAZY_MODULES, STARTUP_BUDGET_MS, measure
+
+
+# 起動する回数（マシンの負荷で遅くなった回を除くため、最小値を使う）
+REPEAT = 10
+
+
+@pytest.fixture(scope="module", params=ENTRY_POINTS)
+def startup(request):
+    return request.param, measure(request.param, REPEAT)
+
+
+def test_no_lazy_module_is_imported_at_startup(startup):
+    module, stats = startup
+    eager = sorted(name for name in LAZY_MODULES if name in stats["imported"])
+    assert not eager, f"{module} が起動時に読み込んでいるのだ: {eager}"
+
+
+def test_startup_time_is_within_budget(startup):
+    module, stats = startup
+    assert stats["wall_ms"] <= STARTUP_BUDGET_MS, f"{module}: {stats['wall_ms']:.1f}ms, 遅いモジュール: {stats['slowest']}"
+
+
+def test_project_import_time_is_within_budget(startup):
+    module, stats = startup
+    assert stats["import_ms"] <= IMPORT_BUDGET_MS, f"{module}: {stats['import_ms']:.1f}ms"
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+codec の形式の自動判定と、auth.TokenCache の共有・ロック・有効期限を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_codec.py
+"""
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+
+import pytest
+
+from auth import TokenCache
+from codec import CBOR_MAGIC, CODECS, JSON_CODEC, detect_codec, dumps, get_codec, load_file, loads
+
+
+VALUE = {"date": "2025-03-01", "steps": 9000, "ratio": 0.25, "tags": ["a", "b"], "nested": {"none": None}}
+
+
+def test_json_is_detected_with_or_without_leading_whitespace():
+    assert detect_codec(b'{"a": 1}') is JSON_CODEC
+    assert detect_codec(b'\n  [1, 2]') is JSON_CODEC
+    assert detect_codec(b'"text"') is JSON_CODEC
+    assert detect_codec(b'') is JSON_CODEC
+    assert loads(dumps(VALUE, pretty=True)) == VALUE
+    assert loads(JSON_CODEC.encode(VALUE).decode('utf-8')) == VALUE
+
+
+def test_json_writes_dates_and_sets():
+    data = dumps({"when": datetime(2025, 3, 1, 7, 30, tzinfo=timezone.utc), "day": date(2025, 3, 1),
+                  "tags": {"b", "a"}})
+    assert loads(data) == {"when": "2025-03-01T07:30:00+00:00", "day": "2025-03-01", "tags": ["a", "b"]}
+
+
+@pytest.mark.parametrize("name", ["msgpack", "cbor"])
+def test_binary_codecs_are_detected(name, tmp_path):
+    codec = CODECS[name]
+    pytest.importorskip(codec.package)
+    data = codec.encode(VALUE)
+    assert detect_codec(data) is codec
+    assert data.startswith(CBOR_MAGIC) == (name == "cbor")
+
+    path = tmp_path / f"value{codec.extension}"
+    path.write_bytes(data)
+    assert load_file(path) == VALUE
+
+
+def test_unknown_or_missing_codecs_are_reported():
+    with pytest.raises(ValueError, match="未対応のコーデック"):
+        get_codec("yaml")
+    for codec in CODECS.values():
+        if not codec.available:
+            with pytest.raises(ImportError, match=codec.package):
+                get_codec(codec.name)
+
+
+class CountingRefresh:
+    """トークンエンドポイントの代わりに、呼ばれた回数を数えて毎回違うトークンを返す"""
+
+    def __init__(self, expires_in=3600, delay=0.0):
+        self.expires_in = expires_in
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return {"access_token": f"token-{self.calls}", "expires_in": self.expires_in}
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "cache" / "token_cache.json"
+
+
+def test_token_is_reused_until_it_nears_expiry(cache_path):
+    cache = TokenCache(cache_path, refresh_margin_seconds=300)
+    refresh = CountingRefresh()
+    assert cache.get_or_refresh("key", refresh) == "token-1"
+    assert cache.get_or_refresh("key", refresh) == "token-1"
+    assert refresh.calls == 1
+    assert oct(os.stat(cache_path).st_mode & 0o777) == oct(0o600)
+
+    # 別のインスタンス（別プロセス）もファイルから同じトークンを使う
+    assert TokenCache(cache_path).get_or_refresh("key", refresh) == "token-1"
+    assert refresh.calls == 1
+
+    # 有効期限が事前更新のマージンより短ければ毎回更新する
+    short = CountingRefresh(expires_in=200)
+    assert cache.get_or_refresh("other", short) == "token-1"
+    assert cache.get_or_refresh("other", short) == "token-2"
+    assert cache.get_or_refresh("key", refresh, force=True) == "token-2"
+
+
+def test_expired_entries_are_dropped_and_a_broken_file_is_ignored(cache_path):
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_text("{broken")
+    cache = TokenCache(cache_path)
+    assert cache.get_or_refresh("key", CountingRefresh()) == "token-1"
+
+    cache_path.write_bytes(JSON_CODEC.encode({
+        "old": {"access_token": "old", "expires_at": time.time() - 1},
+        "key": {"access_token": "token-1", "expires_at": time.time() + 3600},
+    }))
+    TokenCache(cache_path).get_or_refresh("new", CountingRefresh())
+    assert set(load_file(cache_path)) == {"key", "new"}
+    assert TokenCache(cache_path).get_or_refresh("failed", lambda: None) is None
+
+
+def test_concurrent_refreshes_hit_the_endpoint_once(cache_path):
+    refresh = CountingRefresh(delay=0.05)
+    # スレッドごとに別のインスタンス（別プロセスと同じくファイルロックだけで排他する）
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(TokenCache(cache_path).get_or_refresh("key", refresh)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert refresh.calls == 1
+    assert results == ["token-1"] * 8
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+collect の期間まとめ処理と、ウォーターマークによる差分同期を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_collect.py
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from collect import PLUGINS, collect_range, process_range
+from health_connect_client import create_health_connect_client
+from storage import JsonDailyStorage
+from sync_state import SyncState
+
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=4)
+
+
+@pytest.fixture
+def client():
+    client = create_health_connect_client(mock_mode=True)
+    yield client
+    client.close()
+
+
+def _dates(start, end):
+    return {(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range((end - start).days + 1)}
+
+
+def _mtimes(base_dir):
+    return {path.relative_to(base_dir).as_posix(): path.stat().st_mtime_ns
+            for data_type in ("activity", "sleep") for path in (base_dir / data_type).glob("*.json")}
+
+
+def test_sync_rewrites_only_days_newer_than_the_watermark(client, tmp_path):
+    storage = JsonDailyStorage(tmp_path)
+    results = collect_range(client, ["activity", "sleep"], START, END, storage=storage,
+                            sync_state=SyncState(tmp_path))
+    assert results == {"activity": True, "sleep": True}
+
+    watermarks = SyncState(tmp_path).get_watermarks()
+    assert set(watermarks) == {"steps", "sleep"}
+    assert {record["date"] for record in storage.load_range("activity")} == _dates(START, END)
+    assert {record["date"] for record in storage.load_range("sleep")} == _dates(START, END)
+    written = _mtimes(tmp_path)
+
+    # ウォーターマークより新しいレコードがなければ何も書き込まない
+    collect_range(client, ["activity", "sleep"], START, END, storage=storage, sync_state=SyncState(tmp_path))
+    assert _mtimes(tmp_path) == written
+    assert SyncState(tmp_path).get_watermarks() == watermarks
+
+    # 期間を延ばすと、増えた日だけを書き込んでウォーターマークを進める
+    later = END + timedelta(days=2)
+    collect_range(client, ["activity", "sleep"], START, later, storage=storage, sync_state=SyncState(tmp_path))
+    rewritten = _mtimes(tmp_path)
+    assert {name for name in rewritten if rewritten[name] != written.get(name)} == {
+        f"{data_type}/{date_str}.json" for data_type in ("activity", "sleep")
+        for date_str in _dates(END + timedelta(days=1), later)
+    }
+    assert all(SyncState(tmp_path).get_watermark(record_type) > watermark
+               for record_type, watermark in watermarks.items())
+
+
+def test_days_without_nutrition_data_count_as_success(client, tmp_path, caplog):
+    storage = JsonDailyStorage(tmp_path)
+    plugin = PLUGINS["nutrition"]
+    days = [START + timedelta(days=i) for i in range(3)]
+    # 真ん中の日だけ記録がある
+    start_time, end_time = plugin.get_time_range(days[1])
+    records = client.read_nutrition_data(start_time, end_time)
+    assert records
+
+    with caplog.at_level(logging.INFO, logger="collect"):
+        assert process_range(plugin, client, days, records, storage)
+        assert process_range(plugin, client, days, records, storage)
+
+    assert storage.pop_changed_days() == {"nutrition": {"2025-03-02"}}
+    saved_logs = [record.getMessage() for record in caplog.records if "保存したのだ" in record.getMessage()]
+    assert saved_logs == [
+        "[nutrition] 1日分のデータを保存したのだ（変更なし: 0日分, データなし: 2日分）",
+        "[nutrition] 0日分のデータを保存したのだ（変更なし: 1日分, データなし: 2日分）",
+    ]
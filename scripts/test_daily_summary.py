@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+daily_summary の日付の突き合わせ（睡眠は起床日の行に入る）と、書き換わった日だけの作り直しを確かめるテストなのだ
+
+使い方:
+    python -m pytest test_daily_summary.py
+"""
+import pytest
+
+from daily_summary import SUMMARY_TYPE, affected_dates, rebuild_daily_summary, update_daily_summary
+from storage import STORAGE_BACKENDS, get_storage
+
+
+def _activity(date_str, steps, total_calories):
+    return {"date": date_str, "steps": steps, "distance_meters": steps * 0.7, "active_calories": 300.0,
+            "total_calories": total_calories, "heart_rate": {"average": 70, "resting": 55.0}}
+
+
+def _sleep(date_str, minutes):
+    return {"date": date_str, "total_sleep_minutes": minutes, "sleep_efficiency": 0.9, "sleep_quality_score": 70.0}
+
+
+def _nutrition(date_str, calories):
+    return {"date": date_str, "calories_consumed": calories, "protein_g": 90.0, "carbs_g": 250.0, "fat_g": 60.0}
+
+
+@pytest.fixture(params=sorted(STORAGE_BACKENDS))
+def storage(request, tmp_path):
+    storage = get_storage(request.param, tmp_path)
+    # 睡眠は寝た夜の日付で保存されている（2/28 の夜 → 3/1 の朝に起きる）
+    storage.save_days("sleep", {date_str: _sleep(date_str, minutes) for date_str, minutes in
+                                (("2025-02-28", 420), ("2025-03-01", 380), ("2025-03-02", 400))})
+    storage.save_days("activity", {date_str: _activity(date_str, 8000, 2200.0)
+                                   for date_str in ("2025-03-01", "2025-03-02")})
+    storage.save_days("nutrition", {"2025-03-01": _nutrition("2025-03-01", 2000.0)})
+    storage.pop_changed_days()
+    yield storage
+    storage.close()
+
+
+def _summary(storage):
+    return {row["date"]: row for row in storage.load_range(SUMMARY_TYPE)}
+
+
+def test_sleep_goes_to_the_wake_up_day(storage):
+    assert rebuild_daily_summary(storage) == 3
+    summary = _summary(storage)
+
+    assert sorted(summary) == ["2025-03-01", "2025-03-02", "2025-03-03"]
+    assert summary["2025-03-01"]["sleep_minutes"] == 420
+    assert summary["2025-03-02"]["sleep_minutes"] == 380
+    assert summary["2025-03-03"]["sleep_minutes"] == 400
+    assert summary["2025-03-03"]["sources"] == ["sleep"]
+    assert summary["2025-03-03"]["steps"] is None
+
+    first = summary["2025-03-01"]
+    assert first["sources"] == ["activity", "nutrition", "sleep"]
+    assert first["resting_heart_rate"] == 55.0
+    assert first["energy_balance_kcal"] == -200.0
+    assert summary["2025-03-02"]["energy_balance_kcal"] is None
+
+
+def test_rebuilding_a_range_reads_the_previous_night(storage):
+    assert rebuild_daily_summary(storage, "2025-03-01", "2025-03-01") == 1
+    assert _summary(storage)["2025-03-01"]["sleep_minutes"] == 420
+
+
+def test_only_affected_days_are_rebuilt(storage):
+    rebuild_daily_summary(storage)
+    storage.pop_changed_days()
+
+    assert affected_dates({"sleep": {"2025-03-01"}, "activity": {"2025-03-01"}, "other": {"2025-01-01"}}) \
+        == {"2025-03-01", "2025-03-02"}
+
+    # 3/1 の夜の睡眠を取り直すと、書き換わるのは 3/2 の行だけ
+    storage.save_days("sleep", {"2025-03-01": _sleep("2025-03-01", 450)})
+    assert update_daily_summary(storage, storage.pop_changed_days()) == 1
+    assert storage.pop_changed_days() == {SUMMARY_TYPE: {"2025-03-02"}}
+
+    incremental = _summary(storage)
+    assert incremental["2025-03-02"]["sleep_minutes"] == 450
+    rebuild_daily_summary(storage)
+    assert _summary(storage) == incremental
+    assert update_daily_summary(storage, {}) == 0
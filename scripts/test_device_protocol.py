@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+device_protocol（端末との接続）を device_emulator.DeviceEmulator 相手に確かめるテストなのだ
+
+エミュレーターは同じプロセスの別スレッドで待ち受け、実モード（mock_mode=False）の
+HealthConnectClient から接続する。エミュレーターと同じシードの MockDataEngine の結果と比べるのだ。
+
+使い方:
+    python -m pytest test_device_protocol.py
+"""
+import socket
+import threading
+from array import array
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from device_emulator import DeviceEmulator
+from device_protocol import (
+    BATCH, CANCEL, FRAME_HEADER, HELLO, decode_batch_into, encode_batch, frame, read_frame
+)
+from health_connect_client import RecordBatch, create_health_connect_client
+
+
+SEED = 42
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=2) - timedelta(microseconds=1)
+
+
+@pytest.fixture
+def emulator():
+    emulator = DeviceEmulator(("127.0.0.1", 0), seed=SEED)
+    # 受け付けた接続の数を数える（verify_request は接続ごとに1回呼ばれる）
+    emulator.connections = []
+    emulator.verify_request = lambda request, client_address: emulator.connections.append(client_address) or True
+    emulator.address = emulator.start_background()
+    yield emulator
+    emulator.shutdown()
+    emulator.server_close()
+
+
+@pytest.fixture
+def client(emulator):
+    client = create_health_connect_client(mock_mode=False, device_address=emulator.address)
+    # 小さなチャンクにして、1回の読み取りが何フレームにも分かれるようにする
+    client.device.chunk_size = 100
+    yield client
+    client.close()
+
+
+def _dicts(records):
+    return [record.to_dict() for record in records]
+
+
+def test_frame_round_trip():
+    sender, receiver = socket.socketpair()
+    with sender, receiver:
+        sender.sendall(frame(HELLO, 0, b'{"protocol": 1}') + frame(CANCEL, 7)
+                       + frame(BATCH, 0xFFFFFFFF, b"x" * 5000, 3))
+        assert read_frame(receiver) == (HELLO, 0, 0, b'{"protocol": 1}')
+        assert read_frame(receiver) == (CANCEL, 0, 7, b"")
+        assert read_frame(receiver) == (BATCH, 3, 0xFFFFFFFF, b"x" * 5000)
+
+        # フレームの途中で切れたら区切りがずれるので、接続ごと捨てる
+        sender.sendall(FRAME_HEADER.pack(BATCH, 0, 1, 10) + b"short")
+        sender.shutdown(socket.SHUT_WR)
+        with pytest.raises(ConnectionError):
+            read_frame(receiver)
+
+
+def test_batch_payload_round_trip():
+    timestamps = array('q', [1_700_000_000_000, 1_700_000_060_000])
+    payload = encode_batch("heart_rate", timestamps, {"heart_rate_bpm": array('q', [61, 140]),
+                                                      "measurement_type": ["resting", "sample"]})
+    batch = RecordBatch("heart_rate", tzinfo=timezone.utc)
+    # 2回デコードすると後ろに追加される
+    decode_batch_into(batch, payload)
+    decode_batch_into(batch, payload)
+
+    assert list(batch.timestamps) == list(timestamps) * 2
+    assert list(batch.columns["heart_rate_bpm"]) == [61, 140, 61, 140]
+    assert batch.columns["measurement_type"] == ["resting", "sample"] * 2
+    with pytest.raises(ValueError):
+        decode_batch_into(batch, payload[:-5])
+
+
+def test_reads_match_the_engine(emulator, client):
+    assert client.device.read_batch("steps", START, END).to_records() == \
+        emulator.engine.batch("steps", START, END).to_records()
+    assert _dicts(client.read_sleep_data(START, END)) == _dicts(emulator.engine.iter_records("sleep", START, END))
+
+
+def test_read_many_multiplexes_all_types_in_one_request(emulator, client):
+    record_types = ["steps", "heart_rate", "weight", "sleep", "nutrition"]
+    results = client.read_many_sync(record_types, START, END)
+
+    assert list(results) == record_types
+    for record_type in record_types:
+        expected = list(emulator.engine.iter_records(record_type, START, END))
+        assert len(results[record_type]) > 0, record_type
+        assert _dicts(results[record_type]) == _dicts(expected), record_type
+    # 全タイプが1本の接続の1つのストリームで届き、終わったストリームは残らない
+    assert len(emulator.connections) == 1
+    assert client.device._streams == {}
+
+
+def test_connection_is_reused_across_reads(emulator, client):
+    client.read_steps_data(START, END)
+    sock = client.device._sock
+    client.read_many_sync(["weight", "nutrition"], START, END)
+    client.device.check_permissions(["android.permission.health.READ_STEPS"])
+    client.read_steps_data(START, END)
+
+    assert client.device._sock is sock
+    assert len(emulator.connections) == 1
+
+
+def test_error_frames_fail_only_their_part(client):
+    futures = client.device.read_many({"steps": (START, END, None), "unknown": (START, END, None)})
+
+    assert len(futures["steps"].result(timeout=10)) > 0
+    with pytest.raises(RuntimeError, match="未対応のデータタイプ"):
+        futures["unknown"].result(timeout=10)
+    # リクエスト全体の失敗（ALL_PARTS）も例外になる
+    with pytest.raises(RuntimeError, match="未対応の操作"):
+        client.device._call({"op": "unknown"})
+    assert client.device._streams == {}
+
+
+def test_cancel_stops_the_stream_and_keeps_the_connection(emulator, client):
+    # 2つ目のチャンクは読むのをやめるまで送らない（先に最後まで届いてストリームが終わらないように）
+    release = threading.Event()
+    chunks = emulator.chunks
+
+    def held_chunks(read, chunk_size):
+        for i, chunk in enumerate(chunks(read, chunk_size)):
+            if i == 1:
+                release.wait(10)
+            yield chunk
+
+    emulator.chunks = held_chunks
+    records = client.device.iter_records("heart_rate", START, END)
+    next(records)
+    sock = client.device._sock
+    assert len(client.device._streams) == 1
+
+    # 途中で読むのをやめると CANCEL を送り、届き続けるチャンクは捨てられる
+    records.close()
+    release.set()
+    assert client.device._streams == {}
+
+    assert _dicts(client.read_sleep_data(START, END)) == _dicts(emulator.engine.iter_records("sleep", START, END))
+    assert client.device._sock is sock
+    assert len(emulator.connections) == 1
+
+
+def test_dropped_connection_fails_pending_reads_and_reconnects(emulator, client):
+    client.device.check_permissions([])
+    # 応答が届く前に接続を切る
+    emulator.latency_seconds = 0.5
+    futures = client.device.read_many({"steps": (START, END, None), "weight": (START, END, None)})
+    client.device._sock.shutdown(socket.SHUT_RDWR)
+
+    for future in futures.values():
+        with pytest.raises((ConnectionError, OSError)):
+            future.result(timeout=10)
+    assert client.device._sock is None
+    assert client.device._streams == {}
+
+    # 次のリクエストで張り直す
+    emulator.latency_seconds = 0
+    assert _dicts(client.read_weight_data(START, END)) == _dicts(emulator.engine.iter_records("weight", START, END))
+    assert len(emulator.connections) == 2
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+HealthConnectClient のページ単位の読み取り（ページトークンとカーソルの破棄）を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_health_connect_client.py
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from health_connect_client import CursorExpiredError, create_health_connect_client
+
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+END = START + timedelta(days=1)
+PAGE_SIZE = 50
+
+
+@pytest.fixture
+def client():
+    client = create_health_connect_client(mock_mode=True, mock_seed=42)
+    yield client
+    client.close()
+
+
+def _dicts(records):
+    return [record.to_dict() for record in records]
+
+
+def _first_page(client):
+    return client.read_records_page("heart_rate", START, END, PAGE_SIZE)
+
+
+def test_pages_add_up_to_the_whole_read(client):
+    records = list(client.iter_records("heart_rate", START, END, PAGE_SIZE))
+    assert len(records) > PAGE_SIZE * 2
+    assert _dicts(records) == _dicts(client.read_heart_rate_data(START, END))
+    assert client._cursors == {}
+
+
+def test_tokens_are_single_use(client):
+    page = _first_page(client)
+    client.read_records_page("heart_rate", START, END, PAGE_SIZE, page.next_page_token)
+    with pytest.raises(ValueError, match="無効なページトークン"):
+        client.read_records_page("heart_rate", START, END, PAGE_SIZE, page.next_page_token)
+
+
+def test_least_recently_used_cursor_is_evicted_first(client, monkeypatch):
+    monkeypatch.setattr(client, "MAX_OPEN_CURSORS", 2)
+    first, second = _first_page(client), _first_page(client)
+    # 先に開いた方を使い続けていれば、破棄されるのは使われていない方
+    first = client.read_records_page("heart_rate", START, END, PAGE_SIZE, first.next_page_token)
+    _first_page(client)
+
+    with pytest.raises(CursorExpiredError, match="期限切れ"):
+        client.read_records_page("heart_rate", START, END, PAGE_SIZE, second.next_page_token)
+    assert client.read_records_page("heart_rate", START, END, PAGE_SIZE, first.next_page_token).records
+
+
+def test_idle_cursor_expires(client, monkeypatch):
+    page = _first_page(client)
+    monkeypatch.setattr(client, "CURSOR_IDLE_SECONDS", 0.0)
+
+    with pytest.raises(CursorExpiredError):
+        client.read_records_page("heart_rate", START, END, PAGE_SIZE, page.next_page_token)
+    assert client._cursors == {}
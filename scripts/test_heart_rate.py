@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+heart_rate.HeartRateAccumulator の逐次集計（平均・最大・最小・安静時心拍数・心拍ゾーン）を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_heart_rate.py
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from health_connect_client import create_health_connect_client
+from heart_rate import (
+    HEART_RATE_ZONES, MAX_SAMPLE_GAP_SECONDS, HeartRateAccumulator, fetch_heart_rate_summary, summarize_heart_rate
+)
+
+
+START = datetime(2025, 3, 1, tzinfo=timezone.utc)
+
+
+def _accumulate(samples, max_heart_rate=190):
+    """(開始からの秒数, bpm) のリストを集計する"""
+    accumulator = HeartRateAccumulator(max_heart_rate)
+    for seconds, bpm in samples:
+        accumulator.add(START + timedelta(seconds=seconds), bpm)
+    return accumulator.summary()
+
+
+def test_stats_match_the_whole_list():
+    rng = random.Random(1)
+    samples = [(i * 5, rng.randint(45, 185)) for i in range(20000)]
+    summary = _accumulate(samples)
+    bpms = [bpm for _, bpm in samples]
+
+    assert summary["samples"] == len(bpms)
+    assert summary["average"] == round(sum(bpms) / len(bpms))
+    assert (summary["min"], summary["max"]) == (min(bpms), max(bpms))
+    # 全サンプルが5秒ずつ続いたので、ゾーンの合計は計測時間と同じ
+    assert sum(summary["zone_minutes"].values()) == pytest.approx(len(bpms) * 5 / 60, abs=0.3)
+    assert list(summary["zone_minutes"]) == [name for name, _ in HEART_RATE_ZONES]
+
+
+def test_zone_time_uses_the_gap_to_the_next_sample():
+    # 最大心拍数200: 10分間は100bpm（50% = zone1）、続く5分間は170bpm（85% = zone4）
+    samples = [(i * 10, 100) for i in range(60)] + [(600 + i * 10, 170) for i in range(30)]
+    zones = _accumulate(samples, max_heart_rate=200)["zone_minutes"]
+    assert zones["zone1"] == 10.0
+    assert zones["zone4"] == 5.0
+    assert zones["rest"] == zones["zone2"] == zones["zone3"] == zones["zone5"] == 0.0
+
+
+def test_gaps_longer_than_the_limit_are_not_counted():
+    samples = [(0, 100), (30, 100), (30 + MAX_SAMPLE_GAP_SECONDS + 1, 100), (30 + MAX_SAMPLE_GAP_SECONDS + 31, 100)]
+    # 30秒 + 30秒 + 最後のサンプルは直前の間隔（30秒）続いたとみなす
+    assert _accumulate(samples, max_heart_rate=190)["zone_minutes"]["zone1"] == 1.5
+
+
+def test_resting_is_the_lowest_five_minute_average():
+    # 1分ごとの平均: 80, 80, 60, 62, 58, 61, 59, 90, 90 → 連続5分の平均の最小は (60+62+58+61+59)/5 = 60
+    minute_means = [80, 80, 60, 62, 58, 61, 59, 90, 90]
+    samples = [(minute * 60 + second, bpm) for minute, bpm in enumerate(minute_means) for second in (0, 20, 40)]
+    assert _accumulate(samples)["resting"] == 60.0
+
+    # 5分続かない場合は1分平均の最小値
+    assert _accumulate(samples[:3 * 4])["resting"] == 60.0
+    # 途切れをまたいだ5分は使わない（80, 80, 60, 62 と 61, 59, 90, 90 の4分ずつなので1分平均の最小値になる）
+    broken = samples[:3 * 4] + [(seconds + 3600, bpm) for seconds, bpm in samples[3 * 5:]]
+    assert _accumulate(broken)["resting"] == 59.0
+
+
+def test_empty_input():
+    assert _accumulate([]) == {
+        "average": 0, "max": 0, "min": 0, "resting": None, "samples": 0,
+        "zone_minutes": {name: 0.0 for name, _ in HEART_RATE_ZONES},
+    }
+
+
+def test_streamed_summary_matches_the_read_list():
+    client = create_health_connect_client(mock_mode=True, mock_seed=42)
+    try:
+        end = START + timedelta(days=1) - timedelta(microseconds=1)
+        records = client.read_heart_rate_data(START, end)
+        assert len(records) > 1000
+        assert fetch_heart_rate_summary(client, START, end) == summarize_heart_rate(records)
+    finally:
+        client.close()
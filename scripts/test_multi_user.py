@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+multi_user のマニフェストの読み込み（ユーザーIDの検証とユーザーごとの認証情報）を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_multi_user.py
+"""
+from pathlib import Path
+
+import pytest
+
+from codec import JSON_CODEC
+from multi_user import _collect_for_user, load_user_manifest
+
+
+def _manifest(tmp_path, users):
+    path = tmp_path / "users.json"
+    path.write_bytes(JSON_CODEC.encode({"users": users}))
+    return path
+
+
+def test_output_dirs_stay_under_the_root(tmp_path):
+    users = load_user_manifest(_manifest(tmp_path, [{"user_id": "alice"}, {"user_id": "bob.smith"}]),
+                               tmp_path / "users")
+    assert [Path(user.output_dir) for user in users] == [tmp_path / "users" / "alice",
+                                                         tmp_path / "users" / "bob.smith"]
+
+
+@pytest.mark.parametrize("user_id", ["../x", "..", ".", "", "/etc", "a/b", "a\\b", 123])
+def test_user_ids_that_escape_the_root_are_rejected(tmp_path, user_id):
+    with pytest.raises(ValueError, match="ユーザーID"):
+        load_user_manifest(_manifest(tmp_path, [{"user_id": user_id}]), tmp_path / "users")
+
+
+def test_refresh_token_env_is_passed_to_the_auth(tmp_path, monkeypatch):
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_ID", "client")
+    monkeypatch.setenv("GOOGLE_OAUTH_CLIENT_SECRET", "secret")
+    monkeypatch.setenv("GOOGLE_REFRESH_TOKEN", "shared")
+    monkeypatch.setenv("ALICE_REFRESH_TOKEN", "alice-token")
+    alice, bob = load_user_manifest(_manifest(tmp_path, [
+        {"user_id": "alice", "refresh_token_env": "ALICE_REFRESH_TOKEN"},
+        {"user_id": "bob", "refresh_token_env": "BOB_REFRESH_TOKEN"},
+    ]))
+
+    assert alice.get_auth().refresh_token == "alice-token"
+    # 環境変数がないユーザーは共通のトークンを使わずに失敗する
+    with pytest.raises(ValueError, match="BOB_REFRESH_TOKEN"):
+        bob.get_auth()
+    bob.output_dir = str(tmp_path / "bob")
+    result = _collect_for_user(bob, None, None, "json", False)
+    assert not result.success and "BOB_REFRESH_TOKEN" in result.error
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+ストレージバックエンドの保存・読み込みと、内容が変わらない日の書き込み省略を確かめるテストなのだ
+
+使い方:
+    python -m pytest test_storage.py
+"""
+from datetime import datetime, timezone
+
+import pytest
+
+from codec import JSON_CODEC
+from storage import STORAGE_BACKENDS, ColumnarStorage, flatten_record, get_storage
+
+
+def _record(date_str, steps, heart_rate=True, **extra):
+    record = {
+        "date": date_str,
+        "steps": steps,
+        "distance_meters": steps * 0.7,
+        "heart_rate": {"average": 70, "resting": 51.5, "zone_minutes": {"rest": 1400.0}},
+        "goal_reached": steps >= 8000,
+        "created_at": f"{date_str}T09:00:00+00:00",
+        "data_source": "health_connect",
+        **extra,
+    }
+    if not heart_rate:
+        # 心拍数が取れなかった日は heart_rate 自体がない
+        del record["heart_rate"]
+    return record
+
+
+DAYS = {
+    "2024-12-30": _record("2024-12-30", 9000),
+    "2024-12-31": _record("2024-12-31", 0, note="休み"),
+    "2025-01-01": _record("2025-01-01", 12000, heart_rate=False),
+}
+
+
+@pytest.fixture(params=sorted(STORAGE_BACKENDS))
+def storage(request, tmp_path):
+    storage = get_storage(request.param, tmp_path)
+    yield storage
+    storage.close()
+
+
+def _without_nones(record):
+    """列指向では他の日にしかない列が None で入るので、比べるときは外す"""
+    return {column: value for column, value in flatten_record(record).items() if value is not None}
+
+
+def test_round_trip_keeps_values_and_types(storage):
+    storage.save_days("activity", DAYS)
+
+    loaded = storage.load_range("activity")
+    assert [record["date"] for record in loaded] == sorted(DAYS)
+    for record in loaded:
+        assert _without_nones(record) == _without_nones(DAYS[record["date"]])
+        assert type(record["steps"]) is int and type(record["goal_reached"]) is bool
+
+    assert [record["date"] for record in storage.load_range("activity", "2024-12-31", "2024-12-31")] == ["2024-12-31"]
+    assert storage.load_columns("activity", "2025-01-01")["steps"] == [12000]
+    assert storage.load_day("activity", "2024-12-29") is None
+
+
+def test_unchanged_days_are_not_written_again(storage):
+    storage.save_days("activity", DAYS)
+    assert storage.pop_changed_days() == {"activity": set(DAYS)}
+
+    # created_at だけ違う日は書き込まない
+    again = {date_str: dict(record, created_at="2030-01-01T00:00:00+00:00") for date_str, record in DAYS.items()}
+    again["2025-01-01"] = _record("2025-01-01", 12345)
+    storage.save_days("activity", again)
+
+    assert storage.pop_changed_days() == {"activity": {"2025-01-01"}}
+    assert storage.load_day("activity", "2025-01-01")["steps"] == 12345
+    assert storage.load_day("activity", "2024-12-30")["created_at"] == DAYS["2024-12-30"]["created_at"]
+
+
+def test_json_storage_rewrites_deleted_files(tmp_path):
+    storage = get_storage("json", tmp_path)
+    storage.save_days("activity", DAYS)
+    (tmp_path / "activity" / "2024-12-30.json").unlink()
+
+    storage.save_days("activity", DAYS)
+    assert storage.pop_changed_days()["activity"] == set(DAYS) | {"2024-12-30"}
+    assert storage.load_day("activity", "2024-12-30")["steps"] == 9000
+
+
+def test_columnar_upsert_adds_a_block_without_rewriting_the_year(tmp_path):
+    storage = ColumnarStorage(tmp_path)
+    storage.save_days("activity", DAYS)
+    year_dir = tmp_path / "activity" / "2024.columns"
+    first_block = year_dir / "000000.block"
+    written = first_block.read_bytes()
+
+    storage.save_days("activity", {"2024-12-30": _record("2024-12-30", 1)})
+
+    assert sorted(path.name for path in year_dir.iterdir()) == ["000000.block", "000001.block"]
+    assert first_block.read_bytes() == written
+    assert [record["steps"] for record in storage.load_range("activity", end_date="2024-12-31")] == [1, 0]
+
+
+def test_columnar_compacts_blocks(tmp_path):
+    storage = ColumnarStorage(tmp_path)
+    for i in range(ColumnarStorage.COMPACT_BLOCKS + 1):
+        storage.save_days("activity", {f"2025-01-{i % 5 + 1:02d}": _record(f"2025-01-{i % 5 + 1:02d}", i)})
+
+    blocks = sorted((tmp_path / "activity" / "2025.columns").iterdir())
+    assert [path.name for path in blocks] == [f"{ColumnarStorage.COMPACT_BLOCKS:06d}.block"]
+    assert [record["steps"] for record in storage.load_range("activity")] == [15, 16, 12, 13, 14]
+
+
+def test_columnar_reads_and_converts_the_previous_format(tmp_path):
+    legacy = tmp_path / "activity" / "2025.columns.json"
+    legacy.parent.mkdir()
+    legacy.write_bytes(JSON_CODEC.encode({"version": 1, "columns": {
+        "date": ["2025-01-01", "2025-01-02"], "steps": [100, 200], "heart_rate.average": [60, None]
+    }}))
+    storage = ColumnarStorage(tmp_path)
+    assert storage.load_day("activity", "2025-01-01") == {"date": "2025-01-01", "steps": 100,
+                                                           "heart_rate": {"average": 60}}
+
+    storage.save_days("activity", {"2025-01-02": {"date": "2025-01-02", "steps": 250}})
+
+    assert not legacy.exists()
+    assert [record["steps"] for record in storage.load_range("activity")] == [100, 250]
+
+
+def test_sqlite_records_use_the_plugin_day(tmp_path):
+    from collect import PLUGINS
+    from health_connect_client import SleepRecord
+
+    storage = get_storage("sqlite", tmp_path)
+    sleep = PLUGINS["sleep"]
+    # 1/1 23時に寝て 1/2 7時に起きた睡眠は、収集と同じく 1/1 の夜の分として入る
+    record = SleepRecord(timestamp=datetime(2025, 1, 2, 7, tzinfo=timezone.utc), record_type="sleep",
+                         total_sleep_minutes=480)
+    storage.insert_records([record], sleep.day_key)
+
+    assert storage.conn.execute("SELECT day FROM records").fetchall() == [("2025-01-01",)]
+    storage.close()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+体重トレンドの差分更新が履歴全体からの計算（replay）と同じ結果になるかを確かめるテストなのだ
+
+使い方:
+    python -m pytest test_weight_trend.py
+"""
+from datetime import date, timedelta
+
+import pytest
+
+from fetch_weight import add_weight_trends, build_weight_record
+from storage import JsonDailyStorage
+from weight_trend import WeightTrend, advance, summarize
+
+
+START = date(2025, 1, 1)
+
+
+def _weights(days):
+    """5日に1回は測り忘れる（体重0の日がある）体重の履歴"""
+    return {
+        (START + timedelta(days=i)).isoformat(): 0.0 if i % 5 == 3 else round(70 + (i % 11) * 0.3, 1)
+        for i in range(days)
+    }
+
+
+def _save(storage, weights):
+    """collect.process_range と同じく、期間をまとめて補完してから保存する"""
+    days = {date_str: {"weight_kg": kg, "body_fat_percentage": None, "muscle_mass_kg": None, "bmi": None}
+            for date_str, kg in weights.items()}
+    days = add_weight_trends(days, storage)
+    storage.save_days("weight", {date_str: build_weight_record(date_str, data) for date_str, data in days.items()})
+
+
+def _expected(history):
+    """履歴全体から計算した日ごとのトレンドと最後の状態"""
+    trends, state = {}, None
+    for date_str, kg in sorted(history.items()):
+        if kg:
+            state = advance(state, date_str, kg)
+            trends[date_str] = summarize(state)
+    return trends, state
+
+
+def _stored_trends(storage):
+    return {record["date"]: record["trend"] for record in storage.load_range("weight") if record["weight_kg"]}
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.setenv("USER_HEIGHT_CM", "170")
+    return JsonDailyStorage(tmp_path)
+
+
+def test_daily_updates_match_replay(storage):
+    history = _weights(60)
+    for date_str, kg in history.items():
+        _save(storage, {date_str: kg})
+
+    trends, state = _expected(history)
+    assert _stored_trends(storage) == trends
+    assert WeightTrend(storage.base_dir).state == state
+
+
+def test_same_day_refetch_replaces_the_last_day(storage):
+    history = _weights(20)
+    _save(storage, history)
+    last = max(history)
+    history[last] = 90.0
+    _save(storage, {last: 90.0})
+
+    trends, state = _expected(history)
+    assert _stored_trends(storage) == trends
+    assert WeightTrend(storage.base_dir).state == state
+
+
+def test_mid_history_backfill_rewrites_downstream_days_and_state(storage):
+    history = _weights(60)
+    _save(storage, history)
+
+    # 2/1〜2/10 だけ別の値で取り直す
+    backfill = {date_str: kg + 2.0 if kg else 0.0 for date_str, kg in history.items()
+                if "2025-02-01" <= date_str <= "2025-02-10"}
+    history.update(backfill)
+    _save(storage, backfill)
+
+    trends, state = _expected(history)
+    stored = _stored_trends(storage)
+    assert stored == trends
+    # 期間より後の日も書き換わっている
+    assert stored["2025-02-20"] != _expected(_weights(60))[0]["2025-02-20"]
+    assert WeightTrend(storage.base_dir).state == state
+
+
+def test_missing_state_file_is_rebuilt_from_history(storage):
+    history = _weights(40)
+    _save(storage, history)
+    WeightTrend(storage.base_dir).path.unlink()
+
+    extra = {(START + timedelta(days=40)).isoformat(): 72.5}
+    history.update(extra)
+    _save(storage, extra)
+
+    trends, state = _expected(history)
+    assert _stored_trends(storage) == trends
+    assert WeightTrend(storage.base_dir).state == state
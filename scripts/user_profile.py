@@ -0,0 +1,54 @@
+"""
+ユーザープロフィール（身長など、Health Connectのレコードにない設定値）を読み込むのだ
+
+プロフィールは出力先ディレクトリの `profile.json` に置く:
+    {"height_cm": 172.5}
+
+ファイルがない場合は環境変数 USER_HEIGHT_CM、それもなければ既定値を使うのだ。
+"""
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from codec import load_file
+
+
+logger = logging.getLogger(__name__)
+
+
+PROFILE_FILENAME = "profile.json"
+DEFAULT_HEIGHT_CM = 170.0
+
+
+@dataclass
+class UserProfile:
+    """ユーザーのプロフィール"""
+    height_cm: float = DEFAULT_HEIGHT_CM
+
+    @property
+    def height_m(self) -> float:
+        """身長（m）"""
+        return self.height_cm / 100
+
+
+def load_user_profile(base_dir='.') -> UserProfile:
+    """
+    プロフィールを読み込むのだ
+
+    Args:
+        base_dir: profile.json を置いたディレクトリ（ユーザーごとの出力先など）
+
+    Returns:
+        UserProfileインスタンス
+    """
+    profile_path = Path(base_dir) / PROFILE_FILENAME
+    if profile_path.exists():
+        return UserProfile(**load_file(profile_path))
+
+    height_cm = os.getenv('USER_HEIGHT_CM')
+    if height_cm:
+        return UserProfile(height_cm=float(height_cm))
+
+    logger.warning(f"プロフィールが見つからないので身長は{DEFAULT_HEIGHT_CM}cmとして計算するのだ: {profile_path}")
+    return UserProfile()
@@ -0,0 +1,238 @@
+"""
+体重のトレンド（指数移動平均・7日/30日移動平均・変化率）を計算するのだ
+
+トレンドの状態（直近30日分の体重と移動平均の値）をファイルに保存しておき、
+毎日の更新では前日の状態に1日分を足すだけにするのだ。
+履歴がどれだけ長くなっても1日の更新にかかる時間は一定なのだ。
+
+最終日より前の期間を取り直すとき（バックフィル）は、保存済みの履歴を取り直した値で上書きして
+最初から計算し直す。期間より後に保存済みの日はトレンドが変わるので保存し直し、
+状態ファイルも最後に保存済みの日まで進めて作り直すのだ。
+"""
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from codec import JSON_CODEC, load_file
+from storage import atomic_write_bytes
+
+
+logger = logging.getLogger(__name__)
+
+
+# 指数移動平均の期間（日）。平滑化係数は 2 / (期間 + 1)
+EWMA_SPAN_DAYS = 7
+EWMA_SLOW_SPAN_DAYS = 30
+
+# 変化率（kg/日）を平滑化する係数
+RATE_SMOOTHING = 0.2
+
+# 移動平均の期間（日）
+ROLLING_WINDOWS = (7, 30)
+
+def _alpha(span_days: int, gap_days: int) -> float:
+    """測定の間隔が空いた日数分だけ重みを大きくした平滑化係数"""
+    return 1 - (1 - 2 / (span_days + 1)) ** gap_days
+
+
+def _days_between(start: str, end: str) -> int:
+    return (date.fromisoformat(end) - date.fromisoformat(start)).days
+
+
+def advance(state: Optional[Dict[str, Any]], date_str: str, weight_kg: float) -> Dict[str, Any]:
+    """
+    前日までの状態に1日分の体重を加えた新しい状態を返すのだ
+
+    Args:
+        state: これまでの状態（初回はNone）
+        date_str: 日付（state の最終日より後であること）
+        weight_kg: その日の体重
+
+    Returns:
+        新しい状態
+    """
+    if state is None:
+        return {
+            "last_date": date_str,
+            "ewma_kg": weight_kg,
+            "ewma_slow_kg": weight_kg,
+            "rate_kg_per_day": 0.0,
+            "window": [[date_str, weight_kg]],
+        }
+
+    gap = _days_between(state["last_date"], date_str)
+    ewma = state["ewma_kg"] + _alpha(EWMA_SPAN_DAYS, gap) * (weight_kg - state["ewma_kg"])
+    ewma_slow = state["ewma_slow_kg"] + _alpha(EWMA_SLOW_SPAN_DAYS, gap) * (weight_kg - state["ewma_slow_kg"])
+
+    # 変化率は指数移動平均の1日あたりの変化をさらに平滑化したもの
+    slope = (ewma - state["ewma_kg"]) / gap
+    rate_weight = 1 - (1 - RATE_SMOOTHING) ** gap
+    rate = state["rate_kg_per_day"] + rate_weight * (slope - state["rate_kg_per_day"])
+
+    # 窓は最長の移動平均の日数分だけ持つ（件数は最大でも30件）
+    longest = max(ROLLING_WINDOWS)
+    window = [entry for entry in state["window"] if _days_between(entry[0], date_str) < longest]
+    window.append([date_str, weight_kg])
+
+    return {
+        "last_date": date_str,
+        "ewma_kg": ewma,
+        "ewma_slow_kg": ewma_slow,
+        "rate_kg_per_day": rate,
+        "window": window,
+    }
+
+
+def summarize(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    状態から保存用のトレンドの値を取り出すのだ
+
+    Args:
+        state: advance() で作った状態
+
+    Returns:
+        トレンドの辞書
+    """
+    trend = {
+        "ewma_kg": round(state["ewma_kg"], 2),
+        "ewma_30d_kg": round(state["ewma_slow_kg"], 2),
+    }
+    for days in ROLLING_WINDOWS:
+        values = [kg for entry_date, kg in state["window"] if _days_between(entry_date, state["last_date"]) < days]
+        trend[f"rolling_{days}d_kg"] = round(sum(values) / len(values), 2)
+    trend["rate_kg_per_week"] = round(state["rate_kg_per_day"] * 7, 3)
+    return trend
+
+
+def replay(history: Iterable[Tuple[str, float]]) -> Optional[Dict[str, Any]]:
+    """
+    日付順の体重の履歴から状態を作り直すのだ
+
+    Args:
+        history: (日付, 体重) のイテラブル
+
+    Returns:
+        最後の日までの状態（履歴がなければNone）
+    """
+    state = None
+    for date_str, weight_kg in history:
+        state = advance(state, date_str, weight_kg)
+    return state
+
+
+class WeightTrend:
+    """ファイルに保存される体重トレンドの状態"""
+
+    FILENAME = ".weight_trend.json"
+    FORMAT_VERSION = 1
+
+    def __init__(self, base_dir='.', path=None):
+        """
+        Args:
+            base_dir: 保存先のベースディレクトリ（ユーザーごとの出力先など）
+            path: 状態ファイルのパス（省略時は base_dir/.weight_trend.json）
+        """
+        self.path = Path(path) if path else Path(base_dir) / self.FILENAME
+        self.state: Optional[Dict[str, Any]] = None
+        # 同じ日を取り直したときに戻すための、最終日を加える前の状態
+        self.previous: Optional[Dict[str, Any]] = None
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        try:
+            saved = load_file(self.path)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"体重トレンドの状態を読み込めなかったので履歴から作り直すのだ: {e}")
+            return False
+        if saved.get("version") != self.FORMAT_VERSION:
+            return False
+        self.state = saved["state"]
+        self.previous = saved["previous"]
+        return True
+
+    def update(self, date_str: str, weight_kg: float) -> Dict[str, Any]:
+        """
+        1日分の体重を加えるのだ（同じ日をもう一度渡すと置き換える）
+
+        Args:
+            date_str: 日付（最終日以降であること）
+            weight_kg: その日の体重
+
+        Returns:
+            その日のトレンドの辞書
+        """
+        if self.state is not None and date_str < self.state["last_date"]:
+            raise ValueError(f"最終日（{self.state['last_date']}）より前の日付は追加できないのだ: {date_str}")
+
+        if self.state is not None and date_str == self.state["last_date"]:
+            base = self.previous
+        else:
+            base = self.state
+
+        self.previous = base
+        self.state = advance(base, date_str, weight_kg)
+        return summarize(self.state)
+
+    def save(self):
+        """状態を一時ファイル経由で書き込む"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"version": self.FORMAT_VERSION, "state": self.state, "previous": self.previous}
+        atomic_write_bytes(self.path, JSON_CODEC.encode(payload))
+
+
+def update_weight_trends(storage, weights: Dict[str, float]) -> Dict[str, Dict[str, Any]]:
+    """
+    保存先の体重トレンドに期間の体重を加えて、日ごとのトレンドを返すのだ
+
+    普段（期間が状態ファイルの最終日以降）は保存済みの状態に1日ずつ足すだけ。
+    状態ファイルがないときや最終日より前の日を取り直すときは、保存済みの履歴をこれから保存する値で
+    上書きして最初から計算し直す。取り直した日より後に保存済みの日はトレンドが変わるので、ここで保存し直す。
+
+    Args:
+        storage: 保存先のストレージ（状態ファイルは storage.base_dir に置く）
+        weights: これから保存する日の日付 → 体重（体重のない日は0。期間の日は全て渡す）
+
+    Returns:
+        日付 → トレンドの辞書（体重のある日だけ）
+    """
+    measured = sorted((date_str, kg) for date_str, kg in weights.items() if kg)
+    if not measured:
+        return {}
+
+    trend = WeightTrend(storage.base_dir)
+    first_date = min(weights)
+    if trend.loaded and first_date >= trend.state["last_date"]:
+        trends = {date_str: trend.update(date_str, kg) for date_str, kg in measured}
+        trend.save()
+        return trends
+
+    if trend.loaded:
+        logger.info(f"最終日より前の日なので体重の履歴からトレンドを計算し直すのだ: {first_date}")
+    stored = {record["date"]: record for record in storage.load_range("weight")}
+    history = {date_str: record.get("weight_kg") or 0.0 for date_str, record in stored.items()}
+    history.update(weights)
+
+    state = previous = None
+    trends = {}
+    for date_str, kg in sorted(history.items()):
+        if not kg:
+            continue
+        previous, state = state, advance(state, date_str, kg)
+        if date_str >= first_date:
+            trends[date_str] = summarize(state)
+
+    downstream = {
+        date_str: dict(stored[date_str], trend=values)
+        for date_str, values in trends.items()
+        if date_str not in weights and stored[date_str].get("trend") != values
+    }
+    if downstream:
+        storage.save_days("weight", downstream)
+        logger.info(f"取り直した日より後の{len(downstream)}日分の体重トレンドを保存し直したのだ")
+
+    trend.state, trend.previous = state, previous
+    trend.save()
+    return {date_str: trends[date_str] for date_str, _ in measured}